@@ -0,0 +1,30 @@
+"""Compare a candidate TPC-H sweep against a baseline.
+
+Run from the project-1 directory, like plotter-tpc.py.
+
+Usage: python plots/compare-tpc.py <baseline bench dir> <candidate bench dir> [--threshold 0.05]
+"""
+import argparse
+import importlib
+from itertools import groupby
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent))
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+import regression
+
+plotter_tpc = importlib.import_module("plotter-tpc")
+
+
+def load_samples(folder):
+    measurements = sorted(plotter_tpc.read_data(folder), key=lambda x: x.configuration_key())
+    return {k: [m.elapsed_time for m in g] for k, g in groupby(measurements, lambda x: x.configuration_key())}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect latency regressions between two TPC-H sweeps")
+    regression.add_arguments(parser)
+    args = parser.parse_args()
+
+    exit(regression.run(args, load_samples(args.baseline), load_samples(args.candidate)))
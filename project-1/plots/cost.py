@@ -0,0 +1,86 @@
+"""Credit cost model of Snowflake warehouses.
+
+A running warehouse consumes credits at a fixed rate per hour that doubles
+with every size step. Billing is per second, but every resume of a
+suspended warehouse is billed for at least 60 seconds. The TPC-H
+benchmarks run their queries back to back in a warm warehouse, so a query
+costs its marginal share
+
+    credits per hour / 3600 * latency * price per credit
+
+and the minimum applies once per resume, i.e. to a batch of queries. With
+resume_per_query every query is billed as a resume of its own, as for a
+warehouse that suspends between queries. The rates, the minimum and the
+price per credit are parameters, since they depend on the edition, the
+cloud region and the contract.
+"""
+from dataclasses import dataclass, field
+
+
+# Credits per hour of the standard warehouse sizes.
+CREDITS_PER_HOUR = {
+    "X-Small": 1,
+    "Small": 2,
+    "Medium": 4,
+    "Large": 8,
+    "X-Large": 16,
+    "2X-Large": 32,
+    "3X-Large": 64,
+    "4X-Large": 128,
+}
+# USD, on-demand Standard edition; Enterprise and Business Critical cost
+# more per credit.
+PRICE_PER_CREDIT = 2.0
+MINIMUM_SECONDS = 60
+
+
+@dataclass
+class CostModel:
+    credits_per_hour: dict[str, float] = field(default_factory=lambda: dict(CREDITS_PER_HOUR))
+    price_per_credit: float = PRICE_PER_CREDIT
+    minimum_seconds: float = MINIMUM_SECONDS
+    resume_per_query: bool = False
+
+    def billed_seconds(self, seconds):
+        return max(seconds, self.minimum_seconds)
+
+    def credits(self, size, seconds):
+        # Credits of one resume of a warehouse of the size running for
+        # seconds, e.g. a single query or a batch run back to back.
+        return self.credits_per_hour[size] * self.billed_seconds(seconds) / 3600
+
+    def cost(self, size, seconds):
+        return self.credits(size, seconds) * self.price_per_credit
+
+    def query_seconds(self, seconds):
+        # Seconds billed for a query in a warehouse that is already running.
+        return self.billed_seconds(seconds) if self.resume_per_query else seconds
+
+    def query_cost(self, size, seconds):
+        return self.credits_per_hour[size] * self.query_seconds(seconds) / 3600 * self.price_per_credit
+
+
+def parse_credits(values):
+    # ["Large=8", "X-Small=1.5"] -> {"Large": 8.0, "X-Small": 1.5}
+    credits = {}
+    for value in values:
+        size, _, rate = value.partition("=")
+        credits[size] = float(rate)
+    return credits
+
+
+def pareto_frontier(points):
+    # The points (latency, cost, ...) no other point beats on both latency
+    # and cost, ordered from the cheapest to the fastest.
+    frontier = []
+    for point in sorted(points, key=lambda p: (p[1], p[0])):
+        if not frontier or point[0] < frontier[-1][0]:
+            frontier.append(point)
+    return frontier
+
+
+def cheapest_within(points, slo):
+    # The cheapest point (latency, cost, ...) with a latency within the SLO,
+    # or None if no point meets it.
+    meeting = [p for p in points if p[0] <= slo]
+    return min(meeting, key=lambda p: (p[1], p[0])) if meeting else None
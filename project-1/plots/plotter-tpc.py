@@ -1,12 +1,23 @@
-import matplotlib.pyplot as plt
+import argparse
 import csv
 from dataclasses import dataclass
+import json
 import re
 from itertools import groupby
 import os
 import sys
 import pathlib
 import numpy as np
+from functools import partial
+import hashlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from results_store import ResultsStore, file_version
+from ingest import report_errors
+from cube import Cube
+from stats import error_bars
+import summary
+from cost import CostModel, MINIMUM_SECONDS, PRICE_PER_CREDIT, cheapest_within, pareto_frontier, parse_credits
 
 
 def make_out_path(name, format):
@@ -16,6 +27,8 @@ def make_out_path(name, format):
 
 
 def save_plot(name):
+    import matplotlib.pyplot as plt
+
     format = "pdf"
     plt.savefig(make_out_path(name, format),
                 format=format, bbox_inches="tight")
@@ -54,9 +67,20 @@ class Measurement:
     repetition: str
     scaling_factor: str
     bytes_spilled_local: float
+    bytes_spilled_remote: float
+    bytes_scanned: float
+    partitions_scanned: float
+    partitions_total: float
+    percent_scanned_from_cache: float
+    compilation_time: float
+    execution_time: float
+    queued_time: float
 
     @staticmethod
     def from_file(file: str, query_history):
+        if file.endswith(".json"):
+            return Measurement.from_json(file, query_history)
+
         with open(file) as f:
             lines = f.readlines()
             content = ''.join(lines)
@@ -73,18 +97,41 @@ class Measurement:
         if config_key not in query_history:
             raise Exception(f"Unknown configuration: {config_key}")
 
-        qh = query_history[config_key]
-
         return Measurement(
             query=config["query"],
             elapsed_time=elapsed,
             warehouse=config["warehouse"],
             repetition=config["repetition"],
             scaling_factor=config["scaling_factor"],
-            bytes_spilled_local=float(qh["BYTES_SPILLED_TO_LOCAL_STORAGE"]),
+            **query_history[config_key],
         )
 
 
+    @staticmethod
+    def from_json(file: str, query_history):
+        # Written by scripts/bench_tpc_h.py, one run per file.
+        with open(file) as f:
+            run = json.load(f)
+
+        config_key = Measurement.make_config_key(run["query"], run["warehouse"], run["scaling_factor"])
+
+        if run["backend"] != "snowsql":
+            # Local backends have no query history to take the phases from.
+            history = {field: 0.0 for field in HISTORY_METRICS}
+        elif config_key not in query_history:
+            raise Exception(f"Unknown configuration: {config_key}")
+        else:
+            history = query_history[config_key]
+
+        return Measurement(
+            query=run["query"],
+            elapsed_time=run["elapsed_time"],
+            warehouse=run["warehouse"],
+            repetition=str(run["repetition"]),
+            scaling_factor=run["scaling_factor"],
+            **history,
+        )
+
     @staticmethod
     def make_config_key(query: str, warehouse: str, scaling_factor: str):
         q = f'Q{int(query.replace("q", "")):02}'
@@ -103,8 +150,58 @@ class Configuration:
         return sum([getattr(m, key) for m in self.measurements]) / len(self.measurements)
 
 
+QUERY_HISTORY_PATH = './plots/query_history.csv'
+QUERIES_DIR = './tpc-h-queries'
+
+# Measurement field -> (query history columns, summed, and the factor that
+# converts them to the field's unit). Snowflake reports times in
+# milliseconds and the cache percentage as a fraction.
+HISTORY_METRICS = {
+    "bytes_spilled_local": (["BYTES_SPILLED_TO_LOCAL_STORAGE"], 1),
+    "bytes_spilled_remote": (["BYTES_SPILLED_TO_REMOTE_STORAGE"], 1),
+    "bytes_scanned": (["BYTES_SCANNED"], 1),
+    "partitions_scanned": (["PARTITIONS_SCANNED"], 1),
+    "partitions_total": (["PARTITIONS_TOTAL"], 1),
+    "percent_scanned_from_cache": (["PERCENTAGE_SCANNED_FROM_CACHE"], 100),
+    "compilation_time": (["COMPILATION_TIME"], 1e-3),
+    "execution_time": (["EXECUTION_TIME"], 1e-3),
+    "queued_time": (["QUEUED_PROVISIONING_TIME", "QUEUED_REPAIR_TIME", "QUEUED_OVERLOAD_TIME"], 1e-3),
+}
+
+
+def normalize_sql(text: str):
+    text = re.sub(r"--[^\n]*", " ", text)
+    text = re.sub(r"/\*.*?\*/", " ", text, flags=re.DOTALL)
+
+    # Query files start with session setup; the history export leaves those
+    # statements out, so only the last real statement is fingerprinted.
+    statements = [st.strip() for st in text.split(";")]
+    statements = [st for st in statements if st and not re.match(r"(alter|use)\s", st, re.IGNORECASE)]
+    text = statements[-1] if statements else ""
+
+    text = re.sub(r"'(?:[^']|'')*'", "?", text)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", "?", text)
+    return " ".join(text.lower().split())
+
+
+def fingerprint(text: str):
+    return hashlib.sha1(normalize_sql(text).encode()).hexdigest()[:16]
+
+
+def read_query_fingerprints():
+    fingerprints = {}
+    for entry in sorted(os.listdir(QUERIES_DIR)):
+        if not entry.endswith(".sql"):
+            continue
+        with open(os.path.join(QUERIES_DIR, entry)) as f:
+            fingerprints[fingerprint(f.read())] = f'Q{int(entry.removesuffix(".sql").replace("q", "")):02}'
+    return fingerprints
+
+
 def read_query_history():
-    configs = {}
+    rows_by_config = {}
+    fingerprints = read_query_fingerprints()
+    unknown = 0
 
     # SELECT *
     # FROM  snowflake.account_usage.query_history
@@ -116,44 +213,73 @@ def read_query_history():
     # ORDER BY bytes_spilled_to_local_storage, warehouse_size DESC
     # LIMIT 200;
 
-    with open('./plots/query_history.csv', newline='') as csvfile:
+    with open(QUERY_HISTORY_PATH, newline='') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
-            query = ""
-            if row['QUERY_TEXT'].startswith("select   l_returnflag"):
-                query = "Q01"
-            elif row['QUERY_TEXT'].startswith("select   n_name"):
-                query = "Q05"
-            elif row['QUERY_TEXT'].startswith("select c_name"):
-                query = "Q18"
-            else:
-                raise Exception("Unknown query")
+            query = fingerprints.get(fingerprint(row['QUERY_TEXT']))
+            if query is None:
+                unknown += 1
+                continue
 
             scaling_factor = row['SCHEMA_NAME'].replace("TPCH_", "")
             config_key = f"{query}-{row['WAREHOUSE_NAME']}-{scaling_factor}"
 
-            configs[config_key] = row
+            rows_by_config.setdefault(config_key, []).append(row)
+
+    if unknown:
+        print(f"Ignored {unknown} query history rows that match no file in {QUERIES_DIR}")
+
+    # The export has no link from a row to a repetition, so every
+    # repetition gets the mean over that configuration's rows.
+    configs = {}
+    for config_key, rows in rows_by_config.items():
+        configs[config_key] = {
+            field: sum(sum(float(row.get(col) or 0) for col in columns) for row in rows) * scale / len(rows)
+            for field, (columns, scale) in HISTORY_METRICS.items()
+        }
 
     return configs
 
 
+def open_store():
+    work_dir = pathlib.Path(__file__).parent.resolve()
+    return ResultsStore(work_dir / "output" / "results.sqlite")
+
+
 def read_data(folder):
-    query_history = read_query_history()
-    rows = []
-    for entry in os.listdir(folder):
-        # try:
-        row = Measurement.from_file(os.path.join(folder, entry), query_history)
-        rows.append(row)
-        # except:
-        #     print(f"Error processing {entry}")
+    # Runs of local backends (scripts/bench_tpc_h.py) can be plotted
+    # without a query history export.
+    has_history = os.path.exists(QUERY_HISTORY_PATH)
+    query_history = read_query_history() if has_history else {}
+    parse = partial(Measurement.from_file, query_history=query_history)
+
+    paths = [os.path.join(folder, entry) for entry in os.listdir(folder) if entry.startswith("bench-")]
+    with open_store() as store:
+        # Most metrics come from the query history, matched through the query
+        # files, so changes to either have to invalidate cached measurements.
+        query_files = sorted(os.path.join(QUERIES_DIR, e) for e in os.listdir(QUERIES_DIR))
+        version = file_version(*([QUERY_HISTORY_PATH] if has_history else []), *query_files)
+        rows, errors = store.load(paths, Measurement, parse, version=version)
+
+    report_errors(errors)
 
     print(f"Loaded {len(rows)} experiments")
 
     return rows
 
 
-def plot_latency(configs: list[Configuration]):
-    y_max = max(max(m.elapsed_time for m in c.measurements) for c in configs)
+def make_cube(configs: list[Configuration]):
+    return Cube(configs, {
+        "query": lambda c: c.measurements[0].query,
+        "warehouse": lambda c: c.measurements[0].warehouse,
+        "scaling_factor": lambda c: c.measurements[0].scaling_factor,
+    }, metrics=["elapsed_time", "bytes_spilled_local", "compilation_time", "execution_time", "queued_time"])
+
+
+def plot_latency(cube: Cube):
+    import matplotlib.pyplot as plt
+
+    y_max = max(max(m.elapsed_time for m in cell.config.measurements) for cell in cube.slice())
 
     for q in QUERY_LABELS.keys():
         plt.figure()
@@ -161,16 +287,18 @@ def plot_latency(configs: list[Configuration]):
         ax.set_aspect(1.2)
 
         for i, wh in enumerate(WAREHOUSES):
-            cs = [c for c in configs if c.measurements[0].query == q and c.measurements[0].warehouse == wh]
-            cs.sort(key=lambda x: x.measurements[0].scaling_factor)
+            cells = cube.slice(query=q, warehouse=wh, scaling_factor=list(SCALING_FACTOR_NUMS))
 
-            xs = [SCALING_FACTOR_NUMS[c.measurements[0].scaling_factor]
-                  for c in cs]
-            ys = [c.average_by("elapsed_time") for c in cs]
+            xs = [SCALING_FACTOR_NUMS[cell.coords["scaling_factor"]] for cell in cells]
+            ys = [cell.means["elapsed_time"] for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
             marker, facecolor = MARKERS[i]
-            plt.loglog(xs, ys, f'-{marker}',
-                     markerfacecolor=facecolor, label=WAREHOUSE_LABELS[wh])
+            plt.errorbar(xs, ys, yerr=yerr, fmt=f'-{marker}', capsize=3,
+                         markerfacecolor=facecolor, label=WAREHOUSE_LABELS[wh])
+
+        plt.xscale("log")
+        plt.yscale("log")
 
         plt.title(f"{QUERY_LABELS[q]} latency")
 
@@ -187,16 +315,18 @@ def plot_latency(configs: list[Configuration]):
         plt.figure()
 
         for i, q in enumerate(QUERY_LABELS.keys()):
-            cs = [c for c in configs if c.measurements[0].query == q and c.measurements[0].warehouse == wh]
-            cs.sort(key=lambda x: x.measurements[0].scaling_factor)
+            cells = cube.slice(query=q, warehouse=wh, scaling_factor=list(SCALING_FACTOR_NUMS))
 
-            xs = [SCALING_FACTOR_NUMS[c.measurements[0].scaling_factor]
-                  for c in cs]
-            ys = [c.average_by("elapsed_time") for c in cs]
+            xs = [SCALING_FACTOR_NUMS[cell.coords["scaling_factor"]] for cell in cells]
+            ys = [cell.means["elapsed_time"] for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
             marker, facecolor = MARKERS[i]
-            plt.loglog(xs, ys, f'-{marker}',
-                     markerfacecolor=facecolor, label=QUERY_LABELS[q])
+            plt.errorbar(xs, ys, yerr=yerr, fmt=f'-{marker}', capsize=3,
+                         markerfacecolor=facecolor, label=QUERY_LABELS[q])
+
+        plt.xscale("log")
+        plt.yscale("log")
 
         plt.title(f"Query latencies for {WAREHOUSE_LABELS[wh]} warehouse size")
 
@@ -216,12 +346,12 @@ def plot_latency(configs: list[Configuration]):
         fig, ax = plt.subplots(layout="constrained")
 
         for i, q in enumerate(QUERY_LABELS.keys()):
-            cs = [c for c in configs if c.measurements[0].query == q and c.measurements[0].scaling_factor == scaling_factor]
-            cs.sort(key=lambda x: WAREHOUSE_ORDER.index(x.measurements[0].warehouse))
-            ys = [c.average_by("elapsed_time") for c in cs]
+            cells = cube.slice(query=q, scaling_factor=scaling_factor, warehouse=WAREHOUSE_ORDER)
+            ys = [cell.means["elapsed_time"] for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
             offset = width * i
-            ax.bar(x + offset, ys, width - 0.02, label=QUERY_LABELS[q], zorder=3)
+            ax.bar(x + offset, ys, width - 0.02, yerr=yerr, capsize=3, label=QUERY_LABELS[q], zorder=3)
 
         ax.grid(zorder=0)
         # Add some text for labels, title and custom x-axis tick labels, etc.
@@ -232,18 +362,18 @@ def plot_latency(configs: list[Configuration]):
 
         save_plot("tpc-h-latency-" + scaling_factor)
 
-def plot_bytes_spilled(configs: list[Configuration]):
+def plot_bytes_spilled(cube: Cube):
+    import matplotlib.pyplot as plt
+
     for q in QUERY_LABELS.keys():
         plt.figure()
         ax = plt.gca()
 
         for i, wh in enumerate(WAREHOUSES):
-            cs = [c for c in configs if c.measurements[0].query == q and c.measurements[0].warehouse == wh]
-            cs.sort(key=lambda x: x.measurements[0].scaling_factor)
+            cells = cube.slice(query=q, warehouse=wh, scaling_factor=list(SCALING_FACTOR_NUMS))
 
-            xs = [SCALING_FACTOR_NUMS[c.measurements[0].scaling_factor]
-                  for c in cs]
-            ys = [c.average_by("bytes_spilled_local") * 1e-9 for c in cs]
+            xs = [SCALING_FACTOR_NUMS[cell.coords["scaling_factor"]] for cell in cells]
+            ys = [cell.means["bytes_spilled_local"] * 1e-9 for cell in cells]
 
             marker, facecolor = MARKERS[i]
             plt.plot(xs, ys, f'-{marker}',
@@ -260,6 +390,76 @@ def plot_bytes_spilled(configs: list[Configuration]):
 
         save_plot("tpc-h-bytes-" + q)
 
+
+PHASES = [("queued_time", "Queued"), ("compilation_time", "Compilation"), ("execution_time", "Execution")]
+
+
+def plot_phase_breakdown(cube: Cube):
+    import matplotlib.pyplot as plt
+
+    patterns = ["..", "//", None]
+    scaling_factors = [sf for sf in SCALING_FACTOR_NUMS if sf in cube.values("scaling_factor")]
+
+    for q in QUERY_LABELS.keys():
+        fig, axs = plt.subplots(1, len(scaling_factors), layout="constrained",
+                                figsize=(3.5 * len(scaling_factors), 4))
+        axs = np.atleast_1d(axs)
+
+        for ax, scaling_factor in zip(axs, scaling_factors):
+            cells = cube.slice(query=q, scaling_factor=scaling_factor, warehouse=WAREHOUSE_ORDER)
+            x = np.arange(len(cells))
+
+            bottom = np.zeros(len(cells))
+            for (metric, label), pattern in zip(PHASES, patterns):
+                ys = np.array([cell.means[metric] for cell in cells])
+                ax.bar(x, ys, 0.7, bottom=bottom, label=label, hatch=pattern,
+                       edgecolor="black", zorder=3)
+                bottom += ys
+
+            ax.grid(zorder=0)
+            ax.set_title(f"SF {SCALING_FACTOR_NUMS[scaling_factor]}")
+            ax.set_xticks(x, [WAREHOUSE_LABELS[cell.coords["warehouse"]] for cell in cells], rotation=30)
+
+        axs[0].set_ylabel("Latency (seconds)")
+        axs[-1].legend()
+        fig.suptitle(f"{QUERY_LABELS[q]} latency by phase")
+
+        save_plot("tpc-h-phases-" + q)
+
+
+def make_scan_table(configs: list[Configuration]):
+    lines = [
+        r"\begin{tabular}{llllllll}",
+        r"\toprule",
+        r"Query & Warehouse & Scaling Factor & Scanned & Partitions & Pruned & From cache & Remote spill \\",
+    ]
+
+    pq = None
+    for c in configs:
+        q = c.measurements[0].query
+        if pq != q:
+            lines.append(r"\midrule")
+            pq = q
+
+        scanned = c.average_by("partitions_scanned")
+        total = c.average_by("partitions_total")
+        pruned = 1 - scanned / total if total else 0
+
+        lines.append(
+            rf"{QUERY_LABELS[q]} & {WAREHOUSE_LABELS[c.measurements[0].warehouse]} & "
+            rf"{SCALING_FACTOR_NUMS[c.measurements[0].scaling_factor]} & "
+            rf"{c.average_by('bytes_scanned') * 1e-9:.1f} GB & {scanned:.0f}/{total:.0f} & {pruned * 100:.0f}\% & "
+            rf"{c.average_by('percent_scanned_from_cache'):.0f}\% & "
+            rf"{c.average_by('bytes_spilled_remote') * 1e-9:.1f} GB \\")
+
+    lines.append(r"""\bottomrule\end{tabular}""")
+
+    out_path = make_out_path("tpc-h-scan-stats", "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write('\n'.join(lines))
+
+
 def make_results_table(configs: list[Configuration]):
     lines = [
         r"\begin{tabular}{llllll}",
@@ -291,10 +491,139 @@ def make_results_table(configs: list[Configuration]):
 
     lines.append(r"""\bottomrule\end{tabular}""")
 
-    with open(make_out_path("tpc-h-results", "tex"), "w") as f:
+    out_path = make_out_path("tpc-h-results", "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
         f.write('\n'.join(lines))
 
 
+def queries_of(cube: Cube):
+    return [q for q in QUERY_LABELS if q in cube.values("query")]
+
+
+def scaling_factors_of(cube: Cube):
+    return [sf for sf in SCALING_FACTOR_NUMS if sf in cube.values("scaling_factor")]
+
+
+def query_cost(cell, model: CostModel, per_resume=False):
+    # Mean over the repetitions of the cost in the running warehouse, or
+    # with per_resume of resuming the warehouse for the query alone.
+    size = WAREHOUSE_LABELS[cell.coords["warehouse"]]
+    cost = model.cost if per_resume else model.query_cost
+    return np.mean([cost(size, m.elapsed_time) for m in cell.config.measurements])
+
+
+def cost_points(cube: Cube, model: CostModel, query, scaling_factor):
+    # (latency, cost, warehouse) of a query at a scaling factor.
+    cells = cube.slice(query=query, scaling_factor=scaling_factor, warehouse=WAREHOUSE_ORDER)
+    return [(cell.means["elapsed_time"], query_cost(cell, model), cell.coords["warehouse"]) for cell in cells]
+
+
+def make_cost_table(cube: Cube, model: CostModel):
+    header = ["Query", "Warehouse", "SF", "Latency (s)", "Billed (s)", "Credits", "Cost ($)", "Pareto"]
+
+    rows = []
+    for q in queries_of(cube):
+        for scaling_factor in scaling_factors_of(cube):
+            points = cost_points(cube, model, q, scaling_factor)
+            frontier = [p[2] for p in pareto_frontier(points)]
+            for latency, price, wh in points:
+                rows.append([QUERY_LABELS[q], WAREHOUSE_LABELS[wh], str(SCALING_FACTOR_NUMS[scaling_factor]),
+                             f"{latency:.1f}", f"{model.query_seconds(latency):.1f}",
+                             f"{price / model.price_per_credit:.3g}", f"{price:.3g}", "yes" if wh in frontier else ""])
+    return header, rows
+
+
+def make_scaling_factor_cost_table(cube: Cube, model: CostModel):
+    # Cost of all queries of a scaling factor, run back to back in one
+    # resume of the warehouse or each in a resume of its own.
+    header = ["SF", "Warehouse", "Queries", "Latency (s)", "Back to back ($)", "Separately ($)"]
+
+    rows = []
+    for scaling_factor in scaling_factors_of(cube):
+        for wh in WAREHOUSE_ORDER:
+            cells = cube.slice(scaling_factor=scaling_factor, warehouse=wh)
+            if not cells:
+                continue
+            latency = sum(cell.means["elapsed_time"] for cell in cells)
+            separately = sum(query_cost(cell, model, per_resume=True) for cell in cells)
+            rows.append([str(SCALING_FACTOR_NUMS[scaling_factor]), WAREHOUSE_LABELS[wh], str(len(cells)),
+                         f"{latency:.1f}", f"{model.cost(WAREHOUSE_LABELS[wh], latency):.4f}", f"{separately:.4f}"])
+    return header, rows
+
+
+def recommend_warehouses(cube: Cube, model: CostModel, slo):
+    header = ["Query", "SF", "Warehouse", "Latency (s)", "Cost ($)", "Fastest warehouse ($)"]
+
+    rows = []
+    for q in queries_of(cube):
+        for scaling_factor in scaling_factors_of(cube):
+            points = cost_points(cube, model, q, scaling_factor)
+            if not points:
+                continue
+            fastest = min(points)
+            best = cheapest_within(points, slo)
+            if best is None:
+                rows.append([QUERY_LABELS[q], str(SCALING_FACTOR_NUMS[scaling_factor]),
+                             f"none within {slo:g}s", f"{fastest[0]:.1f}", "", f"{fastest[1]:.3g}"])
+                continue
+            rows.append([QUERY_LABELS[q], str(SCALING_FACTOR_NUMS[scaling_factor]), WAREHOUSE_LABELS[best[2]],
+                         f"{best[0]:.1f}", f"{best[1]:.3g}", f"{fastest[1]:.3g}"])
+    return header, rows
+
+
+def write_tex_table(name, header, rows):
+    lines = [
+        r"\begin{tabular}{" + "l" * len(header) + "}",
+        r"\toprule",
+        " & ".join(header).replace("$", r"\$") + r" \\",
+        r"\midrule",
+    ]
+    lines += [" & ".join(row) + r" \\" for row in rows]
+    lines.append(r"\bottomrule\end{tabular}")
+
+    out_path = make_out_path(name, "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def plot_cost_frontier(cube: Cube, model: CostModel, slo=None):
+    import matplotlib.pyplot as plt
+
+    for q in queries_of(cube):
+        plt.figure()
+
+        for i, scaling_factor in enumerate(scaling_factors_of(cube)):
+            points = cost_points(cube, model, q, scaling_factor)
+            if not points:
+                continue
+            frontier = pareto_frontier(points)
+
+            marker, facecolor = MARKERS[i]
+            line = plt.plot([p[0] for p in frontier], [p[1] for p in frontier], f'-{marker}',
+                            markerfacecolor=facecolor, label=f"SF {SCALING_FACTOR_NUMS[scaling_factor]}")[0]
+            dominated = [p for p in points if p not in frontier]
+            plt.plot([p[0] for p in dominated], [p[1] for p in dominated], marker, color=line.get_color(),
+                     markerfacecolor="none", linestyle="none")
+            for latency, price, wh in points:
+                plt.annotate(WAREHOUSE_LABELS[wh], (latency, price), fontsize="x-small",
+                             textcoords="offset points", xytext=(4, 4))
+
+        if slo is not None:
+            plt.axvline(slo, color="black", linestyle="--", label=f"SLO ({slo:g}s)")
+
+        plt.xscale("log")
+        plt.yscale("log")
+        plt.grid()
+        plt.title(f"{QUERY_LABELS[q]} latency and cost (${model.price_per_credit:g} per credit)")
+        plt.xlabel("Query Latency (s)")
+        plt.ylabel("Cost per query ($)")
+        plt.legend()
+
+        save_plot("tpc-h-cost-" + q)
+
+
 def format_time(seconds):
     if seconds > 60:
         return f"{int(seconds // 60)}m {seconds % 60:.1f}s"
@@ -302,16 +631,57 @@ def format_time(seconds):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python plotter.py <bench dir path>")
-        exit(1)
-
-    measurements = read_data(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Plot the TPC-H benchmarks")
+    parser.add_argument("folder", help="bench dir path")
+    summary.add_argument(parser)
+    parser.add_argument("--price-per-credit", type=float, default=None,
+                        help=f"price of a credit in dollars (default: {PRICE_PER_CREDIT})")
+    parser.add_argument("--credits", action="append", default=[], metavar="SIZE=CREDITS",
+                        help="credits per hour of a warehouse size, e.g. Large=8, overrides the standard rates")
+    parser.add_argument("--minimum-seconds", type=float, default=None,
+                        help=f"billed minimum per warehouse resume (default: {MINIMUM_SECONDS})")
+    parser.add_argument("--resume-per-query", action="store_true",
+                        help="bill every query for at least the minimum, for warehouses suspended between queries")
+    parser.add_argument("--slo", type=float, default=None,
+                        help="latency target in seconds to recommend the cheapest warehouse for")
+    args = parser.parse_args()
+
+    model = CostModel()
+    model.credits_per_hour.update(parse_credits(args.credits))
+    if args.price_per_credit is not None:
+        model.price_per_credit = args.price_per_credit
+    if args.minimum_seconds is not None:
+        model.minimum_seconds = args.minimum_seconds
+    model.resume_per_query = args.resume_per_query
+
+    measurements = read_data(args.folder)
 
     configurations = [Configuration(key=k, measurements=list(g)) for k, g in groupby(
         sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key())]
     configurations.sort(key=lambda x: x.key)
 
     make_results_table(configurations)
-    plot_latency(configurations)
-    plot_bytes_spilled(configurations)
+    make_scan_table(configurations)
+
+    cube = make_cube(configurations)
+    tables = {
+        "tpc-h-costs": make_cost_table(cube, model),
+        "tpc-h-sf-costs": make_scaling_factor_cost_table(cube, model),
+    }
+    if args.slo is not None:
+        tables["tpc-h-warehouse-choice"] = recommend_warehouses(cube, model, args.slo)
+    for name, (header, rows) in tables.items():
+        print(f"\n## {name}\n")
+        print(summary.format_table(header, rows, args.summary or "text") + "\n")
+        write_tex_table(name, header, rows)
+
+    if args.summary:
+        summary.print_summary(configurations, "elapsed_time", style=args.summary, extra={
+            "Queued (s)": lambda c: f"{c.average_by('queued_time'):.3f}",
+            "Scanned (GB)": lambda c: f"{c.average_by('bytes_scanned') * 1e-9:.2f}",
+        })
+    else:
+        plot_latency(cube)
+        plot_bytes_spilled(cube)
+        plot_phase_breakdown(cube)
+        plot_cost_frontier(cube, model, args.slo)
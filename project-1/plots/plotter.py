@@ -1,4 +1,4 @@
-import matplotlib.pyplot as plt
+import argparse
 from dataclasses import dataclass
 import re
 from itertools import groupby
@@ -6,6 +6,12 @@ import os
 import sys
 import pathlib
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from results_store import ResultsStore
+from ingest import report_errors
+from stats import summarize_configs
+import summary
+
 
 def make_out_path(name, format):
     work_dir = pathlib.Path(__file__).parent.resolve()
@@ -23,6 +29,8 @@ IMPLEMENTATION_LABELS = {
 }
 
 def save_plot(name):
+    import matplotlib.pyplot as plt
+
     format = "pdf"
     plt.savefig(make_out_path(name, format),
                 format=format, bbox_inches="tight")
@@ -70,14 +78,17 @@ class Configuration:
         return sum([getattr(m, key) for m in self.measurements]) / len(self.measurements)
 
 
+def open_store():
+    work_dir = pathlib.Path(__file__).parent.resolve()
+    return ResultsStore(work_dir / "output" / "results.sqlite")
+
+
 def read_data(folder):
-    rows = []
-    for entry in os.listdir(folder):
-        # try:
-        row = Measurement.from_file(os.path.join(folder, entry))
-        rows.append(row)
-        # except:
-        #     print(f"Error processing {entry}")
+    paths = [os.path.join(folder, entry) for entry in os.listdir(folder) if entry.startswith("bench-")]
+    with open_store() as store:
+        rows, errors = store.load(paths, Measurement, Measurement.from_file)
+
+    report_errors(errors)
 
     print(f"Loaded {len(rows)} experiments")
 
@@ -85,6 +96,8 @@ def read_data(folder):
 
 
 def plot_variance(configs: list[Configuration]):
+    import matplotlib.pyplot as plt
+
     y_max = max(max(m.elapsed_time for m in c.measurements) for c in configs)
 
     plt.figure(figsize=(13, 5))
@@ -101,34 +114,45 @@ def plot_variance(configs: list[Configuration]):
     plt.xlabel("Latency (seconds)")
     plt.ylabel("Query implementation")
 
+
+def gen_tex_table(configs: list[Configuration]):
     lines = [
-        r"\begin{tabular}{lll}",
+        r"\begin{tabular}{llll}",
         r"\toprule",
-        r"Implementation & Latency & Accuracy \\",
+        r"Implementation & Latency & Std. dev. & Accuracy \\",
         r"\midrule",
     ]
 
-    for c in configs:
+    time_stats = summarize_configs(configs, "elapsed_time")
+    for c, time in zip(configs, time_stats):
         label = IMPLEMENTATION_LABELS[c.key]
-        time = c.average_by('elapsed_time')
         accuracy = c.average_by('accuracy')
-        lines.append(rf"{label} & {time:.1f}s & {accuracy * 100:.1f}\% \\")
+        lines.append(rf"{label} & {time.mean:.1f}s & {time.std:.1f}s & {accuracy * 100:.1f}\% \\")
 
     lines.append(r"""\bottomrule\end{tabular}""")
 
-    with open(make_out_path("naive_bayes_averages", "tex"), "w") as f:
+    out_path = make_out_path("naive_bayes_averages", "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
         f.write('\n'.join(lines))
 
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python plotter.py <bench dir path>")
-        exit(1)
+    parser = argparse.ArgumentParser(description="Plot the naive Bayes benchmarks")
+    parser.add_argument("folder", help="bench dir path")
+    summary.add_argument(parser)
+    args = parser.parse_args()
 
-    measurements = read_data(sys.argv[1])
+    measurements = read_data(args.folder)
 
     configurations = [Configuration(key=k, measurements=list(g)) for k, g in groupby(
         sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key())]
 
-    plot_variance(configurations)
+    if args.summary:
+        summary.print_summary(configurations, "elapsed_time", style=args.summary,
+                              extra={"Accuracy": lambda c: f"{c.average_by('accuracy') * 100:.1f}%"})
+    else:
+        plot_variance(configurations)
+
+    gen_tex_table(configurations)
@@ -0,0 +1,268 @@
+"""Run the TPC-H sweep from a declarative spec.
+
+Replaces bench-tpc-h.sh. Every run is written as one JSON file into the
+output directory, so an interrupted sweep can be resumed with --resume and
+only repeats the runs that have no result yet, after the warm-ups of their
+configurations. Runs on different warehouses are independent and execute
+concurrently when the backend allows it; the runs of one warehouse keep
+the repetition-major order of the shell script.
+
+Usage: python scripts/bench_tpc_h.py [--spec scripts/tpc-h-sweep.json] [--backend duckdb]
+                                     [--out DIR | --resume DIR] [--dry-run]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime
+import json
+import os
+import pathlib
+import sys
+import time
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from backends import BackendError, make_backend
+from adaptive import Policy, measure_adaptively
+
+
+PROJECT_DIR = pathlib.Path(__file__).resolve().parents[1]
+QUERIES_DIR = PROJECT_DIR / "tpc-h-queries"
+DEFAULT_SPEC = pathlib.Path(__file__).resolve().parent / "tpc-h-sweep.json"
+
+SPEC_DEFAULTS = {
+    "backend": "snowsql",
+    "backend_options": {},
+    "repetitions": 4,
+    "warmup": 1,
+    "disable_result_cache": True,
+    "parallel": None,
+    # Policy fields (target_ci, max_samples, budget, ...) to repeat each
+    # configuration until its CI is narrow enough instead of a fixed
+    # number of times.
+    "adaptive": None,
+}
+
+
+@dataclass
+class Run:
+    query: str
+    scaling_factor: str
+    warehouse: str
+    repetition: int
+    warmup: bool
+
+    @property
+    def name(self):
+        # Same naming as the bench-*.txt files; warm-ups get their own
+        # prefix so the plotter does not pick them up.
+        prefix = "warmup" if self.warmup else "bench"
+        return f"{prefix}-{self.query}-{self.scaling_factor}-{self.warehouse}-{self.repetition}"
+
+    @property
+    def configuration(self):
+        return f"{self.query}-{self.scaling_factor}-{self.warehouse}"
+
+    def header(self):
+        return (f"query={self.query}, scaling_factor={self.scaling_factor}, "
+                f"warehouse={self.warehouse}, repetition={self.repetition}")
+
+
+def load_spec(path):
+    with open(path) as f:
+        spec = {**SPEC_DEFAULTS, **json.load(f)}
+
+    for key in ["queries", "scaling_factors", "warehouses"]:
+        if not spec.get(key):
+            raise ValueError(f"Sweep spec {path} has no {key}")
+    return spec
+
+
+def plan(spec):
+    # One list of runs per warehouse. Warm-ups come first, then the
+    # repetitions interleave all configurations so slow drifts spread over
+    # every configuration instead of hitting a single one.
+    runs = {}
+    for warehouse in spec["warehouses"]:
+        runs[warehouse] = []
+        for repetition in range(1, spec["warmup"] + 1):
+            for scaling_factor in spec["scaling_factors"]:
+                for query in spec["queries"]:
+                    runs[warehouse].append(Run(query, scaling_factor, warehouse, repetition, True))
+        for repetition in range(1, spec["repetitions"] + 1):
+            for scaling_factor in spec["scaling_factors"]:
+                for query in spec["queries"]:
+                    runs[warehouse].append(Run(query, scaling_factor, warehouse, repetition, False))
+    return runs
+
+
+def plan_adaptive(spec):
+    # One entry per configuration; its repetitions are decided while running.
+    return {warehouse: [Run(query, scaling_factor, warehouse, 0, False)
+                        for scaling_factor in spec["scaling_factors"] for query in spec["queries"]]
+            for warehouse in spec["warehouses"]}
+
+
+def done_path(spec, run: Run, out_dir):
+    if spec["adaptive"] is not None:
+        return out_dir / f"adaptive-{run.configuration}.json"
+    return out_dir / f"{run.name}.json"
+
+
+def log(message):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {message}", flush=True)
+
+
+def write_json(path, content):
+    # Written under a temporary name first, so a result file on disk is
+    # always complete and marks a finished run when resuming. The name is
+    # hidden and does not start with bench-, so the plotters skip files
+    # orphaned by an interrupted write.
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(content, f, indent=2)
+    os.replace(tmp, path)
+
+
+def measure(backend, spec, run: Run):
+    with open(QUERIES_DIR / f"{run.query}.sql") as f:
+        sql = f.read()
+
+    record = {**asdict(run), "backend": backend.name, "started_at": datetime.now().isoformat()}
+    result = backend.run(sql, run.scaling_factor, run.warehouse, spec["disable_result_cache"])
+    record.update(elapsed_time=result.elapsed_time, wall_time=result.wall_time, rows=result.rows)
+    return record
+
+
+def execute(backend, spec, run: Run, out_dir):
+    log(f"benching {run.header()}{' (warm-up)' if run.warmup else ''}")
+    try:
+        record = measure(backend, spec, run)
+    except (BackendError, OSError) as e:
+        log(f"failed {run.header()}: {e}")
+        write_json(out_dir / f"failed-{run.name}.json", {**asdict(run), "error": str(e)})
+        return False
+
+    write_json(out_dir / f"{run.name}.json", record)
+
+    failed = out_dir / f"failed-{run.name}.json"
+    if failed.exists():
+        failed.unlink()
+
+    log(f"finished in {record['elapsed_time']:.3f}s (wrote to {run.name}.json)")
+    return True
+
+
+def execute_adaptive(backend, spec, run: Run, out_dir):
+    # Warm-up detection replaces the fixed warm-up runs. Every kept sample
+    # is written like a fixed repetition; the adaptive-*.json summary with
+    # the stop reason marks the configuration as done.
+    log(f"benching {run.header().rsplit(', ', 1)[0]} adaptively")
+    runs = iter(Run(run.query, run.scaling_factor, run.warehouse, i, False) for i in range(1, 1 << 20))
+
+    def sample():
+        record = measure(backend, spec, next(runs))
+        return record["elapsed_time"], record
+
+    try:
+        outcome = measure_adaptively(sample, Policy(**spec["adaptive"]))
+    except (BackendError, OSError) as e:
+        log(f"failed {run.header()}: {e}")
+        write_json(out_dir / f"failed-adaptive-{run.configuration}.json", {**asdict(run), "error": str(e)})
+        return False
+
+    # Samples of an earlier, interrupted attempt are replaced as a whole.
+    for stale in out_dir.glob(f"bench-{run.configuration}-*.json"):
+        stale.unlink()
+    for i, record in enumerate(outcome.data, start=1):
+        # Renumbered so repetitions stay contiguous once warm-ups are dropped.
+        record["repetition"] = i
+        write_json(out_dir / f"bench-{run.configuration}-{i}.json", record)
+    write_json(out_dir / f"adaptive-{run.configuration}.json", {
+        "query": run.query, "scaling_factor": run.scaling_factor, "warehouse": run.warehouse,
+        "backend": backend.name, **outcome.summary(), "warmup_times": outcome.warmup,
+    })
+
+    failed = out_dir / f"failed-adaptive-{run.configuration}.json"
+    if failed.exists():
+        failed.unlink()
+
+    log(f"finished {run.configuration}: {len(outcome.samples)} samples after {len(outcome.warmup)} warm-up runs, "
+        f"CI +-{outcome.relative_ci * 50:.1f}% ({outcome.stop_reason})")
+    return True
+
+
+def run_warehouse(backend, spec, runs, out_dir):
+    run_one = execute_adaptive if spec["adaptive"] is not None else execute
+    failures = 0
+    for run in runs:
+        if not run_one(backend, spec, run, out_dir):
+            failures += 1
+    return failures
+
+
+def pending_runs(spec, runs, out_dir):
+    # The runs without a result. Warm-ups are repeated for every
+    # configuration with bench runs left, as a resumed warehouse starts
+    # cold even if the warm-ups of the interrupted attempt are on disk.
+    pending = {r.name for r in runs if not r.warmup and not done_path(spec, r, out_dir).exists()}
+    cold = {r.configuration for r in runs if r.name in pending}
+    return [r for r in runs if r.name in pending or (r.warmup and r.configuration in cold)]
+
+
+def run_sweep(spec, out_dir, dry_run=False):
+    runs = plan_adaptive(spec) if spec["adaptive"] is not None else plan(spec)
+    pending = {wh: pending_runs(spec, rs, out_dir) for wh, rs in runs.items()}
+    total = sum(len(rs) for rs in runs.values())
+    remaining = sum(len(rs) for rs in pending.values())
+    print(f"{remaining} of {total} runs left in {out_dir}")
+
+    if dry_run:
+        for warehouse_runs in pending.values():
+            for run in warehouse_runs:
+                print(f"  {done_path(spec, run, out_dir).stem}")
+        return 0
+
+    backend = make_backend(spec["backend"], spec["backend_options"].get(spec["backend"]))
+    parallel = spec["parallel"] or len(runs)
+    if not backend.concurrent:
+        parallel = 1
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            futures = [pool.submit(run_warehouse, backend, spec, rs, out_dir) for rs in pending.values() if rs]
+            failures = sum(f.result() for f in futures)
+    finally:
+        backend.close()
+
+    print(f"Sweep took {time.perf_counter() - start:.0f}s, {failures} runs failed")
+    if failures:
+        print(f"Rerun with --resume {out_dir} to retry them")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the TPC-H benchmark sweep")
+    parser.add_argument("--spec", default=None, help=f"sweep spec (default: {DEFAULT_SPEC.name}, "
+                                                     "or the spec saved in the --resume directory)")
+    parser.add_argument("--backend", default=None, help="override the backend of the spec")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--out", default=None, help="output directory of a new sweep")
+    group.add_argument("--resume", default=None, help="output directory of a sweep to continue")
+    parser.add_argument("--dry-run", action="store_true", help="only list the runs that are left")
+    args = parser.parse_args()
+
+    if args.resume:
+        out_dir = pathlib.Path(args.resume)
+        spec = load_spec(args.spec or out_dir / "spec.json")
+    else:
+        out_dir = pathlib.Path(args.out or f"bench-out/bench-tpc-h-{int(time.time())}")
+        spec = load_spec(args.spec or DEFAULT_SPEC)
+    if args.backend:
+        spec["backend"] = args.backend
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_json(out_dir / "spec.json", spec)
+
+    exit(run_sweep(spec, out_dir, args.dry_run))
@@ -0,0 +1,23 @@
+"""Compare a candidate SSB benchmark log against a baseline.
+
+Usage: python plots/compare.py <baseline log> <candidate log> [--threshold 0.05]
+"""
+import argparse
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+import regression
+from plotter import read_data, make_configurations
+
+
+def load_samples(file):
+    return {c.key: [m.elapsed_time for m in c.measurements] for c in make_configurations(read_data(file))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect latency regressions between two SSB runs")
+    regression.add_arguments(parser)
+    args = parser.parse_args()
+
+    exit(regression.run(args, load_samples(args.baseline), load_samples(args.candidate)))
@@ -0,0 +1,174 @@
+"""Export DuckDB operator profiles for standard flamegraph viewers.
+
+Writes folded stacks (flamegraph.pl, inferno, speedscope), Chrome trace
+event JSON (chrome://tracing, Perfetto) or speedscope JSON. Operator timings
+are self times, so a node's width is its own time plus its children's.
+The trace timeline is synthetic: children are laid out back to back from
+their parent's start, since profiles carry durations rather than
+timestamps.
+
+Usage: python plots/flamegraph.py <bench file path> [--format folded|chrome|speedscope]
+                                  [--merge] [--match q1.1_sf100]
+"""
+import argparse
+from collections import defaultdict
+import json
+
+from plotter import read_data, make_configurations, work_dir
+
+
+FORMATS = {"folded": "folded", "chrome": "json", "speedscope": "speedscope.json"}
+
+
+def node_paths(operators):
+    # Path elements carry the position among siblings so that two equal
+    # operators under one parent (e.g. both scans of a join) stay apart.
+    paths = []
+    seen_children = defaultdict(int)
+    for typ, parent in zip(operators["operator_type"], operators["parent"]):
+        position = seen_children[parent]
+        seen_children[parent] += 1
+        prefix = paths[parent] if parent >= 0 else ()
+        paths.append(prefix + ((position, typ.strip()),))
+    return paths
+
+
+def self_times(measurements):
+    # Summed over the given measurements, so passing all repetitions of a
+    # configuration merges them.
+    times = defaultdict(float)
+    for m in measurements:
+        for path, timing in zip(node_paths(m.operators), m.operators["operator_timing"]):
+            times[path] += timing
+    return dict(times)
+
+
+def to_folded(name, times):
+    lines = []
+    for path, t in times.items():
+        stack = ";".join([name] + [typ for _, typ in path])
+        lines.append(f"{stack} {round(t * 1e6)}")
+    return lines
+
+
+def layout(times):
+    children = defaultdict(list)
+    for path in times:
+        children[path[:-1]].append(path)
+
+    inclusive = {}
+    for path in sorted(times, key=len, reverse=True):
+        inclusive[path] = times[path] + sum(inclusive[c] for c in children[path])
+
+    spans = []
+    stack = [(path, 0.0) for path in sorted(children[()], reverse=True)]
+    while stack:
+        path, start = stack.pop()
+        spans.append((path, start, inclusive[path]))
+
+        offset = start
+        placed = []
+        for child in sorted(children[path]):
+            placed.append((child, offset))
+            offset += inclusive[child]
+        stack.extend(reversed(placed))
+
+    return spans
+
+
+def to_chrome_trace(profiles):
+    events = []
+    for pid, (name, times) in enumerate(profiles, start=1):
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": name}})
+        for path, start, duration in layout(times):
+            events.append({
+                "name": path[-1][1], "cat": "operator", "ph": "X", "pid": pid, "tid": 1,
+                "ts": start * 1e6, "dur": duration * 1e6,
+                "args": {"self_time_s": times[path], "depth": len(path) - 1},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def to_speedscope(profiles):
+    frames = []
+    frame_index = {}
+    out = []
+
+    for name, times in profiles:
+        events = []
+        end = 0.0
+        # Spans come out in preorder, so everything open that is not an
+        # ancestor of the next span has ended before it starts.
+        open_spans = []
+        for path, start, duration in layout(times):
+            while open_spans and path[:len(open_spans[-1][0])] != open_spans[-1][0]:
+                _, close_at, frame = open_spans.pop()
+                events.append({"type": "C", "frame": frame, "at": close_at})
+
+            typ = path[-1][1]
+            if typ not in frame_index:
+                frame_index[typ] = len(frames)
+                frames.append({"name": typ})
+            events.append({"type": "O", "frame": frame_index[typ], "at": start})
+            open_spans.append((path, start + duration, frame_index[typ]))
+            end = max(end, start + duration)
+
+        while open_spans:
+            _, close_at, frame = open_spans.pop()
+            events.append({"type": "C", "frame": frame, "at": close_at})
+
+        out.append({"type": "evented", "name": name, "unit": "seconds",
+                    "startValue": 0, "endValue": end, "events": events})
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": out,
+        "exporter": "advanced-data-systems flamegraph.py",
+    }
+
+
+def select_profiles(configs, merge, match):
+    profiles = []
+    for c in configs:
+        if match and not c.key.startswith(match):
+            continue
+        if merge:
+            profiles.append((c.key, self_times(c.measurements)))
+        else:
+            for i, m in enumerate(c.measurements):
+                profiles.append((f"{c.key}-{i}", self_times([m])))
+    return profiles
+
+
+def write(name, format, content):
+    out_dir = work_dir / "output" / format
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{name}.{FORMATS[format]}"
+    with open(out_path, "w") as f:
+        if isinstance(content, list):
+            f.write("\n".join(content) + "\n")
+        else:
+            json.dump(content, f)
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export DuckDB operator profiles as flamegraphs and traces")
+    parser.add_argument("file", help="benchmark_runner profile log")
+    parser.add_argument("--format", choices=list(FORMATS), default="folded")
+    parser.add_argument("--merge", action="store_true", help="sum the repetitions of each configuration")
+    parser.add_argument("--match", default="", help="only export configurations whose key starts with this")
+    args = parser.parse_args()
+
+    profiles = select_profiles(make_configurations(read_data(args.file)), args.merge, args.match)
+
+    if args.format == "folded":
+        # One file per profile, as flamegraph.pl renders a single stack set.
+        for name, times in profiles:
+            write(name, "folded", to_folded(name, times))
+        print(f"Wrote {len(profiles)} folded stack files to {work_dir / 'output' / 'folded'}")
+    elif args.format == "chrome":
+        print(f"Wrote {write(args.match or 'profiles', 'chrome', to_chrome_trace(profiles))}")
+    else:
+        print(f"Wrote {write(args.match or 'profiles', 'speedscope', to_speedscope(profiles))}")
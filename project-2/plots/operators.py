@@ -0,0 +1,125 @@
+"""Columnar operator analytics over flattened DuckDB profiles.
+
+All operators of a configuration's repetitions are concatenated into NumPy
+columns once (see Configuration.operators), and the analyses below work on
+those arrays instead of walking profile trees.
+"""
+from dataclasses import dataclass
+import sys
+
+import numpy as np
+
+
+@dataclass
+class OperatorTable:
+    measurement: np.ndarray
+    operator_type: np.ndarray
+    depth: np.ndarray
+    parent: np.ndarray
+    timing: np.ndarray
+    cardinality: np.ndarray
+    repetitions: int
+
+    @staticmethod
+    def from_measurements(measurements):
+        columns = {k: [] for k in ["measurement", "operator_type", "depth", "parent", "timing", "cardinality"]}
+
+        offset = 0
+        for i, m in enumerate(measurements):
+            ops = m.operators
+            n = len(ops["operator_type"])
+            columns["measurement"].append(np.full(n, i))
+            columns["operator_type"].append(np.array(ops["operator_type"], dtype=str))
+            columns["depth"].append(np.array(ops["depth"], dtype=int))
+            # Parent indices are made global so they stay valid after
+            # concatenating the repetitions.
+            parent = np.array(ops["parent"], dtype=int)
+            columns["parent"].append(np.where(parent < 0, -1, parent + offset))
+            columns["timing"].append(np.array(ops["operator_timing"], dtype=float))
+            columns["cardinality"].append(np.array(ops["operator_cardinality"], dtype=float))
+            offset += n
+
+        return OperatorTable(**{k: np.concatenate(v) if v else np.array([]) for k, v in columns.items()},
+                             repetitions=len(measurements))
+
+    def distribution(self):
+        # Average time per operator type over repetitions.
+        types, inverse = np.unique(self.operator_type, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.timing, minlength=len(types))
+        return dict(zip(types.tolist(), (totals / self.repetitions).tolist()))
+
+    def shares(self):
+        distribution = self.distribution()
+        total = sum(distribution.values())
+        return {typ: t / total for typ, t in distribution.items()} if total > 0 else {}
+
+    def critical_path(self):
+        # Plans of one configuration have the same shape in every repetition,
+        # so node timings are averaged position-wise before searching for the
+        # most expensive root-to-leaf chain.
+        first = np.flatnonzero(self.measurement == 0)
+        timing = self.timing[first]
+        sizes = np.bincount(self.measurement, minlength=self.repetitions)
+        if np.all(sizes == len(first)):
+            timing = self.timing.reshape(self.repetitions, len(first)).mean(axis=0)
+
+        # The first repetition starts at offset 0, so its parent indices are
+        # already local.
+        parent = self.parent[first]
+        cost = np.zeros(len(first))
+        for i in range(len(first)):
+            cost[i] = timing[i] + (cost[parent[i]] if parent[i] >= 0 else 0)
+
+        path = []
+        node = int(np.argmax(cost)) if len(cost) else -1
+        while node >= 0:
+            path.append((str(self.operator_type[first][node]), float(timing[node])))
+            node = int(parent[node])
+        return path[::-1]
+
+
+def operator_growth(cube, query, threads):
+    # Fitted exponent k of time ~ SF^k per operator type, fastest growing
+    # first.
+    cells = cube.slice(query=query, threads=threads)
+    sfs = np.array([cell.config.scaling_factor for cell in cells], dtype=float)
+    distributions = [cell.config.operators.distribution() for cell in cells]
+    types = sorted(set(t for d in distributions for t in d))
+
+    growth = {}
+    for typ in types:
+        ys = np.array([d.get(typ, 0) for d in distributions])
+        present = ys > 0
+        if present.sum() < 2:
+            continue
+        growth[typ] = float(np.polyfit(np.log(sfs[present]), np.log(ys[present]), 1)[0])
+
+    return sorted(growth.items(), key=lambda x: x[1], reverse=True)
+
+
+def print_report(cube, queries):
+    for q in queries:
+        print(f"Q{q}")
+        for threads in cube.values("threads"):
+            for cell in cube.slice(query=q, threads=threads):
+                ops = cell.config.operators
+                shares = sorted(ops.shares().items(), key=lambda x: x[1], reverse=True)
+                path = " -> ".join(f"{typ.strip()} ({t:.3f}s)" for typ, t in ops.critical_path())
+
+                print(f"  SF{cell.config.scaling_factor}, {threads} threads")
+                print("    share: " + ", ".join(f"{typ.strip()} {s * 100:.1f}%" for typ, s in shares))
+                print(f"    critical path: {path}")
+
+            growth = operator_growth(cube, q, threads)
+            print(f"  growth with SF ({threads} threads): " + ", ".join(f"{typ.strip()} ^{k:.2f}" for typ, k in growth))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python operators.py <bench file path> [query...]")
+        exit(1)
+
+    from plotter import read_data, make_configurations, make_cube
+
+    cube = make_cube(make_configurations(read_data(sys.argv[1])))
+    print_report(cube, sys.argv[2:] or cube.values("query"))
@@ -1,14 +1,24 @@
-from typing import Any
-from matplotlib.font_manager import json
-import matplotlib.pyplot as plt
+import argparse
 from dataclasses import dataclass
+from functools import cached_property
 from itertools import groupby
 import sys
 import pathlib
 import numpy as np
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from results_store import ResultsStore
+from ingest import report_errors
+from profiles import iter_profiles
+from cube import Cube
+from stats import check_repetitions, error_bars
+from operators import OperatorTable
+import summary
+
 
 work_dir = pathlib.Path(__file__).parent.resolve()
+# Repetitions per configuration of the benchmark runs.
+REPETITIONS = 5
 
 
 def make_out_path(name, format):
@@ -17,6 +27,8 @@ def make_out_path(name, format):
 
 
 def save_plot(name, **kwargs):
+    import matplotlib.pyplot as plt
+
     format = "pdf"
 
     if not (work_dir / "output").exists():
@@ -39,37 +51,32 @@ class Measurement:
     threads: str
     scaling_factor: str
     elapsed_time: float
-    profile: Any
+    name: str
+    operators: dict[str, list]
+
+    @staticmethod
+    def from_profile(name: str, timing: float, operators: dict[str, list]):
+        q_str, sf_str, t_str = name.split("_")
+        return Measurement(
+            query=q_str.replace("q", ""),
+            scaling_factor=sf_str.replace("sf", ""),
+            threads=t_str.replace("threads", ""),
+            elapsed_time=timing,
+            name=name,
+            operators=operators
+        )
+
+    @staticmethod
+    def iter_file(file: str):
+        for name, timing, operators in iter_profiles(file):
+            yield Measurement.from_profile(name, timing, operators)
 
     @staticmethod
     def from_file(file: str):
-        profilings = []
-        with open(file) as f:
-            buffer = []
-
-            for line in f:
-                buffer.append(line)
-
-                if line.rstrip() == "}":
-                    profile = json.loads(''.join(buffer))
-                    profilings.append(profile)
-                    buffer.clear()
-
-        measurements = []
-        for profile in profilings:
-            q_str, sf_str, t_str = profile["benchmark_name"].split("_")
-            measurements.append(Measurement(
-                query=q_str.replace("q", ""),
-                scaling_factor=sf_str.replace("sf", ""),
-                threads=t_str.replace("threads", ""),
-                elapsed_time=profile["operator_timing"],
-                profile=profile
-            ))
-
-        return measurements
+        return list(Measurement.iter_file(file))
 
     def configuration_key(self):
-        return self.profile["benchmark_name"]
+        return self.name
 
 
 @dataclass
@@ -88,70 +95,47 @@ class Configuration:
     def average_by(self, key: str):
         return sum([getattr(m, key) for m in self.measurements]) / len(self.measurements)
 
-    def get_operator_distribution(self):
-        averaged_agg = {}
-
-        for m in self.measurements:
-            agg = self.get_operator_distribution_for_measurement(m)
-            for k, v in agg.items():
-                if k not in averaged_agg:
-                    averaged_agg[k] = 0
-                averaged_agg[k] += v
-
-        for k in averaged_agg:
-            averaged_agg[k] /= len(self.measurements)
-
-        return averaged_agg
+    @cached_property
+    def operators(self):
+        return OperatorTable.from_measurements(self.measurements)
 
-    def get_operator_distribution_for_measurement(self, measurement: Measurement):
-        agg = {}
-
-        def rec(op):
-            typ, timing = op["operator_type"], op["operator_timing"]
-            if typ not in agg:
-                agg[typ] = 0
-            agg[typ] += timing
-            for op in op["children"]:
-                rec(op)
-
-        for op in measurement.profile["children"]:
-            rec(op)
-
-        return agg
-
-
-def get_queries(configs: list[Configuration]):
-    return sorted(set(c.query for c in configs))
-
-
-def get_threads(configs: list[Configuration]):
-    return sorted(set(c.threads for c in configs))
+    def get_operator_distribution(self):
+        return self.operators.distribution()
 
 
-def get_scaling_factors(configs: list[Configuration]):
-    return sorted(set(c.scaling_factor for c in configs))
+def make_cube(configs: list[Configuration]):
+    return Cube(configs, {
+        "query": lambda c: c.query,
+        "threads": lambda c: c.threads,
+        "scaling_factor": lambda c: c.scaling_factor,
+    }, metrics=["elapsed_time"])
 
 
 DEFAULT_QUERIES = ["1.3", "3.1", "4.2"]
 
 
-def plot_latency(configs: list[Configuration]):
+def plot_latency(cube: Cube):
     # y_max = max(max(m.elapsed_time for m in c.measurements) for c in configs)
 
-    for q in get_queries(configs):
+    import matplotlib.pyplot as plt
+
+    for q in cube.values("query"):
         plt.figure()
         ax = plt.gca()
 
-        for i, t in enumerate(get_threads(configs)):
-            cs = [c for c in configs if c.query == q and c.threads == t]
-            cs.sort(key=lambda x: x.scaling_factor)
+        for i, t in enumerate(cube.values("threads")):
+            cells = cube.slice(query=q, threads=t)
 
-            xs = [c.scaling_factor for c in cs]
-            ys = [c.average_by("elapsed_time") for c in cs]
+            xs = [cell.config.scaling_factor for cell in cells]
+            ys = [cell.means["elapsed_time"] for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
             marker, facecolor = MARKERS[i]
-            plt.loglog(xs, ys, f'-{marker}',
-                       markerfacecolor=facecolor, label=f"{t} threads")
+            plt.errorbar(xs, ys, yerr=yerr, fmt=f'-{marker}', capsize=3,
+                         markerfacecolor=facecolor, label=f"{t} threads")
+
+        plt.xscale("log")
+        plt.yscale("log")
 
         plt.title(f"Query {q} latency")
 
@@ -162,37 +146,42 @@ def plot_latency(configs: list[Configuration]):
         save_plot("latency-q" + q)
 
 
-def plot_all_latencies(configs: list[Configuration]):
-    for threads in get_threads(configs):
-        for scaling_factor in get_scaling_factors(configs):
+def plot_all_latencies(cube: Cube):
+    import matplotlib.pyplot as plt
+
+    queries = cube.values("query")
+
+    for threads in cube.values("threads"):
+        for scaling_factor in cube.values("scaling_factor"):
             fig = plt.subplots(layout="constrained")
             ax = plt.gca()
 
-            x = np.arange(len(get_queries(configs)))  # the label locations
+            x = np.arange(len(queries))  # the label locations
             width = 1  # the width of the bars
 
-            cs = [c for c in configs if c.threads ==
-                  threads and c.scaling_factor == scaling_factor]
-            cs.sort(key=lambda x: x.query)
+            cells = cube.slice(threads=threads, scaling_factor=scaling_factor)
 
-            assert len(cs) == len(get_queries(configs))
+            assert len(cells) == len(queries)
 
-            ys = [c.average_by("elapsed_time") for c in cs]
+            ys = [cell.means["elapsed_time"] for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
-            ax.bar(x, ys, width - 0.3, zorder=3, color="lightblue",
+            ax.bar(x, ys, width - 0.3, yerr=yerr, capsize=3, zorder=3, color="lightblue",
                    edgecolor="black", linewidth=2, hatch="...")
 
             ax.grid(zorder=0)
             ax.set_ylabel('Latency (seconds)')
             ax.set_title(f'Query latencies (scaling factor {scaling_factor}, {threads} threads)')
-            ax.set_xticks(x, [f"Q{q}" for q in sorted(get_queries(configs))])
+            ax.set_xticks(x, [f"Q{q}" for q in queries])
 
             save_plot(f"all-latency-t{threads}-{str(scaling_factor)}")
 
 
-def plot_grouped_latencies(configs: list[Configuration], queries=DEFAULT_QUERIES):
+def plot_grouped_latencies(cube: Cube, queries=DEFAULT_QUERIES):
+    import matplotlib.pyplot as plt
+
     queries = sorted(queries)
-    for threads in get_threads(configs):
+    for threads in cube.values("threads"):
         fig = plt.subplots(layout="constrained", figsize=(max(len(queries)*0.8, 5), 4))
         ax = plt.gca()
 
@@ -201,18 +190,17 @@ def plot_grouped_latencies(configs: list[Configuration], queries=DEFAULT_QUERIES
         x = np.arange(len(queries))  # the label locations
         width = 0.25  # the width of the bars
 
-        for i, scaling_factor in enumerate(get_scaling_factors(configs)):
-            cs = [c for c in configs if c.threads ==
-                  threads and c.scaling_factor == scaling_factor and c.query in queries]
-            cs.sort(key=lambda x: x.query)
+        for i, scaling_factor in enumerate(cube.values("scaling_factor")):
+            cells = cube.slice(threads=threads, scaling_factor=scaling_factor, query=queries)
 
-            assert len(cs) == len(queries)
+            assert len(cells) == len(queries)
 
             offset = i * width
 
-            ys = [c.average_by("elapsed_time") * 1000 / scaling_factor for c in cs]
+            ys = [cell.means["elapsed_time"] * 1000 / scaling_factor for cell in cells]
+            yerr = error_bars([cell.stats["elapsed_time"] for cell in cells], 1000 / scaling_factor)
 
-            ax.bar(x + offset, ys, width-0.01, zorder=3, label=f"SF {scaling_factor}",
+            ax.bar(x + offset, ys, width-0.01, yerr=yerr, capsize=3, zorder=3, label=f"SF {scaling_factor}",
                    hatch=patterns[i], edgecolor="black", linewidth=2)
             # , color="lightblue",
             #        edgecolor="black", linewidth=2, hatch="...")
@@ -227,7 +215,9 @@ def plot_grouped_latencies(configs: list[Configuration], queries=DEFAULT_QUERIES
         save_plot(f"{'-'.join(queries)}-all-latency-t{threads}")
 
 
-def plot_by_threads(configs: list[Configuration], queries=DEFAULT_QUERIES):
+def plot_by_threads(cube: Cube, queries=DEFAULT_QUERIES):
+    import matplotlib.pyplot as plt
+
     queries = sorted(queries)
 
     scaling_factor = 100
@@ -239,17 +229,17 @@ def plot_by_threads(configs: list[Configuration], queries=DEFAULT_QUERIES):
     x = np.arange(len(queries))  # the label locations
     width = 0.25  # the width of the bars
 
-    for i, threads in enumerate(get_threads(configs)):
-        cs = [c for c in configs if c.threads == threads and c.scaling_factor == scaling_factor and c.query in queries]
-        cs.sort(key=lambda x: x.query)
+    for i, threads in enumerate(cube.values("threads")):
+        cells = cube.slice(threads=threads, scaling_factor=scaling_factor, query=queries)
 
-        assert len(cs) == len(queries)
+        assert len(cells) == len(queries)
 
         offset = i * width
 
-        ys = [c.average_by("elapsed_time") for c in cs]
+        ys = [cell.means["elapsed_time"] for cell in cells]
+        yerr = error_bars([cell.stats["elapsed_time"] for cell in cells])
 
-        ax.bar(x + offset, ys, width-0.01, zorder=3, label=f"{threads} threads",
+        ax.bar(x + offset, ys, width-0.01, yerr=yerr, capsize=3, zorder=3, label=f"{threads} threads",
                hatch=patterns[i], edgecolor="black", linewidth=2)
 
     ax.grid(zorder=0)
@@ -262,7 +252,9 @@ def plot_by_threads(configs: list[Configuration], queries=DEFAULT_QUERIES):
     save_plot('-'.join(queries) + f"latency-threads")
 
 
-def plot_operators(configs: list[Configuration], queries=DEFAULT_QUERIES):
+def plot_operators(cube: Cube, queries=DEFAULT_QUERIES):
+    import matplotlib.pyplot as plt
+
     patterns = ["o", "//", "*"]
 
     # for q in queries:
@@ -317,27 +309,29 @@ def plot_operators(configs: list[Configuration], queries=DEFAULT_QUERIES):
 
 
     for q in queries:
-        ymax = max(max(c.get_operator_distribution().values()) for c in configs if c.query == q)
-
-        tmp_ops = [c for c in configs if c.query == q][0].get_operator_distribution()
+        query_cells = cube.slice(query=q)
+        ymax = max(max(cell.config.get_operator_distribution().values()) for cell in query_cells)
+
+        # Operators are labelled and ordered by the largest scaling factor
+        # on a single thread.
+        baseline = cube.slice(query=q, scaling_factor=max(cube.values("scaling_factor")),
+                              threads=min(cube.values("threads")))[0]
+        tmp_ops = baseline.config.get_operator_distribution()
         op_labels = sorted(tmp_ops.keys(), key=lambda x: tmp_ops[x], reverse=True)
 
-        for scaling_factor in get_scaling_factors(configs):
+        for scaling_factor in cube.values("scaling_factor"):
             fig = plt.subplots(layout="constrained", figsize=(6, 4))
             ax = plt.gca()
 
-            pcs = [c for c in configs if c.scaling_factor == scaling_factor and c.query == q]
-            assert len(pcs) == len(get_threads(configs))
+            pcs = cube.slice(scaling_factor=scaling_factor, query=q)
+            assert len(pcs) == len(cube.values("threads"))
 
             width = 0.75
             x = np.arange(len(tmp_ops))
 
-            for i, threads in enumerate(get_threads(configs)):
-                cs = [c for c in pcs if c.threads == threads]
-                assert len(cs) == 1
-                c = cs[0]
-
-                ops = c.get_operator_distribution()
+            for i, cell in enumerate(pcs):
+                threads = cell.config.threads
+                ops = cell.config.get_operator_distribution()
 
                 ys = [ops.get(op, 0) / threads for op in op_labels]
                 width = 0.25
@@ -367,38 +361,53 @@ def plot_operators(configs: list[Configuration], queries=DEFAULT_QUERIES):
 
 
 
+def make_configurations(measurements: list[Measurement]):
+    configurations = [Configuration(key=k, measurements=list(g)) for k, g in groupby(
+        sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key())]
+    configurations.sort(key=lambda x: x.key)
+    return configurations
+
+
 def read_data(file):
-    rows = Measurement.from_file(file)
+    with ResultsStore(work_dir / "output" / "results.sqlite") as store:
+        rows, errors = store.load([file], Measurement, Measurement.from_file)
+
+    report_errors(errors)
     print(f"Loaded {len(rows)} experiments")
     return rows
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python plotter.py <bench file path>")
+    parser = argparse.ArgumentParser(description="Plot the SSB benchmarks")
+    parser.add_argument("file", help="bench file path")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS,
+                        help="expected repetitions per configuration, 0 to take the most common count "
+                             "(e.g. for adaptive runs)")
+    summary.add_argument(parser)
+    args = parser.parse_args()
+
+    measurements = read_data(args.file)
+
+    configurations = make_configurations(measurements)
+
+    if not configurations:
+        print(f"No measurements loaded from {args.file}")
         exit(1)
 
-    measurements = read_data(sys.argv[1])
+    check_repetitions(configurations, args.repetitions)
 
-    configurations = [Configuration(key=k, measurements=list(g)) for k, g in groupby(
-        sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key())]
-    configurations.sort(key=lambda x: x.key)
+    if args.summary:
+        summary.print_summary(configurations, "elapsed_time", unit="ms", scale=1000, style=args.summary)
+        exit(0)
 
-    REPETITIONS = 5
-    for c in configurations:
-        if len(c.measurements) != REPETITIONS:
-            print(
-                f"Missing measurements for {c.key}, only has {len(c.measurements)}")
-            break
-    else:
-        print(f"All configurations have {REPETITIONS} repetitions, good")
+    cube = make_cube(configurations)
 
-    # plot_latency(configurations)
-    # plot_all_latencies(configurations)
+    # plot_latency(cube)
+    # plot_all_latencies(cube)
 
-    plot_grouped_latencies(configurations)
-    plot_by_threads(configurations)
-    plot_grouped_latencies(configurations, get_queries(configurations))
-    plot_by_threads(configurations, get_queries(configurations))
+    plot_grouped_latencies(cube)
+    plot_by_threads(cube)
+    plot_grouped_latencies(cube, cube.values("query"))
+    plot_by_threads(cube, cube.values("query"))
 
-    plot_operators(configurations)
+    plot_operators(cube)
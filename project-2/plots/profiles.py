@@ -0,0 +1,111 @@
+"""Streaming reader for DuckDB benchmark_runner profile logs.
+
+Profiles are decoded one at a time straight from file chunks, and each tree
+is flattened into a few columns before the next one is read, so memory stays
+bounded by the largest single profile rather than the whole log.
+"""
+import json
+
+
+CHUNK_SIZE = 1 << 20
+
+OPERATOR_COLUMNS = ["operator_type", "operator_timing", "operator_cardinality", "depth", "parent"]
+
+# How close to the end of the buffer a decode error has to be before it is
+# treated as a truncated object rather than malformed input.
+TRUNCATION_MARGIN = 8
+
+
+def iter_json_objects(f, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    while True:
+        start = buffer.find("{")
+        if start == -1:
+            if eof:
+                return
+            buffer = f.read(chunk_size)
+            eof = not buffer
+            continue
+
+        buffer = buffer[start:]
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            truncated = e.pos >= len(buffer) - TRUNCATION_MARGIN or e.msg.startswith("Unterminated string")
+            if truncated and not eof:
+                # Grow geometrically so a huge profile is not re-decoded
+                # once per chunk.
+                chunk = f.read(max(chunk_size, len(buffer)))
+                eof = not chunk
+                buffer += chunk
+            else:
+                buffer = buffer[1:]
+            continue
+
+        yield obj
+        buffer = buffer[end:]
+
+
+def flatten_profile(profile):
+    columns = {k: [] for k in OPERATOR_COLUMNS}
+
+    stack = [(op, 0, -1) for op in reversed(profile["children"])]
+    while stack:
+        op, depth, parent = stack.pop()
+        index = len(columns["operator_type"])
+
+        columns["operator_type"].append(op["operator_type"])
+        columns["operator_timing"].append(op["operator_timing"])
+        columns["operator_cardinality"].append(op.get("operator_cardinality", op.get("cardinality", 0)))
+        columns["depth"].append(depth)
+        columns["parent"].append(parent)
+
+        for child in reversed(op["children"]):
+            stack.append((child, depth + 1, index))
+
+    return columns
+
+
+def iter_profiles(file, chunk_size=CHUNK_SIZE):
+    with open(file) as f:
+        for profile in iter_json_objects(f, chunk_size):
+            if "benchmark_name" not in profile:
+                continue
+            yield profile["benchmark_name"], profile["operator_timing"], flatten_profile(profile)
+
+
+# Older DuckDB releases name the plan nodes "name"/"timing"/"cardinality"
+# and wrap the plan in a pseudo operator; newer ones use the operator_*
+# keys and report the query time as "latency".
+PSEUDO_OPERATORS = {"QUERY", "EXPLAIN_ANALYZE", "RESULT_COLLECTOR"}
+
+
+def normalize_node(node):
+    return {
+        "operator_type": node.get("operator_type", node.get("name", "")),
+        "operator_timing": node.get("operator_timing", node.get("timing", 0)),
+        "operator_cardinality": node.get("operator_cardinality", node.get("cardinality", 0)),
+        "children": [normalize_node(child) for child in node.get("children", [])],
+    }
+
+
+def normalize_profile(profile, benchmark_name, timing=None):
+    # Returns the profile in the shape benchmark_runner logs it and
+    # iter_profiles reads.
+    children = profile.get("children", [])
+    if "tree" in profile:
+        children = [profile["tree"]]
+    while len(children) == 1 and children[0].get("name", children[0].get("operator_type", "")).upper() in PSEUDO_OPERATORS:
+        children = children[0].get("children", [])
+
+    if timing is None:
+        timing = profile.get("latency", profile.get("operator_timing", profile.get("timing", 0)))
+
+    return {
+        "benchmark_name": benchmark_name,
+        "operator_timing": timing,
+        "children": [normalize_node(child) for child in children],
+    }
@@ -0,0 +1,190 @@
+"""CPU, memory and I/O of the SSB runs.
+
+Reads the profile log of scripts/run_ssb.py --resources and the
+<log>.resources.csv series sampled next to it. For every query run the
+CPU-seconds, the cores kept busy (CPU-seconds over latency), the peak RSS,
+the bytes read and the context switches are taken from the series between
+the start and end of the run, and averaged per query, thread count and
+scale factor. Parallel efficiency is the busy cores over the thread count,
+so a thread sweep shows whether 8 threads were really busy or waiting.
+
+The timeline plot overlays CPU utilization and RSS on the query runs; the
+utilization plot compares busy cores with the thread count per query.
+
+Usage: python plots/resources.py <bench file path> [--resources <series.csv>] [--summary [markdown]]
+"""
+import argparse
+from dataclasses import dataclass
+import re
+
+import numpy as np
+
+from plotter import save_plot, MARKERS
+from profiles import iter_json_objects
+from scaling import write_tex_table
+from sampler import cpu_seconds, read_series, resources_path, utilization
+import summary
+
+
+@dataclass
+class Run:
+    name: str
+    query: str
+    threads: int
+    scaling_factor: int
+    elapsed_time: float
+    started_at: float
+    ended_at: float
+    cpu_seconds: float = 0.0
+    peak_rss: float = 0.0
+    read_bytes: float = 0.0
+    voluntary_switches: float = 0.0
+    involuntary_switches: float = 0.0
+
+    @property
+    def cores_busy(self):
+        return self.cpu_seconds / self.elapsed_time if self.elapsed_time else 0.0
+
+
+def read_runs(file):
+    runs = []
+    with open(file) as f:
+        for entry in iter_json_objects(f):
+            if "benchmark_name" not in entry or "started_at" not in entry:
+                continue
+            q_str, sf_str, t_str = entry["benchmark_name"].split("_")
+            runs.append(Run(entry["benchmark_name"], q_str.replace("q", ""), int(t_str.replace("threads", "")),
+                            int(sf_str.replace("sf", "")), entry["operator_timing"], entry["started_at"],
+                            entry["ended_at"]))
+    return runs
+
+
+def delta(series, column, start, end):
+    values = np.interp([start, end], series["time"], series[column])
+    return float(values[1] - values[0])
+
+
+def attach_resources(runs: list[Run], series):
+    # Runs outside the sampled time span, e.g. from earlier runs appended
+    # to the same log without --resources, are dropped.
+    covered = []
+    for run in runs:
+        if run.started_at < series["time"][0] or run.ended_at > series["time"][-1]:
+            continue
+        run.cpu_seconds = cpu_seconds(series, run.started_at, run.ended_at)
+        window = (series["time"] >= run.started_at) & (series["time"] <= run.ended_at)
+        run.peak_rss = float(series["rss_bytes"][window].max()) if window.any() else 0.0
+        run.read_bytes = delta(series, "read_bytes", run.started_at, run.ended_at)
+        run.voluntary_switches = delta(series, "voluntary_switches", run.started_at, run.ended_at)
+        run.involuntary_switches = delta(series, "involuntary_switches", run.started_at, run.ended_at)
+        covered.append(run)
+    return covered
+
+
+def query_order(query):
+    # 1.1 < 1.2 < 1.10, variants (1.1-v02) after their query.
+    return [int(x) if x.isdigit() else x for x in re.split(r"[.-]v?", query)]
+
+
+def group_runs(runs: list[Run]):
+    groups = {}
+    for run in runs:
+        groups.setdefault((run.query, run.threads, run.scaling_factor), []).append(run)
+    return dict(sorted(groups.items(), key=lambda item: (query_order(item[0][0]), item[0][2], item[0][1])))
+
+
+def resource_table(groups):
+    header = ["Query", "Threads", "SF", "n", "Latency (ms)", "CPU (s)", "Cores busy", "Efficiency",
+              "Peak RSS (MB)", "Read (MB)", "Switches (vol./invol.)"]
+
+    rows = []
+    for (query, threads, scaling_factor), runs in groups.items():
+        busy = np.mean([r.cores_busy for r in runs])
+        rows.append([
+            f"Q{query}", str(threads), str(scaling_factor), str(len(runs)),
+            f"{np.mean([r.elapsed_time for r in runs]) * 1000:.1f}",
+            f"{np.mean([r.cpu_seconds for r in runs]):.3f}",
+            f"{busy:.2f}", f"{busy / threads * 100:.0f}%",
+            f"{max(r.peak_rss for r in runs) / 1024 ** 2:.0f}",
+            f"{np.mean([r.read_bytes for r in runs]) / 1024 ** 2:.1f}",
+            f"{np.mean([r.voluntary_switches for r in runs]):.0f}/{np.mean([r.involuntary_switches for r in runs]):.0f}",
+        ])
+    return header, rows
+
+
+def plot_timeline(series, runs: list[Run]):
+    import matplotlib.pyplot as plt
+
+    start = series["time"][0]
+    fig, (cpu_ax, rss_ax) = plt.subplots(2, 1, sharex=True, layout="constrained", figsize=(10, 5))
+
+    times, busy = utilization(series)
+    cpu_ax.plot(times - start, busy, linewidth=0.8, color="black", label="CPU")
+    threads = sorted(set(r.threads for r in runs))
+    colors = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+    for i, t in enumerate(threads):
+        for j, run in enumerate(r for r in runs if r.threads == t):
+            cpu_ax.axvspan(run.started_at - start, run.ended_at - start, color=colors[i % len(colors)], alpha=0.3,
+                           linewidth=0, label=f"{t} threads" if j == 0 else None)
+    cpu_ax.set_ylabel("Cores busy")
+    cpu_ax.set_title("CPU utilization and memory over the run")
+    cpu_ax.grid()
+    cpu_ax.legend(fontsize="small", ncols=len(threads) + 1)
+
+    rss_ax.plot(series["time"] - start, series["rss_bytes"] / 1024 ** 2, color="black", linewidth=0.8)
+    rss_ax.set_ylabel("RSS (MB)")
+    rss_ax.set_xlabel("Time (s)")
+    rss_ax.grid()
+
+    save_plot("resources-timeline")
+
+
+def plot_utilization(groups, scaling_factor):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    queries = sorted(set(q for q, _, sf in groups if sf == scaling_factor), key=query_order)
+    all_threads = sorted(set(t for _, t, sf in groups if sf == scaling_factor))
+
+    for i, query in enumerate(queries):
+        keys = [(query, t, scaling_factor) for t in all_threads if (query, t, scaling_factor) in groups]
+        xs = [t for _, t, _ in keys]
+        ys = [np.mean([r.cores_busy for r in groups[k]]) for k in keys]
+
+        marker, facecolor = MARKERS[i % len(MARKERS)]
+        plt.plot(xs, ys, f'-{marker}', markerfacecolor=facecolor, label=f"Q{query}")
+
+    plt.plot(all_threads, all_threads, '--', color="black", label="All threads busy")
+    plt.xscale("log", base=2)
+    plt.xticks(all_threads, [str(t) for t in all_threads])
+    plt.title(f"Cores kept busy by thread count (SF {scaling_factor})")
+    plt.xlabel("Threads")
+    plt.ylabel("Cores busy (CPU-seconds / latency)")
+    plt.grid()
+    plt.legend(fontsize="small", ncols=2)
+
+    save_plot(f"resources-utilization-sf{scaling_factor}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU, memory and I/O of the SSB runs")
+    parser.add_argument("file", help="bench file path")
+    parser.add_argument("--resources", default=None, help="sampled series (default: <bench file>.resources.csv)")
+    summary.add_argument(parser)
+    args = parser.parse_args()
+
+    series = read_series(args.resources or resources_path(args.file))
+    runs = attach_resources(read_runs(args.file), series)
+    if not runs:
+        print(f"No runs of {args.file} within the sampled series, run scripts/run_ssb.py with --resources")
+        exit(1)
+
+    groups = group_runs(runs)
+    header, rows = resource_table(groups)
+    print(summary.format_table(header, rows, args.summary or "markdown"))
+    write_tex_table("resources", header, rows)
+
+    if not args.summary:
+        plot_timeline(series, runs)
+        for scaling_factor in sorted(set(sf for _, _, sf in groups)):
+            plot_utilization(groups, scaling_factor)
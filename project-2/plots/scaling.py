@@ -0,0 +1,227 @@
+"""Thread and scale-factor scaling analysis for the SSB runs.
+
+For every query and scale factor this computes speedup and parallel
+efficiency relative to the smallest thread count, and fits Amdahl's law to
+get the serial fraction. The same is done per operator type from the
+profiles. Scale-factor scaling is reported as time per SF unit and a fitted
+complexity exponent k in time ~ SF^k.
+
+Usage: python plots/scaling.py <bench file path>
+"""
+from dataclasses import dataclass
+import sys
+
+import numpy as np
+
+from plotter import read_data, make_configurations, make_cube, make_out_path, save_plot, MARKERS
+from summary import markdown_table
+
+
+@dataclass
+class ThreadScaling:
+    threads: np.ndarray
+    times: np.ndarray
+    speedup: np.ndarray
+    efficiency: np.ndarray
+    serial_fraction: float
+
+
+@dataclass
+class ScaleFactorScaling:
+    scaling_factors: np.ndarray
+    times: np.ndarray
+    time_per_sf: np.ndarray
+    exponent: float
+
+
+def fit_amdahl(ratio, speedup):
+    # Amdahl: 1/S = f + (1 - f)/r, i.e. 1/S - 1/r = f * (1 - 1/r), fitted by
+    # least squares through the origin over the points with r > 1.
+    x = 1 - 1 / ratio
+    y = 1 / speedup - 1 / ratio
+    mask = ratio > 1
+    if not mask.any():
+        return float("nan")
+    f = np.sum(x[mask] * y[mask]) / np.sum(x[mask] ** 2)
+    return float(np.clip(f, 0, 1))
+
+
+def thread_scaling(threads, times):
+    threads = np.asarray(threads, dtype=float)
+    times = np.asarray(times, dtype=float)
+
+    ratio = threads / threads[0]
+    speedup = times[0] / times
+    return ThreadScaling(threads, times, speedup, speedup / ratio, fit_amdahl(ratio, speedup))
+
+
+def scale_factor_scaling(scaling_factors, times):
+    scaling_factors = np.asarray(scaling_factors, dtype=float)
+    times = np.asarray(times, dtype=float)
+
+    exponent = float("nan")
+    if len(scaling_factors) > 1:
+        exponent = float(np.polyfit(np.log(scaling_factors), np.log(times), 1)[0])
+    return ScaleFactorScaling(scaling_factors, times, times / scaling_factors, exponent)
+
+
+def query_thread_scaling(cube):
+    results = {}
+    for q in cube.values("query"):
+        for sf in cube.values("scaling_factor"):
+            cells = cube.slice(query=q, scaling_factor=sf)
+            results[(q, sf)] = thread_scaling(
+                [cell.config.threads for cell in cells], [cell.means["elapsed_time"] for cell in cells])
+    return results
+
+
+def operator_thread_scaling(cube, query, scaling_factor):
+    cells = cube.slice(query=query, scaling_factor=scaling_factor)
+    threads = [cell.config.threads for cell in cells]
+    distributions = [cell.config.get_operator_distribution() for cell in cells]
+
+    results = {}
+    for typ in sorted(set(t for d in distributions for t in d)):
+        # Operator timings are summed over threads in DuckDB profiles, so
+        # they are divided by the thread count to approximate wall time
+        # (as plot_operators does).
+        times = [d.get(typ, 0) / t for d, t in zip(distributions, threads)]
+        if all(x > 0 for x in times):
+            results[typ] = thread_scaling(threads, times)
+    return results
+
+
+def query_scale_factor_scaling(cube):
+    results = {}
+    for q in cube.values("query"):
+        for threads in cube.values("threads"):
+            cells = cube.slice(query=q, threads=threads)
+            results[(q, threads)] = scale_factor_scaling(
+                [cell.config.scaling_factor for cell in cells], [cell.means["elapsed_time"] for cell in cells])
+    return results
+
+
+def thread_table(cube, results):
+    threads = cube.values("threads")
+    header = ["Query", "SF"] + [f"S({t})" for t in threads[1:]] + [f"E({t})" for t in threads[1:]] + ["Serial fraction"]
+
+    rows = []
+    for (q, sf), r in results.items():
+        rows.append([f"Q{q}", str(sf)]
+                    + [f"{s:.2f}" for s in r.speedup[1:]]
+                    + [f"{e * 100:.0f}%" for e in r.efficiency[1:]]
+                    + [f"{r.serial_fraction:.3f}"])
+    return header, rows
+
+
+def operator_table(cube, scaling_factor):
+    header = ["Query", "Operator", "Speedup (max threads)", "Efficiency", "Serial fraction"]
+
+    rows = []
+    for q in cube.values("query"):
+        for typ, r in operator_thread_scaling(cube, q, scaling_factor).items():
+            rows.append([f"Q{q}", typ.strip(), f"{r.speedup[-1]:.2f}", f"{r.efficiency[-1] * 100:.0f}%",
+                         f"{r.serial_fraction:.3f}"])
+    return header, rows
+
+
+def scale_factor_table(cube, results):
+    sfs = cube.values("scaling_factor")
+    header = ["Query", "Threads"] + [f"ms/SF (SF{sf})" for sf in sfs] + ["Exponent"]
+
+    rows = []
+    for (q, threads), r in results.items():
+        rows.append([f"Q{q}", str(threads)] + [f"{t * 1000:.2f}" for t in r.time_per_sf] + [f"{r.exponent:.2f}"])
+    return header, rows
+
+
+def write_tex_table(name, header, rows):
+    lines = [
+        r"\begin{tabular}{" + "l" * len(header) + "}",
+        r"\toprule",
+        " & ".join(header).replace("%", r"\%") + r" \\",
+        r"\midrule",
+    ]
+    lines += [" & ".join(row).replace("%", r"\%") + r" \\" for row in rows]
+    lines.append(r"\bottomrule\end{tabular}")
+
+    out_path = make_out_path(name, "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def plot_speedup(cube, results, scaling_factor):
+    import matplotlib.pyplot as plt
+
+    threads = cube.values("threads")
+
+    for metric, label in [("speedup", "Speedup"), ("efficiency", "Parallel efficiency")]:
+        plt.figure()
+
+        for i, q in enumerate(cube.values("query")):
+            r = results[(q, scaling_factor)]
+            marker, facecolor = MARKERS[i % len(MARKERS)]
+            plt.plot(r.threads, getattr(r, metric), f'-{marker}', markerfacecolor=facecolor,
+                     label=f"Q{q} (f={r.serial_fraction:.2f})")
+
+        if metric == "speedup":
+            plt.plot(threads, np.array(threads) / threads[0], 'k--', label="Ideal")
+        else:
+            plt.axhline(1, color="black", linestyle="--")
+
+        plt.title(f"{label} by number of threads (SF {scaling_factor})")
+        plt.xticks(threads)
+        plt.xlabel("Threads")
+        plt.ylabel(label)
+        plt.grid()
+        plt.legend(fontsize="small", ncols=2)
+
+        save_plot(f"{metric}-sf{scaling_factor}")
+
+
+def plot_scale_factor_efficiency(cube, results, threads):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+
+    for i, q in enumerate(cube.values("query")):
+        r = results[(q, threads)]
+        marker, facecolor = MARKERS[i % len(MARKERS)]
+        plt.semilogx(r.scaling_factors, r.time_per_sf * 1000, f'-{marker}', markerfacecolor=facecolor,
+                     label=f"Q{q} (k={r.exponent:.2f})")
+
+    plt.title(f"Time per scaling factor unit ({threads} threads)")
+    plt.xlabel("Scaling Factor")
+    plt.ylabel("Latency per SF unit (ms)")
+    plt.grid()
+    plt.legend(fontsize="small", ncols=2)
+
+    save_plot(f"sf-efficiency-t{threads}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python scaling.py <bench file path>")
+        exit(1)
+
+    cube = make_cube(make_configurations(read_data(sys.argv[1])))
+    largest_sf = cube.values("scaling_factor")[-1]
+
+    threads_results = query_thread_scaling(cube)
+    sf_results = query_scale_factor_scaling(cube)
+
+    tables = {
+        "thread-scaling": thread_table(cube, threads_results),
+        f"operator-scaling-sf{largest_sf}": operator_table(cube, largest_sf),
+        "sf-scaling": scale_factor_table(cube, sf_results),
+    }
+    for name, (header, rows) in tables.items():
+        print(f"## {name}\n")
+        print(markdown_table(header, rows) + "\n")
+        write_tex_table(name, header, rows)
+
+    for sf in cube.values("scaling_factor"):
+        plot_speedup(cube, threads_results, sf)
+    for threads in cube.values("threads"):
+        plot_scale_factor_efficiency(cube, sf_results, threads)
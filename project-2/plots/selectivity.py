@@ -0,0 +1,115 @@
+"""Query latency as a function of selectivity.
+
+Reads the profile log of a run over the variants of scripts/ssb_variants.py
+and the variants.json manifest next to them. For every query, thread count
+and scale factor it plots latency against the measured selectivity of the
+variants, with the selectivity of the original query marked, and reports
+the fitted slope of log latency over log selectivity (0 means the latency
+does not depend on the filter, 1 means it grows linearly with the rows
+that pass).
+
+Usage: python plots/selectivity.py <bench file path> <variants.json>
+"""
+import json
+import sys
+
+import numpy as np
+
+from plotter import read_data, make_configurations, make_cube, save_plot, MARKERS
+from scaling import write_tex_table
+from summary import markdown_table
+from stats import error_bars
+
+
+def read_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    variants = {v["name"]: v for v in manifest["variants"]}
+    return variants, manifest["queries"]
+
+
+def selectivity_series(cube, variants):
+    # {(query, threads, scaling factor): (selectivities, cells)} for the
+    # base queries, ordered by selectivity.
+    series = {}
+    for name in cube.values("query"):
+        if name not in variants:
+            continue
+        query = variants[name]["query"]
+        for threads in cube.values("threads"):
+            for scaling_factor in cube.values("scaling_factor"):
+                cells = cube.slice(query=name, threads=threads, scaling_factor=scaling_factor)
+                if cells:
+                    series.setdefault((query, threads, scaling_factor), []).append((variants[name]["selectivity"], cells[0]))
+
+    return {key: sorted(points, key=lambda p: p[0]) for key, points in series.items()}
+
+
+def fit_slope(selectivities, times):
+    selectivities = np.asarray(selectivities, dtype=float)
+    times = np.asarray(times, dtype=float)
+    mask = selectivities > 0
+    if mask.sum() < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(selectivities[mask]), np.log(times[mask]), 1)[0])
+
+
+def selectivity_table(series, queries):
+    header = ["Query", "Column", "Threads", "SF", "Selectivity", "Latency (ms)", "Slope"]
+
+    rows = []
+    for (query, threads, scaling_factor), points in series.items():
+        selectivities = [s for s, _ in points]
+        times = [cell.means["elapsed_time"] for _, cell in points]
+        rows.append([f"Q{query}", queries[query]["column"], str(threads), str(scaling_factor),
+                     f"{selectivities[0]:.1e} - {selectivities[-1]:.1e}",
+                     f"{times[0] * 1000:.1f} - {times[-1] * 1000:.1f}",
+                     f"{fit_slope(selectivities, times):.2f}"])
+    return header, rows
+
+
+def plot_selectivity(series, queries, query, scaling_factor):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+
+    for i, ((q, threads, sf), points) in enumerate((k, v) for k, v in series.items()
+                                                   if k[0] == query and k[2] == scaling_factor):
+        xs = [s for s, _ in points]
+        ys = [cell.means["elapsed_time"] * 1000 for _, cell in points]
+        yerr = error_bars([cell.stats["elapsed_time"] for _, cell in points]) * 1000
+
+        marker, facecolor = MARKERS[i % len(MARKERS)]
+        plt.errorbar(xs, ys, yerr=yerr, fmt=f'-{marker}', capsize=3, markerfacecolor=facecolor,
+                     label=f"{threads} threads")
+
+    plt.axvline(queries[query]["selectivity"], color="black", linestyle="--", label="Original query")
+    plt.xscale("log")
+    plt.yscale("log")
+    plt.title(f"Q{query} latency by selectivity of {queries[query]['column']} (SF {scaling_factor})")
+    plt.xlabel("Selectivity")
+    plt.ylabel("Query Latency (ms)")
+    plt.grid()
+    plt.legend()
+
+    save_plot(f"selectivity-q{query}-sf{scaling_factor}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python selectivity.py <bench file path> <variants.json>")
+        exit(1)
+
+    variants, queries = read_manifest(sys.argv[2])
+    cube = make_cube(make_configurations(read_data(sys.argv[1])))
+    series = selectivity_series(cube, variants)
+    if not series:
+        print(f"No runs of the variants in {sys.argv[2]} found")
+        exit(1)
+
+    header, rows = selectivity_table(series, queries)
+    print(markdown_table(header, rows))
+    write_tex_table("selectivity", header, rows)
+
+    for query, scaling_factor in sorted(set((k[0], k[2]) for k in series)):
+        plot_selectivity(series, queries, query, scaling_factor)
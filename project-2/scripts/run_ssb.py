@@ -0,0 +1,222 @@
+"""Run the SSB queries in embedded DuckDB with a thread and scale-factor sweep.
+
+A Python stand-in for benchmark_runner with generated .benchmark files, so
+no DuckDB build with BUILD_BENCHMARK=1 is needed. Each scale factor is
+loaded once into a DuckDB file, either from the .tbl files of
+ads2024-ssb-dbgen, from the Parquet files of scripts/ssb_parquet.py or with
+the ssbgen extension. Every run is logged as a
+detailed profile in the JSON shape benchmark_runner writes, with
+benchmark_name "q<query>_sf<sf>_threads<threads>", so plots/plotter.py
+reads the log unchanged.
+
+Usage: python scripts/run_ssb.py --sf 1 10 --threads 1 2 4 8 [--tbl-dir ../ads2024-ssb-dbgen/sf{scaling_factor}
+                                                               | --parquet-dir ssb-sf{scaling_factor}]
+                                 [--queries 1.1 4.2] [--sql-dir sql] [--repetitions 5 | --adaptive --target-ci 0.05]
+                                 [--resources [0.1]] [--out bench-out/ssb.log]
+
+With --resources the CPU time, memory, I/O and context switches of the
+process are sampled with shared/sampler.py into <out>.resources.csv, and
+every profile gets the Unix times its query started and ended at, for
+plots/resources.py.
+"""
+import argparse
+import json
+import os
+import pathlib
+import re
+import sys
+import tempfile
+import time
+
+import duckdb
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / "plots"))
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from profiles import normalize_profile
+import adaptive
+from sampler import Sampler, resources_path
+
+
+PROJECT_DIR = pathlib.Path(__file__).resolve().parents[1]
+SQL_DIR = PROJECT_DIR / "sql"
+TABLES = ["part", "supplier", "customer", "date", "lineorder"]
+
+REPETITIONS = 5
+WARMUP = 1
+
+
+def query_order(path):
+    # q1.1 < q1.2 < q1.10, variants (q1.1-v02) after their query.
+    return [int(x) if x.isdigit() else x for x in re.split(r"[.-]v?", path.stem[1:])]
+
+
+def read_queries(names=None, sql_dir=SQL_DIR):
+    queries = {}
+    for path in sorted(pathlib.Path(sql_dir).glob("q*.sql"), key=query_order):
+        query = path.stem[1:]
+        if names and query not in names:
+            continue
+        queries[query] = path.read_text()
+    return queries
+
+
+def load(con, scaling_factor, tbl_dir=None, parquet_dir=None):
+    if parquet_dir is not None:
+        con.execute((SQL_DIR / "ssb-schema.sql").read_text())
+        parquet_dir = pathlib.Path(parquet_dir.format(scaling_factor=scaling_factor))
+        for table in TABLES:
+            con.execute(f"INSERT INTO {table} SELECT * FROM read_parquet('{parquet_dir / table}/*.parquet')")
+        return
+
+    if tbl_dir is None:
+        try:
+            con.execute("LOAD ssbgen")
+        except duckdb.Error:
+            raise SystemExit("The ssbgen extension is not available, generate the tables with "
+                             "ads2024-ssb-dbgen and pass --tbl-dir")
+        con.execute(f"CALL ssbgen(sf={scaling_factor})")
+        return
+
+    con.execute((SQL_DIR / "ssb-schema.sql").read_text())
+    tbl_dir = pathlib.Path(tbl_dir.format(scaling_factor=scaling_factor))
+    for table in TABLES:
+        # The separator is sniffed: the DB2 build in the makefile writes ','
+        # with quoted strings, the other builds '|'. The header has to be
+        # ruled out, the sniffer takes the first row of date.tbl for one.
+        con.execute(f"COPY {table} FROM '{tbl_dir / (table + '.tbl')}' (HEADER false)")
+
+
+def connect(scaling_factor, data_dir, tbl_dir=None, parquet_dir=None):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"ssb-sf{scaling_factor}.duckdb"
+    if not path.exists():
+        # Loaded under a temporary name so an interrupted load is not reused.
+        partial = path.with_suffix(".partial")
+        if partial.exists():
+            partial.unlink()
+        print(f"Loading SSB SF{scaling_factor} into {path}")
+        start = time.perf_counter()
+        con = duckdb.connect(str(partial))
+        load(con, scaling_factor, tbl_dir, parquet_dir)
+        con.close()
+        os.replace(partial, path)
+        print(f"Loaded in {time.perf_counter() - start:.1f}s")
+
+    return duckdb.connect(str(path), read_only=True)
+
+
+def run_profiled(con, sql, profile_path, sampler=None):
+    con.execute("PRAGMA enable_profiling='json'")
+    con.execute("PRAGMA profiling_mode='detailed'")
+    con.execute(f"PRAGMA profiling_output='{profile_path}'")
+
+    # Samples on the query boundaries, so its CPU time is exact rather
+    # than interpolated.
+    started_at = sampler.sample().time if sampler else time.time()
+    start = time.perf_counter()
+    con.execute(sql).fetchall()
+    elapsed = time.perf_counter() - start
+    ended_at = sampler.sample().time if sampler else time.time()
+
+    con.execute("PRAGMA disable_profiling")
+    with open(profile_path) as f:
+        profile = json.load(f)
+    profile["run"] = {"started_at": started_at, "ended_at": ended_at}
+    return elapsed, profile
+
+
+def log_profile(log, name, elapsed, profile):
+    # The query time is measured around execution and fetching, as
+    # benchmark_runner does; DuckDB's own latency is kept next to it.
+    entry = normalize_profile(profile, name, elapsed)
+    entry["latency"] = profile.get("latency", profile.get("timing"))
+    entry.update(profile["run"])
+    log.write(json.dumps(entry) + "\n")
+    log.flush()
+
+
+def run_adaptive(con, queries, scaling_factor, threads, policy, profile_path, log, sampler=None):
+    # Each configuration is sampled back to back until its CI is narrow
+    # enough. The stop reason is logged as an entry without a
+    # benchmark_name, which the profile reader skips.
+    for query, sql in queries.items():
+        name = f"q{query}_sf{scaling_factor}_threads{threads}"
+        outcome = adaptive.measure_adaptively(lambda: run_profiled(con, sql, profile_path, sampler), policy)
+
+        for elapsed, profile in zip(outcome.samples, outcome.data):
+            log_profile(log, name, elapsed, profile)
+        log.write(json.dumps({"adaptive": {"name": name, **outcome.summary()}}) + "\n")
+        log.flush()
+
+        print(f"{name}: {len(outcome.samples)} samples after {len(outcome.warmup)} warm-up runs, "
+              f"CI +-{outcome.relative_ci * 50:.1f}% ({outcome.stop_reason})")
+
+
+def run_sweep(args, queries, log, sampler=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        profile_path = pathlib.Path(tmp) / "profile.json"
+
+        for scaling_factor in args.sf:
+            con = connect(scaling_factor, pathlib.Path(args.data_dir), args.tbl_dir, args.parquet_dir)
+
+            for threads in args.threads:
+                con.execute(f"SET threads = {threads}")
+
+                if args.adaptive:
+                    policy = adaptive.policy_from_args(args)
+                    run_adaptive(con, queries, scaling_factor, threads, policy, profile_path, log, sampler)
+                    continue
+
+                for query, sql in queries.items():
+                    for _ in range(args.warmup):
+                        con.execute(sql).fetchall()
+
+                # Repetitions outermost, like benchmark_runner's sweep over
+                # the .benchmark files, so drift spreads over all queries.
+                for repetition in range(args.repetitions):
+                    for query, sql in queries.items():
+                        name = f"q{query}_sf{scaling_factor}_threads{threads}"
+                        elapsed, profile = run_profiled(con, sql, profile_path, sampler)
+                        log_profile(log, name, elapsed, profile)
+
+                        print(f"{name} ({repetition + 1}/{args.repetitions}): {elapsed:.4f}s")
+
+            con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the SSB queries in embedded DuckDB")
+    parser.add_argument("--sf", type=int, nargs="+", default=[1], help="scaling factors")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", nargs="+", default=None, help="e.g. 1.1 4.2 (default: all q*.sql)")
+    parser.add_argument("--sql-dir", default=str(SQL_DIR),
+                        help="directory of the q*.sql files, e.g. the output of scripts/ssb_variants.py")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="unrecorded runs per query and thread count")
+    parser.add_argument("--tbl-dir", default=None,
+                        help="dbgen output, may contain {scaling_factor} (default: use the ssbgen extension)")
+    parser.add_argument("--parquet-dir", default=None,
+                        help="scripts/ssb_parquet.py output, may contain {scaling_factor}; used instead of --tbl-dir")
+    parser.add_argument("--data-dir", default="bench-out/duckdb", help="where the loaded databases are kept")
+    parser.add_argument("--out", default=None, help="profile log to append to")
+    parser.add_argument("--resources", type=float, nargs="?", const=0.1, default=None, metavar="INTERVAL",
+                        help="sample CPU, memory and I/O every INTERVAL seconds (default 0.1) into <out>.resources.csv")
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries, args.sql_dir)
+    if not queries:
+        print(f"No queries found in {args.sql_dir}")
+        exit(1)
+
+    out = pathlib.Path(args.out or f"bench-out/ssb-{int(time.time())}.log")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "a") as log:
+        if args.resources is None:
+            run_sweep(args, queries, log)
+        else:
+            with Sampler(os.getpid(), resources_path(out), args.resources) as sampler:
+                run_sweep(args, queries, log, sampler)
+            print(f"Wrote resource samples to {resources_path(out)}")
+
+    print(f"Wrote profiles to {out}")
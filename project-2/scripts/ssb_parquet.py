@@ -0,0 +1,236 @@
+"""Generate SSB data with ads2024-ssb-dbgen straight into Parquet.
+
+lineorder is split into chunks with dbgen's child/step mode (-C/-S), one
+dbgen process per chunk. Every process writes into a named pipe instead of
+a .tbl file (dbgen's tbl_open writes into a FIFO if one exists at the
+output path), and the rows are parsed from the pipe and written to Parquet
+one row group at a time. Neither .tbl scratch space nor a whole table in
+memory is needed; memory is about one row group per running chunk.
+
+The chunks are not the rows of a serial dbgen run: dbgen's skip-ahead for
+child mode does not cover every random stream, so lo_custkey and
+lo_orderpriority of the chunks after the first differ. The data is as
+valid (all keys join), but results are only comparable across runs with
+the same --chunks.
+
+Output is one directory per table with one file per chunk, typed after
+sql/ssb-schema.sql (UINTEGER as int64, as lo_orderkey passes 2^31 from
+SF 358 on, other integers as int32, dates as date32):
+
+    <out>/lineorder/part-00001.parquet ... part-<chunks>.parquet
+    <out>/customer/part-00001.parquet
+    ...
+
+which DuckDB reads with read_parquet('<out>/lineorder/*.parquet'), e.g. via
+scripts/run_ssb.py --parquet-dir <out>.
+
+Usage: python scripts/ssb_parquet.py --sf 100 [--jobs 16] [--chunks 64] [--out ssb-sf100]
+                                     [--dbgen ads2024-ssb-dbgen/dbgen]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import os
+import pathlib
+import re
+import subprocess
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+
+PROJECT_DIR = pathlib.Path(__file__).resolve().parents[1]
+SCHEMA_PATH = PROJECT_DIR / "sql" / "ssb-schema.sql"
+DBGEN = PROJECT_DIR / "ads2024-ssb-dbgen" / "dbgen"
+
+# dbgen -T flag per table; only lineorder is big enough to be chunked.
+TABLE_FLAGS = {"lineorder": "l", "customer": "c", "part": "p", "supplier": "s", "date": "d"}
+CHUNKED = {"lineorder"}
+# Fixed rather than the core count, as the chunking changes the data.
+CHUNKS = 16
+
+SQL_TYPES = {
+    "UINTEGER": pa.int64(),
+    "USMALLINT": pa.int32(),
+    "UTINYINT": pa.int32(),
+    "INTEGER": pa.int32(),
+    "DATE": pa.date32(),
+    "VARCHAR": pa.string(),
+    "BOOLEAN": pa.bool_(),
+}
+
+# DuckDB's row group size.
+ROW_GROUP_SIZE = 122880
+BLOCK_SIZE = 1 << 20
+
+
+def read_schema(path=SCHEMA_PATH):
+    schemas = {}
+    for name, body in re.findall(r"CREATE TABLE (\w+)\s*\((.*?)\);", path.read_text(), re.DOTALL | re.IGNORECASE):
+        fields = []
+        for line in body.splitlines():
+            parts = line.strip().rstrip(",").split()
+            if len(parts) >= 2 and parts[0].upper() != "PRIMARY":
+                fields.append(pa.field(parts[0], SQL_TYPES[parts[1].upper()]))
+        schemas[name] = pa.schema(fields)
+    return schemas
+
+
+@dataclass
+class Chunk:
+    table: str
+    step: int
+    chunks: int
+
+    @property
+    def dbgen_name(self):
+        # The file name dbgen writes to, see set_files in driver.c.
+        name = f"{self.table}.tbl"
+        return f"{name}.{self.step}" if self.chunks > 1 else name
+
+
+def open_tbl(f, schema: pa.Schema, delimiter=","):
+    # Streams the rows of a .tbl file as record batches. dbgen ends every
+    # row with a separator, which reads as one more, empty column. The
+    # separator is ',' with quoted strings for the DB2 build in the
+    # makefile and '|' for the other databases.
+    return pacsv.open_csv(
+        f,
+        read_options=pacsv.ReadOptions(column_names=schema.names + ["_end"], block_size=BLOCK_SIZE,
+                                       use_threads=False),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter),
+        convert_options=pacsv.ConvertOptions(column_types=dict(zip(schema.names, schema.types)),
+                                             include_columns=schema.names,
+                                             true_values=["1"], false_values=["0"]),
+    )
+
+
+def write_batches(batches, schema: pa.Schema, out_path, row_group_size=ROW_GROUP_SIZE, compression="snappy",
+                  **writer_options):
+    # writer_options go to pq.ParquetWriter, e.g. use_dictionary or
+    # data_page_size.
+    rows = 0
+    pending = []
+    pending_rows = 0
+    tmp_path = out_path.with_suffix(".partial")
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression=compression, **writer_options) as writer:
+            for batch in batches:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                if pending_rows < row_group_size:
+                    continue
+
+                # Only whole row groups are written; the rest waits for the
+                # next batches.
+                table = pa.Table.from_batches(pending, schema)
+                full = table.num_rows // row_group_size * row_group_size
+                writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+                rows += full
+                pending = table.slice(full).to_batches()
+                pending_rows = table.num_rows - full
+
+            if pending_rows:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+                rows += pending_rows
+    except BaseException:
+        # A failed batch, e.g. a key that does not fit the schema, leaves
+        # no partial file behind.
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(tmp_path, out_path)
+    return rows
+
+
+def generate(chunk: Chunk, args, schema):
+    dbgen = pathlib.Path(args.dbgen).resolve()
+    out_path = pathlib.Path(args.out) / chunk.table / f"part-{chunk.step:05}.parquet"
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fifo = pathlib.Path(tmp) / chunk.dbgen_name
+        os.mkfifo(fifo)
+
+        command = [str(dbgen), "-s", str(args.sf), "-T", TABLE_FLAGS[chunk.table], "-f"]
+        if chunk.chunks > 1:
+            command += ["-C", str(chunk.chunks), "-S", str(chunk.step)]
+        # dbgen writes into DSS_PATH and reads dists.dss from DSS_CONFIG.
+        env = {**os.environ, "DSS_PATH": tmp, "DSS_CONFIG": str(dbgen.parent)}
+        process = subprocess.Popen(command, cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        # Opening the read end blocks until dbgen opens the write end. If
+        # dbgen dies before that, open the write end ourselves so the read
+        # sees an empty pipe instead of hanging.
+        opened = threading.Event()
+
+        def unblock():
+            process.wait()
+            if not opened.is_set():
+                try:
+                    os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+
+        threading.Thread(target=unblock, daemon=True).start()
+
+        with open(fifo, "rb") as f:
+            opened.set()
+            rows = write_batches(open_tbl(f, schema, args.delimiter), schema, out_path, args.row_group_size,
+                                 args.compression)
+
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            out_path.unlink(missing_ok=True)
+            raise RuntimeError(f"dbgen {' '.join(command[1:])} exited with {process.returncode}: "
+                               f"{stderr.decode(errors='replace').strip()[-500:]}")
+
+    return chunk, rows, out_path.stat().st_size, time.perf_counter() - start
+
+
+def plan(tables, chunks):
+    # lineorder first, as its chunks take longest.
+    return [Chunk(table, step, chunks if table in CHUNKED else 1)
+            for table in sorted(tables, key=lambda t: t not in CHUNKED)
+            for step in range(1, (chunks if table in CHUNKED else 1) + 1)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate SSB data into Parquet with parallel dbgen chunks")
+    parser.add_argument("--sf", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="dbgen processes at once")
+    parser.add_argument("--chunks", type=int, default=CHUNKS,
+                        help="lineorder chunks; the data only matches runs with the same count")
+    parser.add_argument("--tables", nargs="+", default=list(TABLE_FLAGS), choices=list(TABLE_FLAGS))
+    parser.add_argument("--out", default=None, help="output directory (default: ssb-sf<sf>)")
+    parser.add_argument("--dbgen", default=str(DBGEN), help="dbgen binary, next to its dists.dss")
+    parser.add_argument("--delimiter", default=",",
+                        help="field separator of the dbgen build (',' for DATABASE=DB2, '|' otherwise)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="rows per row group")
+    parser.add_argument("--compression", default="snappy")
+    args = parser.parse_args()
+
+    args.out = args.out or f"ssb-sf{args.sf}"
+    chunks = plan(args.tables, args.chunks)
+    schemas = read_schema()
+    for table in args.tables:
+        (pathlib.Path(args.out) / table).mkdir(parents=True, exist_ok=True)
+
+    totals = {table: [0, 0, 0] for table in args.tables}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(generate, chunk, args, schemas[chunk.table]) for chunk in chunks]
+        for future in as_completed(futures):
+            chunk, rows, size, seconds = future.result()
+            totals[chunk.table][0] += 1
+            totals[chunk.table][1] += rows
+            totals[chunk.table][2] += size
+            print(f"{chunk.table} {chunk.step}/{chunk.chunks}: {rows:,} rows in {seconds:.1f}s", flush=True)
+
+    print(f"\nGenerated SF{args.sf} in {time.perf_counter() - start:.1f}s")
+    for table, (files, rows, size) in totals.items():
+        print(f"  {table:<10} {files:>4} files {rows:>14,} rows {size / 1024 ** 2:>10.1f} MB")
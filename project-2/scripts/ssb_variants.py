@@ -0,0 +1,293 @@
+"""Generate SSB query variants over a range of selectivities.
+
+Every query in sql/q*.sql is turned into a template by replacing one of its
+filter predicates, the knob, with a placeholder, much like qgen substitutes
+the parameters of its templates. By default the knob is the last range
+predicate of the query (e.g. lo_quantity < 25 in Q1.1, the d_year range in
+Q3.1) or else its first equality or OR list (p_category = 'MFGR#12' in
+Q2.1). Range knobs are widened over the sorted domain of the column
+(BETWEEN min AND v), set knobs grow an IN list starting from the original
+values, so the variants of a query span from one value to the whole domain.
+
+The actual selectivity of every variant (rows of the filtered join over
+the lineorder rows) is counted against a loaded SSB database. All
+candidates are kept, or with --targets the candidate closest to each
+target selectivity. The variants are written as q<query>-v<nn>.sql next
+to a variants.json manifest, to be run with
+
+    python scripts/run_ssb.py --sql-dir <out> ...
+
+and plotted with plots/selectivity.py.
+
+Usage: python scripts/ssb_variants.py --sf 1 [--tbl-dir ... | --parquet-dir ...] [--queries 1.1 3.1]
+                                      [--targets 0.001 0.01 0.1 0.5] [--knob 2.1=s_region] [--out bench-out/variants]
+"""
+import argparse
+from dataclasses import dataclass, field, asdict
+import json
+import math
+import pathlib
+import re
+
+from run_ssb import connect, read_queries
+
+
+LITERAL = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?"
+JOIN = re.compile(r"^(\w+)\s*=\s*([A-Za-z_]\w*)$")
+BETWEEN = re.compile(rf"^(\w+)\s+BETWEEN\s+({LITERAL})\s+AND\s+({LITERAL})$", re.IGNORECASE)
+COMPARISON = re.compile(rf"^(\w+)\s*(<=|>=|<|>|=)\s*({LITERAL})$")
+EQUALS = re.compile(rf"^(\w+)\s*=\s*({LITERAL})$")
+CLAUSES = re.compile(r"\bFROM\b(.*?)\bWHERE\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|;|$)", re.IGNORECASE | re.DOTALL)
+
+TABLES = {"lo": "lineorder", "d": "date", "p": "part", "s": "supplier", "c": "customer"}
+
+MAX_CANDIDATES = 24
+
+
+@dataclass
+class Predicate:
+    column: str
+    # "range" for BETWEEN and comparisons, "set" for = and OR lists.
+    kind: str
+    values: list = field(default_factory=list)
+    # Indexes of the conjuncts of the WHERE clause it was parsed from.
+    conjuncts: list[int] = field(default_factory=list)
+
+
+@dataclass
+class Template:
+    query: str
+    head: str
+    conjuncts: list[str]
+    tail: str
+    from_clause: str
+    knob: Predicate
+
+    def where(self, predicate):
+        kept = [c for i, c in enumerate(self.conjuncts) if i not in self.knob.conjuncts]
+        return kept + [predicate]
+
+    def render(self, predicate):
+        return f"{self.head}WHERE {chr(10).join(self._lines(predicate))}{self.tail}"
+
+    def count_sql(self, predicate):
+        return f"SELECT count(*) FROM {self.from_clause} WHERE {' AND '.join(self.where(predicate))}"
+
+    def _lines(self, predicate):
+        conjuncts = self.where(predicate)
+        return [conjuncts[0]] + [f"  AND {c}" for c in conjuncts[1:]]
+
+
+@dataclass
+class Variant:
+    name: str
+    query: str
+    column: str
+    predicate: str
+    rows: int
+    selectivity: float
+    file: str
+
+
+def split_conjuncts(where):
+    # Splits on the ANDs outside parentheses, quotes and BETWEEN ... AND.
+    parts = []
+    depth = 0
+    between = False
+    start = 0
+    for match in re.finditer(r"'(?:[^']|'')*'|\(|\)|\bBETWEEN\b|\bAND\b", where, re.IGNORECASE):
+        token = match.group().upper()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token == "BETWEEN":
+            between = True
+        elif depth == 0 and token == "AND":
+            if between:
+                between = False
+                continue
+            parts.append(" ".join(where[start:match.start()].split()))
+            start = match.end()
+    parts.append(" ".join(where[start:].split()))
+    return [p for p in parts if p]
+
+
+def literal_value(text):
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    return float(text) if "." in text else int(text)
+
+
+def format_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    if hasattr(value, "isoformat"):
+        return f"'{value.isoformat()}'"
+    return str(value)
+
+
+def parse_predicates(conjuncts):
+    predicates = {}
+    for i, conjunct in enumerate(conjuncts):
+        if JOIN.match(conjunct) and not EQUALS.match(conjunct):
+            continue
+
+        if match := BETWEEN.match(conjunct):
+            column, low, high = match.groups()
+            predicate = Predicate(column, "range", [literal_value(low), literal_value(high)])
+        elif (match := COMPARISON.match(conjunct)) and match.group(2) != "=":
+            column, _, value = match.groups()
+            predicate = Predicate(column, "range", [literal_value(value)])
+        elif match := EQUALS.match(conjunct):
+            column, value = match.groups()
+            predicate = Predicate(column, "set", [literal_value(value)])
+        elif conjunct.startswith("(") and conjunct.endswith(")"):
+            terms = [EQUALS.match(t.strip()) for t in re.split(r"\bOR\b", conjunct[1:-1], flags=re.IGNORECASE)]
+            if not all(terms) or len(set(t.group(1) for t in terms)) != 1:
+                continue
+            predicate = Predicate(terms[0].group(1), "set", [literal_value(t.group(2)) for t in terms])
+        else:
+            continue
+
+        # Comparisons on the same column (d_year >= 1992 AND d_year <= 1997)
+        # form one range.
+        existing = predicates.get(predicate.column)
+        if existing is not None and existing.kind == predicate.kind == "range":
+            existing.values += predicate.values
+            existing.conjuncts.append(i)
+        else:
+            predicate.conjuncts.append(i)
+            predicates[predicate.column] = predicate
+    return list(predicates.values())
+
+
+def make_template(query, sql, knob_column=None):
+    match = CLAUSES.search(sql)
+    if match is None:
+        raise ValueError(f"Q{query} has no FROM ... WHERE")
+    conjuncts = split_conjuncts(match.group(2))
+    predicates = parse_predicates(conjuncts)
+
+    if knob_column:
+        knobs = [p for p in predicates if p.column == knob_column]
+        if not knobs:
+            raise ValueError(f"Q{query} has no filter on {knob_column}")
+    else:
+        knobs = [p for p in predicates if p.kind == "range"][-1:] or [p for p in predicates if p.kind == "set"][:1]
+        if not knobs:
+            raise ValueError(f"Q{query} has no filter to vary")
+
+    head = sql[:match.start(2) - len("WHERE")]
+    rest = sql[match.end(2):].lstrip()
+    tail = rest if rest.startswith(";") else "\n" + rest
+    return Template(query, head, conjuncts, tail, " ".join(match.group(1).split()), knobs[0])
+
+
+def domain(con, column):
+    table = TABLES[column.split("_", 1)[0]]
+    return [row[0] for row in con.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL "
+                                          f"ORDER BY {column}").fetchall()]
+
+
+def sizes(n, limit=MAX_CANDIDATES):
+    # 1..n, thinned out geometrically for large domains.
+    if n <= limit:
+        return list(range(1, n + 1))
+    return sorted(set(max(1, round(n ** (i / (limit - 1)))) for i in range(limit)))
+
+
+def candidates(template: Template, values):
+    knob = template.knob
+    if knob.kind == "range":
+        for k in sizes(len(values)):
+            yield f"{knob.column} BETWEEN {format_literal(values[0])} AND {format_literal(values[k - 1])}"
+        return
+
+    # Sets start from the original values, so the smallest variants stay
+    # close to the original query.
+    ordered = [v for v in knob.values if v in values] + [v for v in values if v not in knob.values]
+    for k in sizes(len(ordered)):
+        if k == 1:
+            yield f"{knob.column} = {format_literal(ordered[0])}"
+        else:
+            yield f"{knob.column} IN ({', '.join(format_literal(v) for v in ordered[:k])})"
+
+
+def pick(measured, targets):
+    # The candidate closest to each target on a log scale.
+    positive = [m for m in measured if m[2] > 0]
+    picked = []
+    for target in targets:
+        best = min(positive, key=lambda m: abs(math.log(m[2]) - math.log(target)))
+        if best not in picked:
+            picked.append(best)
+    return picked
+
+
+def generate(con, template: Template, targets, out_dir, total_rows):
+    values = domain(con, template.knob.column)
+    measured = []
+    for predicate in candidates(template, values):
+        rows = con.execute(template.count_sql(predicate)).fetchone()[0]
+        measured.append((predicate, rows, rows / total_rows))
+
+    chosen = pick(measured, targets) if targets else measured
+    chosen.sort(key=lambda m: (m[2], m[0]))
+
+    variants = []
+    for i, (predicate, rows, selectivity) in enumerate(chosen, start=1):
+        name = f"{template.query}-v{i:02}"
+        path = out_dir / f"q{name}.sql"
+        path.write_text(template.render(predicate))
+        variants.append(Variant(name, template.query, template.knob.column, predicate, rows, selectivity, path.name))
+    return variants
+
+
+def original_selectivity(con, template: Template, total_rows):
+    knob = template.knob
+    predicate = " AND ".join(template.conjuncts[i] for i in knob.conjuncts)
+    return con.execute(template.count_sql(predicate)).fetchone()[0] / total_rows
+
+
+def parse_knobs(values):
+    return dict(value.split("=", 1) for value in values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate SSB query variants over a range of selectivities")
+    parser.add_argument("--sf", type=int, default=1, help="scaling factor of the data to measure selectivity on")
+    parser.add_argument("--queries", nargs="+", default=None, help="e.g. 1.1 3.1 (default: all q*.sql)")
+    parser.add_argument("--targets", type=float, nargs="+", default=None,
+                        help="selectivities to pick variants for (default: keep every candidate)")
+    parser.add_argument("--knob", action="append", default=[], metavar="QUERY=COLUMN",
+                        help="filter column to vary instead of the default")
+    parser.add_argument("--tbl-dir", default=None, help="dbgen output, may contain {scaling_factor}")
+    parser.add_argument("--parquet-dir", default=None, help="scripts/ssb_parquet.py output")
+    parser.add_argument("--data-dir", default="bench-out/duckdb", help="where the loaded databases are kept")
+    parser.add_argument("--out", default="bench-out/variants")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    knobs = parse_knobs(args.knob)
+    out_dir = pathlib.Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    con = connect(args.sf, pathlib.Path(args.data_dir), args.tbl_dir, args.parquet_dir)
+    total_rows = con.execute("SELECT count(*) FROM lineorder").fetchone()[0]
+
+    manifest = {"scaling_factor": args.sf, "queries": {}, "variants": []}
+    for query, sql in queries.items():
+        template = make_template(query, sql, knobs.get(query))
+        variants = generate(con, template, args.targets, out_dir, total_rows)
+        original = original_selectivity(con, template, total_rows)
+
+        manifest["queries"][query] = {"column": template.knob.column, "selectivity": original}
+        manifest["variants"] += [asdict(v) for v in variants]
+        print(f"Q{query}: {len(variants)} variants on {template.knob.column}, selectivity "
+              f"{variants[0].selectivity:.2e} to {variants[-1].selectivity:.2e} (original {original:.2e})")
+    con.close()
+
+    with open(out_dir / "variants.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(manifest['variants'])} variants to {out_dir}")
@@ -0,0 +1,189 @@
+"""Compare the Parquet layouts of a scripts/layout_sweep.py run.
+
+For every workload and layout (row-group size, codec, dictionary encoding,
+page size) this reports the file size, the write time and the mean
+latency of the full, projected and filtered scans, and plots the scan
+latencies per layout next to the trade-off between file size and full
+scan latency. The fastest layout of every scan and the smallest file are
+printed at the end.
+
+Usage: python plots/layouts.py <layout sweep JSON> [--summary [markdown]]
+"""
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from plotter import Configuration, read_data, make_configurations, make_out_path, save_plot, MARKERS
+from stats import error_bars, summarize_configs
+import summary
+
+
+SCANS = ["Full", "Projected", "Filtered", "Projected + filtered"]
+
+
+@dataclass
+class LayoutResult:
+    workload: str
+    layout: dict
+    row_groups: int
+    scans: dict[str, Configuration] = field(default_factory=dict)
+
+    def latency(self, scan):
+        c = self.scans.get(scan)
+        return c.average_by("elapsed_time_ms") if c is not None else None
+
+
+def scan_kind(c: Configuration):
+    filtered = bool(c.measurements[0].filter)
+    if c.projected:
+        return "Projected + filtered" if filtered else "Projected"
+    return "Filtered" if filtered else "Full"
+
+
+def layout_results(configs: list[Configuration]):
+    # {workload: [LayoutResult]}, in the order the layouts were swept.
+    results = {}
+    for c in configs:
+        layout = c.measurements[0].layout
+        if not layout:
+            continue
+        key = (c.workload, layout["name"])
+        if key not in results:
+            # Recorded by the sweep, as --delete removes the files; older
+            # results fall back to the footer.
+            results[key] = LayoutResult(c.workload, layout, layout.get("rowGroups", c.layout.row_groups))
+        results[key].scans[scan_kind(c)] = c
+
+    by_workload = {}
+    for (workload, _), result in results.items():
+        by_workload.setdefault(workload, []).append(result)
+    for layouts in by_workload.values():
+        layouts.sort(key=lambda r: (r.layout["rowGroupSize"], r.layout["compression"], not r.layout["dictionary"],
+                                    r.layout["pageSize"]))
+    return by_workload
+
+
+def scans_of(layouts: list[LayoutResult]):
+    return [s for s in SCANS if any(s in r.scans for r in layouts)]
+
+
+def layout_table(by_workload):
+    scans = [s for s in SCANS if any(s in scans_of(layouts) for layouts in by_workload.values())]
+    header = ["Workload", "Layout", "Size (MB)", "Write (s)", "Row groups"] + [f"{s} (ms)" for s in scans]
+
+    rows = []
+    for workload, layouts in by_workload.items():
+        for r in layouts:
+            latencies = [r.latency(s) for s in scans]
+            rows.append([workload, r.layout["name"], f"{r.layout['fileBytes'] / 1024 ** 2:.1f}",
+                         f"{r.layout['writeSeconds']:.1f}", str(r.row_groups or "N/A")]
+                        + [f"{t:.1f}" if t is not None else "N/A" for t in latencies])
+    return header, rows
+
+
+def write_tex_table(name, header, rows):
+    lines = [
+        r"\begin{tabular}{" + "l" * len(header) + "}",
+        r"\toprule",
+        " & ".join(header) + r" \\",
+        r"\midrule",
+    ]
+    lines += [" & ".join(row) + r" \\" for row in rows]
+    lines.append(r"\bottomrule\end{tabular}")
+
+    out_path = make_out_path(name, "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def best_layouts(workload, layouts: list[LayoutResult]):
+    lines = []
+    smallest = min(layouts, key=lambda r: r.layout["fileBytes"])
+    lines.append(f"{workload}: smallest file {smallest.layout['name']} "
+                 f"({smallest.layout['fileBytes'] / 1024 ** 2:.1f} MB)")
+    for scan in scans_of(layouts):
+        timed = [r for r in layouts if r.latency(scan) is not None]
+        fastest = min(timed, key=lambda r: r.latency(scan))
+        lines.append(f"{workload}: fastest {scan.lower()} scan {fastest.layout['name']} "
+                     f"({fastest.latency(scan):.1f} ms)")
+    return lines
+
+
+def plot_scan_latencies(workload, layouts: list[LayoutResult]):
+    import matplotlib.pyplot as plt
+
+    scans = scans_of(layouts)
+    x = np.arange(len(layouts))
+    width = 0.8 / len(scans)
+
+    fig, ax = plt.subplots(layout="constrained", figsize=(max(6.4, len(layouts) * 0.6), 4.8))
+    for i, scan in enumerate(scans):
+        timed = [(j, r.scans[scan]) for j, r in enumerate(layouts) if scan in r.scans]
+        ys = [c.average_by("elapsed_time_ms") for _, c in timed]
+        yerr = error_bars(summarize_configs([c for _, c in timed], "elapsed_time_ms"))
+        ax.bar(np.array([j for j, _ in timed]) + width * i, ys, width - 0.01, yerr=yerr, capsize=3, zorder=3,
+               label=scan)
+
+    ax.grid(zorder=0)
+    ax.set_title(f"Scan latency by Parquet layout ({workload})")
+    ax.set_ylabel("Latency (milliseconds)")
+    ax.set_xticks(x + width * (len(scans) - 1) / 2, [r.layout["name"] for r in layouts],
+                  rotation=45, ha="right", fontsize="small")
+    ax.legend()
+
+    save_plot(f"layout-latencies-{workload}")
+    plt.close(fig)
+
+
+def plot_size_tradeoff(workload, layouts: list[LayoutResult]):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(layout="constrained")
+    codecs = sorted(set(r.layout["compression"] for r in layouts))
+    for i, codec in enumerate(codecs):
+        points = [r for r in layouts if r.layout["compression"] == codec and r.latency("Full") is not None]
+        marker, facecolor = MARKERS[i % len(MARKERS)]
+        ax.plot([r.layout["fileBytes"] / 1024 ** 2 for r in points], [r.latency("Full") for r in points],
+                marker, markerfacecolor=facecolor, linestyle="none", label=codec)
+        for r in points:
+            encoding = "dict" if r.layout["dictionary"] else "plain"
+            ax.annotate(f"{r.layout['rowGroupSize']:,} {encoding}", (r.layout["fileBytes"] / 1024 ** 2,
+                                                                     r.latency("Full")),
+                        fontsize="x-small", textcoords="offset points", xytext=(4, 4))
+
+    ax.grid()
+    ax.set_title(f"File size and full scan latency ({workload})")
+    ax.set_xlabel("File size (MB)")
+    ax.set_ylabel("Full scan latency (milliseconds)")
+    ax.legend(title="Codec")
+
+    save_plot(f"layout-size-{workload}")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Parquet layouts of a layout sweep")
+    parser.add_argument("file", help="scripts/layout_sweep.py output")
+    summary.add_argument(parser)
+    args = parser.parse_args()
+
+    configurations = make_configurations(read_data(args.file))
+    by_workload = layout_results(configurations)
+    if not by_workload:
+        print(f"No layout sweep results in {args.file}")
+        exit(1)
+
+    header, rows = layout_table(by_workload)
+    print(summary.format_table(header, rows, args.summary or "markdown"))
+    write_tex_table("layout_table", header, rows)
+
+    print()
+    for workload, layouts in by_workload.items():
+        print("\n".join(best_layouts(workload, layouts)))
+
+    if not args.summary:
+        for workload, layouts in by_workload.items():
+            plot_scan_latencies(workload, layouts)
+            plot_size_tradeoff(workload, layouts)
@@ -1,15 +1,24 @@
 from typing import Any, Dict, List
-from matplotlib.font_manager import json
-import matplotlib.pyplot as plt
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, field
 from itertools import groupby
+import argparse
+import os
 import sys
 import pathlib
 import numpy as np
 import colorsys
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+from results_store import ResultsStore
+from ingest import report_errors
+from stats import check_repetitions, error_bars, summarize_configs
+import summary
+
 
 work_dir = pathlib.Path(__file__).parent.resolve()
+# Repetitions per configuration of the benchmark runs.
+REPETITIONS = 4
 
 
 def make_out_path(name, format):
@@ -18,6 +27,8 @@ def make_out_path(name, format):
 
 
 def save_plot(name):
+    import matplotlib.pyplot as plt
+
     format = "pdf"
 
     if not (work_dir / "output").exists():
@@ -42,6 +53,10 @@ class Measurement:
     elapsed_time_ms: float
     iteration: int
     source: str
+    columns: list[str]
+    # Extra keys of scripts/scan_bench.py and scripts/layout_sweep.py.
+    filter: list[str] = field(default_factory=list)
+    layout: dict = field(default_factory=dict)
 
     @staticmethod
     def from_file(file: str):
@@ -57,13 +72,83 @@ class Measurement:
                 iteration=m.get("iteration", 0),
                 projected=m["projected"],
                 elapsed_time_ms=m["executionTimeMillis"],
-                source=m["path"].split(".")[-1]
+                source=m["path"].split(".")[-1],
+                columns=m.get("columns", []),
+                filter=m.get("filter", []),
+                layout=m.get("layout", {}),
             ))
 
         return measurements
 
     def configuration_key(self):
-        return f"{self.workload}-{self.records}-{self.projected}-{self.source}"
+        key = f"{self.workload}-{self.records}-{self.projected}-{self.source}"
+        if self.filter:
+            key += "-filtered"
+        if self.layout:
+            key += f"-{self.layout['name']}"
+        return key
+
+
+def resolve_path(path: str, data_dir=None):
+    # Benchmarks record the path as seen by the machine that ran them, so
+    # files can also be found by name in a local data directory.
+    local = pathlib.Path(path.removeprefix("file://"))
+    if local.exists():
+        return local
+    if data_dir is not None and (pathlib.Path(data_dir) / local.name).exists():
+        return pathlib.Path(data_dir) / local.name
+    return None
+
+
+@dataclass
+class FileLayout:
+    path: str
+    size: int | None = None
+    row_groups: int = 0
+    column_bytes: dict[str, int] = field(default_factory=dict)
+
+    @staticmethod
+    def inspect(path: str, data_dir=None):
+        local = resolve_path(path, data_dir)
+        if local is None:
+            return FileLayout(path)
+
+        layout = FileLayout(path, size=os.path.getsize(local))
+        if local.suffix != ".parquet":
+            return layout
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return layout
+
+        metadata = pq.ParquetFile(local).metadata
+        layout.row_groups = metadata.num_row_groups
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                chunk = row_group.column(j)
+                name = chunk.path_in_schema
+                layout.column_bytes[name] = layout.column_bytes.get(name, 0) + chunk.total_compressed_size
+
+        return layout
+
+    def bytes_read(self, columns: list[str]):
+        if not columns:
+            return self.size
+        if not self.column_bytes:
+            return None
+        return sum(self.column_bytes.get(c, 0) for c in columns)
+
+
+def format_bytes(size):
+    if size is None:
+        return "N/A"
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f} GB"
+    if size >= 1024 ** 2:
+        return f"{size / 1024 ** 2:.0f} MB"
+    return f"{size / 1024:.0f} KB"
 
 
 @dataclass
@@ -77,9 +162,15 @@ class Configuration:
     projected: bool
     elapsed_time_ms: float
     source: str
+    columns: list[str]
+    layout: FileLayout
 
     @staticmethod
-    def from_measurements(key, measurements: list[Measurement]):
+    def from_measurements(key, measurements: list[Measurement], layout: FileLayout, projection=None):
+        columns = measurements[0].columns
+        if measurements[0].projected and not columns and projection:
+            columns = projection.get(measurements[0].workload, [])
+
         return Configuration(
             key=key,
             measurements=measurements,
@@ -88,30 +179,33 @@ class Configuration:
             records=measurements[0].records,
             projected=measurements[0].projected,
             elapsed_time_ms=measurements[0].elapsed_time_ms,
-            source=measurements[0].source
+            source=measurements[0].source,
+            columns=columns if measurements[0].projected else [],
+            layout=layout,
         )
 
     def average_by(self, key: str):
         return sum([getattr(m, key) for m in self.measurements]) / len(self.measurements)
 
     def filesize(self):
-        if self.source == "parquet" and self.records == 6001171:
-            return "409 MB"
-        if self.source == "csv" and self.records == 6001171:
-            return "1.9 GB"
-        if self.source == "parquet" and self.records == 59986214:
-            return "4.6 GB"
-        if self.source == "csv" and self.records == 59986214:
-            return "20 GB"
-        if self.source == "parquet" and self.records == 50000:
-            return "22 MB"
-        if self.source == "csv" and self.records == 50000:
-            return "35 MB"
-        if self.source == "parquet" and self.records == 650000:
-            return "286 MB"
-        if self.source == "csv" and self.records == 650000:
-            return "457 MB"
-        return "N/A"
+        return format_bytes(self.layout.size)
+
+    def bytes_read(self):
+        # A projected scan without known columns read an unknown share of
+        # the file.
+        if self.projected and not self.columns:
+            return None
+        return self.layout.bytes_read(self.columns)
+
+    def throughput(self):
+        seconds = self.average_by("elapsed_time_ms") / 1000
+        bytes_read = self.bytes_read()
+
+        return {
+            "mb_per_s": bytes_read / 1e6 / seconds if bytes_read else None,
+            "rows_per_s": self.records / seconds,
+            "bytes_per_column": bytes_read / len(self.columns) if bytes_read and self.columns else None,
+        }
 
 
 
@@ -155,34 +249,41 @@ def plot_latency(configs: list[Configuration]):
     #     save_plot("latency-q" + q)
 
 
+GROUP_LABELS = {
+    ("ssb", 6001171): "SSB (SF1)",
+    ("ssb", 59986214): "SSB (SF10)",
+    ("yelp", 50000): "Yelp (test)",
+    ("yelp", 650000): "Yelp (train)",
+}
+
+
 def get_groups(configs: list[Configuration]):
-    return {
-        "SSB (SF1)": [
-            next(c for c in configs if c.key == "ssb-6001171-False-parquet"),
-            next(c for c in configs if c.key == "ssb-6001171-True-parquet"),
-            next(c for c in configs if c.key == "ssb-6001171-False-csv"),
-        ],
-        "SSB (SF10)": [
-            next(c for c in configs if c.key == "ssb-59986214-False-parquet"),
-            next(c for c in configs if c.key == "ssb-59986214-True-parquet"),
-            next(c for c in configs if c.key == "ssb-59986214-False-csv"),
-        ],
-        "Yelp (test)": [
-            next(c for c in configs if c.key == "yelp-50000-False-parquet"),
-            next(c for c in configs if c.key == "yelp-50000-True-parquet"),
-            next(c for c in configs if c.key == "yelp-50000-False-csv"),
-        ],
-        "Yelp (train)": [
-            next(c for c in configs if c.key == "yelp-650000-False-parquet"),
-            next(c for c in configs if c.key == "yelp-650000-True-parquet"),
-            next(c for c in configs if c.key == "yelp-650000-False-csv"),
-        ],
-    }
+    # {label: [Parquet, projected Parquet, CSV]} of every dataset with all
+    # three plain scans; filtered scans and layout sweeps are left out.
+    scans = {}
+    for c in configs:
+        m = c.measurements[0]
+        if m.filter or m.layout:
+            continue
+        scans.setdefault((c.workload, c.records), {})[(c.projected, c.source)] = c
+
+    groups = {}
+    for (workload, records), by_scan in sorted(scans.items()):
+        group = [by_scan.get(scan) for scan in [(False, "parquet"), (True, "parquet"), (False, "csv")]]
+        if None in group:
+            continue
+        groups[GROUP_LABELS.get((workload, records), f"{workload} ({records:,} records)")] = group
+    return groups
 
 ORDER = ["Parquet (Without projection)", "Parquet (With projection)", "CSV"]
 
 def plot_all_latencies(configs: list[Configuration]):
+    import matplotlib.pyplot as plt
+
     groups = get_groups(configs)
+    if not groups:
+        print("Skipping the latency plots, no dataset has Parquet, projected Parquet and CSV scans")
+        return
 
     transposed: Dict[str, List[Configuration]] = {k: [] for k in ORDER}
     for i in range(3):
@@ -200,8 +301,9 @@ def plot_all_latencies(configs: list[Configuration]):
     for i, (label, c) in enumerate(transposed.items()):
         offset = width * i
         ys = [1000 * c.average_by("elapsed_time_ms") / c.average_by("records") for c in c]
+        yerr = error_bars(summarize_configs(c, "elapsed_time_ms")) * 1000 / np.array([c.records for c in c])
 
-        rects = ax.bar(x + offset, ys, width-0.01, zorder=3, label=label)
+        rects = ax.bar(x + offset, ys, width-0.01, yerr=yerr, capsize=3, zorder=3, label=label)
             # edgecolor="black", linewidth=1, hatch=patterns[i], color=colors[i])
         # ax.bar_label(rects, padding=3)
     ax.grid(zorder=0)
@@ -218,7 +320,8 @@ def plot_all_latencies(configs: list[Configuration]):
     for i, (label, c) in enumerate(transposed.items()):
         offset = width * i
         ys = [c.average_by("elapsed_time_ms") for c in c]
-        rects = ax.bar(x + offset, ys, width-0.01, zorder=3, label=label)
+        yerr = error_bars(summarize_configs(c, "elapsed_time_ms"))
+        rects = ax.bar(x + offset, ys, width-0.01, yerr=yerr, capsize=3, zorder=3, label=label)
             # edgecolor="black", linewidth=1, hatch=patterns[i], color=colors[i])
         # ax.bar_label(rects, padding=3)
     ax.grid(zorder=0)
@@ -246,7 +349,7 @@ def gen_tex_table(configs: list[Configuration]):
             return f"{ms / 1000:.1f}\\,s"
         return f"{ms:.0f}\\,ms"
 
-    out = "\\begin{tabular}{llllll}\n"
+    out = "\\begin{tabular}{" + "l" * (len(groups) + 1) + "}\n"
     out += "\\toprule\n"
     # out += "& Parquet & Parquet (P) & CSV & No. records & File size \\\\\n"
     out += '&' + " & ".join("\\textbf{" + k + "}" for k in groups.keys()) + " \\\\\n"
@@ -285,39 +388,142 @@ def gen_tex_table(configs: list[Configuration]):
     out += "\\end{tabular}\n"
 
     out_path = make_out_path("latency_table", "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "w") as f:
         f.write(out)
 
 
+def gen_throughput_table(configs: list[Configuration]):
+    groups = get_groups(configs)
+
+    def fmt(value, unit, precision=0):
+        if value is None:
+            return "N/A"
+        return f"{value:,.{precision}f}\\,{unit}"
+
+    out = "\\begin{tabular}{" + "l" * (len(groups) + 1) + "}\n"
+    out += "\\toprule\n"
+    out += '&' + " & ".join("\\textbf{" + k + "}" for k in groups.keys()) + " \\\\\n"
+    out += "\\midrule\n"
+
+    rows = [
+        ["Throughput w/ Parquet (NP)"],
+        ["Throughput w/ Parquet (P)"],
+        ["Throughput w/ CSV"],
+        ["Records/s w/ Parquet (NP)"],
+        ["Records/s w/ Parquet (P)"],
+        ["Records/s w/ CSV"],
+        ["Bytes read w/ Parquet (P)"],
+        ["Bytes per projected column"],
+        ["Parquet row groups"],
+    ]
+
+    for group in groups.values():
+        throughputs = [c.throughput() for c in group]
+        for i in range(3):
+            rows[i].append(fmt(throughputs[i]["mb_per_s"], "MB/s"))
+            rows[3 + i].append(fmt(throughputs[i]["rows_per_s"] / 1e3, "k"))
+        rows[6].append(format_bytes(group[1].bytes_read()).replace(" ", r"\,"))
+        rows[7].append(format_bytes(throughputs[1]["bytes_per_column"]).replace(" ", r"\,"))
+        rows[8].append(str(group[0].layout.row_groups or "N/A"))
+
+    for row in rows:
+        out += " & ".join(row) + " \\\\\n"
+
+    out += "\\bottomrule\n"
+    out += "\\end{tabular}\n"
+
+    out_path = make_out_path("throughput_table", "tex")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        f.write(out)
+
+
+def print_throughput(configs: list[Configuration]):
+    print(f"{'Configuration':<32} {'Size':>9} {'Read':>9} {'MB/s':>9} {'Records/s':>12} {'B/column':>9}")
+    for c in configs:
+        t = c.throughput()
+        mb_per_s = f"{t['mb_per_s']:.1f}" if t["mb_per_s"] is not None else "N/A"
+        print(f"{c.key:<32} {c.filesize():>9} {format_bytes(c.bytes_read()):>9} {mb_per_s:>9} "
+              f"{t['rows_per_s']:>12,.0f} {format_bytes(t['bytes_per_column']):>9}")
+
+
+def write_tables(configs: list[Configuration]):
+    # The tables compare the datasets side by side and are skipped for
+    # benchmarks without a complete group, e.g. filtered scans only.
+    if not get_groups(configs):
+        print("Skipping the tex tables, no dataset has Parquet, projected Parquet and CSV scans")
+        return
+    gen_tex_table(configs)
+    gen_throughput_table(configs)
+
+
 def read_data(file):
-    rows = Measurement.from_file(file)
+    with ResultsStore(work_dir / "output" / "results.sqlite") as store:
+        rows, errors = store.load([file], Measurement, Measurement.from_file)
+
+    report_errors(errors)
     print(f"Loaded {len(rows)} experiments")
     return rows
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python plotter.py <bench file path>")
-        exit(1)
+def make_configurations(measurements: list[Measurement], data_dir=None, projection=None):
+    # File layouts are read once per input path; for Parquet this only
+    # touches the footer.
+    layouts = {path: FileLayout.inspect(path, data_dir) for path in sorted(set(m.file for m in measurements))}
 
-    measurements = read_data(sys.argv[1])
-
-    configurations = [Configuration.from_measurements(key=k, measurements=list(g)) for k, g in groupby(
-        sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key())]
+    configurations = []
+    for k, g in groupby(sorted(measurements, key=lambda x: x.configuration_key()), lambda x: x.configuration_key()):
+        g = list(g)
+        configurations.append(Configuration.from_measurements(k, g, layouts[g[0].file], projection))
     configurations.sort(key=lambda x: x.key)
 
+    missing = [path for path, layout in layouts.items() if layout.size is None]
+    if missing:
+        print(f"Could not find {len(missing)} input files, pass --data-dir to look them up by name")
+
+    return configurations
+
+
+def parse_projection(values):
+    # "ssb=lo_revenue,lo_discount" -> {"ssb": ["lo_revenue", "lo_discount"]}
+    projection = {}
+    for value in values:
+        workload, _, columns = value.partition("=")
+        projection[workload] = [c for c in columns.split(",") if c]
+    return projection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot the Parquet vs. CSV scan benchmarks")
+    parser.add_argument("file", help="bench file path")
+    parser.add_argument("--data-dir", default=None,
+                        help="directory to look up input files by name if the recorded paths do not exist")
+    parser.add_argument("--projection", action="append", default=[], metavar="WORKLOAD=COL,COL",
+                        help="columns read by the projected scans of a workload, "
+                             "for benchmarks that do not record them")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS,
+                        help="expected repetitions per configuration, 0 to take the most common count "
+                             "(e.g. for adaptive runs)")
+    summary.add_argument(parser)
+    args = parser.parse_args()
+
+    measurements = read_data(args.file)
+    configurations = make_configurations(measurements, args.data_dir, parse_projection(args.projection))
+
     print(len(configurations))
     for c in configurations:
         print(c.key)
 
-    REPETITIONS = 4
-    valid = True
-    for c in configurations:
-        if len(c.measurements) != REPETITIONS:
-            print(f"Missing measurements for {c.key}, only has {len(c.measurements)}")
-            valid = False
-    if valid:
-        print(f"All configurations have {REPETITIONS} repetitions, good")
-
-    plot_all_latencies(configurations)
-    gen_tex_table(configurations)
+    if not configurations:
+        print(f"No measurements loaded from {args.file}")
+        exit(1)
+
+    check_repetitions(configurations, args.repetitions)
+
+    if args.summary:
+        summary.print_summary(configurations, "elapsed_time_ms", unit="ms", style=args.summary)
+    else:
+        plot_all_latencies(configurations)
+    write_tables(configurations)
+    print_throughput(configurations)
@@ -0,0 +1,147 @@
+"""Build the lineorder_flat Parquet file without materializing the join.
+
+The three-way join of notes.md is done in a stream: customer, supplier and
+part are loaded into in-memory indexes, lineorder is read batch by batch,
+each batch is probed against the indexes, widened by the dimension columns
+and appended to a Parquet writer. Memory is bounded by the dimensions plus
+a row group, so the flat file of large scale factors fits on a laptop.
+
+The input is either the Parquet directories of
+project-2/scripts/ssb_parquet.py or the .tbl files of dbgen. The output
+has the columns, in order, and the types of the schema in notes.md, where
+all integers are int32. lo_orderkey passes 2^31 from SF 358 on, which
+fails the cast; --wide-keys keeps the UINTEGER columns as int64 instead.
+
+Usage: python scripts/flatten_ssb.py (--parquet-dir ssb-sf10 | --tbl-dir sf10 [--delimiter '|'])
+                                     [--out lineorder_flat.parquet] [--row-group-size 122880] [--wide-keys]
+"""
+import argparse
+import pathlib
+import resource
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "project-2" / "scripts"))
+from ssb_parquet import ROW_GROUP_SIZE, open_tbl, read_schema, write_batches
+
+
+# Dimension, its key and the lineorder column referencing it, in the
+# column order of the flat table.
+DIMENSIONS = [
+    ("customer", "c_custkey", "lo_custkey"),
+    ("supplier", "s_suppkey", "lo_suppkey"),
+    ("part", "p_partkey", "lo_partkey"),
+]
+
+
+class Index:
+    """The rows of a dimension, addressed by key.
+
+    SSB keys are dense integers starting at 1, so the hash index is a plain
+    array from key to row, which makes a probe one vectorized lookup.
+    """
+
+    def __init__(self, table: pa.Table, key):
+        keys = table.column(key).to_numpy()
+        columns = table.drop_columns([key])
+        self.columns = pa.RecordBatch.from_arrays([c.combine_chunks() for c in columns.columns], schema=columns.schema)
+        self.rows = np.full(int(keys.max()) + 1 if len(keys) else 1, -1, dtype=np.int64)
+        self.rows[keys] = np.arange(len(keys))
+
+    def probe(self, keys):
+        # Row of every key, -1 where there is none.
+        keys = keys.astype(np.int64)
+        found = (keys >= 0) & (keys < len(self.rows))
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        rows[found] = self.rows[keys[found]]
+        return rows
+
+
+def flat_schema(schemas, wide_keys=False):
+    # ssb_parquet.py reads UINTEGER as int64; notes.md has int32.
+    fields = list(schemas["lineorder"])
+    for dimension, key, _ in DIMENSIONS:
+        fields += [field for field in schemas[dimension] if field.name != key]
+    if not wide_keys:
+        fields = [f.with_type(pa.int32()) if f.type == pa.int64() else f for f in fields]
+    return pa.schema(fields)
+
+
+def read_dimension(args, schemas, table):
+    if args.parquet_dir:
+        return pq.read_table(pathlib.Path(args.parquet_dir) / table, schema=schemas[table])
+    with open(pathlib.Path(args.tbl_dir) / f"{table}.tbl", "rb") as f:
+        return open_tbl(f, schemas[table], args.delimiter).read_all()
+
+
+def lineorder_batches(args, schema):
+    if args.parquet_dir:
+        for path in sorted((pathlib.Path(args.parquet_dir) / "lineorder").glob("*.parquet")):
+            yield from pq.ParquetFile(path).iter_batches(batch_size=args.row_group_size)
+        return
+    with open(pathlib.Path(args.tbl_dir) / "lineorder.tbl", "rb") as f:
+        yield from open_tbl(f, schema, args.delimiter)
+
+
+def widen(batches, indexes, schema, stats):
+    for batch in batches:
+        rows = [index.probe(batch.column(column).to_numpy()) for index, (_, _, column) in zip(indexes, DIMENSIONS)]
+
+        # Inner join: lineorder rows without a match in every dimension
+        # are dropped.
+        matched = np.logical_and.reduce([r >= 0 for r in rows])
+        if not matched.all():
+            batch = batch.filter(pa.array(matched))
+            rows = [r[matched] for r in rows]
+            stats["dropped"] += int((~matched).sum())
+
+        columns = batch.columns
+        for index, r in zip(indexes, rows):
+            columns += index.columns.take(pa.array(r)).columns
+        stats["batches"] += 1
+        # A safe cast, so keys beyond int32 fail instead of wrapping.
+        yield pa.RecordBatch.from_arrays([c.cast(f.type) for c, f in zip(columns, schema)], schema=schema)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build lineorder_flat.parquet with a streaming join")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--parquet-dir", help="output directory of project-2/scripts/ssb_parquet.py")
+    source.add_argument("--tbl-dir", help="directory with the dbgen .tbl files")
+    parser.add_argument("--delimiter", default=",",
+                        help="field separator of the .tbl files (',' for DATABASE=DB2, '|' otherwise)")
+    parser.add_argument("--out", default="lineorder_flat.parquet")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="rows per row group")
+    parser.add_argument("--compression", default="snappy")
+    parser.add_argument("--wide-keys", action="store_true",
+                        help="write the UINTEGER columns as int64, needed from SF 358 on")
+    args = parser.parse_args()
+
+    schemas = read_schema()
+    schema = flat_schema(schemas, args.wide_keys)
+
+    start = time.perf_counter()
+    indexes = []
+    for dimension, key, _ in DIMENSIONS:
+        table = read_dimension(args, schemas, dimension)
+        indexes.append(Index(table, key))
+        print(f"Indexed {table.num_rows:,} {dimension} rows ({indexes[-1].columns.nbytes / 1024 ** 2:.1f} MB)")
+
+    stats = {"batches": 0, "dropped": 0}
+    batches = widen(lineorder_batches(args, schemas["lineorder"]), indexes, schema, stats)
+    try:
+        rows = write_batches(batches, schema, pathlib.Path(args.out), args.row_group_size, args.compression)
+    except pa.ArrowInvalid as e:
+        print(f"{e}; pass --wide-keys to write the keys as int64")
+        exit(1)
+
+    # ru_maxrss is in kilobytes on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Wrote {rows:,} rows from {stats['batches']} batches to {args.out} in "
+          f"{time.perf_counter() - start:.1f}s, peak memory {peak:.0f} MB")
+    if stats["dropped"]:
+        print(f"Dropped {stats['dropped']:,} lineorder rows without a matching dimension row")
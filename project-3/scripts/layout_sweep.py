@@ -0,0 +1,181 @@
+"""Sweep Parquet layouts of a dataset and benchmark their scans.
+
+The Parquet files of project-3 are written with DuckDB's defaults. This
+rewrites a dataset, e.g. lineorder_flat or the Yelp reviews, once for
+every combination of row-group size, compression codec, dictionary
+encoding and data page size, recording the file size and the write time
+of each layout. The write time leaves out reading the source, which is
+recorded separately, so it does not depend on whether the source is
+Parquet or CSV. Every layout is then scanned like scripts/scan_bench.py
+does: in full, with the --projection columns of its workload and with the
+--filter predicates, so codecs are compared by decode cost as well as
+size and row-group sizes by how much the footer statistics can prune.
+
+The results are the JSON of scan_bench.py with a "layout" key in every
+record:
+
+    "layout": {"name": "rg122880-zstd-dict-p1048576", "rowGroupSize": 122880, "compression": "zstd",
+               "dictionary": true, "pageSize": 1048576, "fileBytes": 301989888, "rowGroups": 49,
+               "writeSeconds": 41.2, "readSeconds": 12.7}
+
+and are plotted with plots/layouts.py. The sources are read in batches,
+Parquet or CSV, so the sweep needs no more memory than a row group.
+
+Usage: python scripts/layout_sweep.py --file ssb=lineorder_flat.parquet [--file yelp=train.parquet]
+                                      [--row-group-size 122880 1048576] [--compression snappy zstd none]
+                                      [--dictionary on off] [--page-size 1048576]
+                                      [--projection ssb=lo_revenue,lo_discount] [--filter ssb=lo_discount>=5]
+                                      [--out-dir bench-out/layouts] [--delete] [--out bench-out/layouts.json]
+"""
+import argparse
+from dataclasses import dataclass
+import itertools
+import os
+import pathlib
+import sys
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "project-2" / "scripts"))
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+import adaptive
+from scan_bench import ITERATIONS, WARMUP, BATCH_SIZE, csv_options, parse_assignments, plan, run, write_results
+from ssb_parquet import write_batches
+
+
+ROW_GROUP_SIZES = [122880, 1 << 20]
+COMPRESSIONS = ["snappy", "zstd", "none"]
+DICTIONARY = ["on", "off"]
+PAGE_SIZES = [1 << 20]
+
+
+@dataclass
+class Layout:
+    row_group_size: int
+    compression: str
+    dictionary: bool
+    page_size: int
+
+    @property
+    def name(self):
+        encoding = "dict" if self.dictionary else "plain"
+        return f"rg{self.row_group_size}-{self.compression}-{encoding}-p{self.page_size}"
+
+    def describe(self, path: pathlib.Path, seconds, read_seconds):
+        return {
+            "name": self.name,
+            "rowGroupSize": self.row_group_size,
+            "compression": self.compression,
+            "dictionary": self.dictionary,
+            "pageSize": self.page_size,
+            "fileBytes": os.path.getsize(path),
+            "rowGroups": pq.ParquetFile(path).metadata.num_row_groups,
+            "writeSeconds": seconds,
+            "readSeconds": read_seconds,
+        }
+
+
+def layouts(args):
+    return [Layout(rg, codec, dictionary == "on", page) for rg, codec, dictionary, page in itertools.product(
+        args.row_group_size, args.compression, args.dictionary, args.page_size)]
+
+
+def read_source(path: pathlib.Path, args):
+    # (schema, batches) of a Parquet or CSV file, streamed.
+    if path.suffix == ".parquet":
+        f = pq.ParquetFile(path)
+        return f.schema_arrow, f.iter_batches(batch_size=BATCH_SIZE)
+
+    reader = pacsv.open_csv(path, **csv_options(args, None))
+    return reader.schema, iter(reader)
+
+
+def timed(batches, clock):
+    # Yields the batches, adding the time spent producing them to
+    # clock["read"].
+    while True:
+        start = time.perf_counter()
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return
+        finally:
+            clock["read"] += time.perf_counter() - start
+        yield batch
+
+
+def write_layout(source: pathlib.Path, out_path: pathlib.Path, layout: Layout, args):
+    # (rows, write seconds, read seconds); the source is read while the
+    # file is written, so the read time is taken out of the total.
+    schema, batches = read_source(source, args)
+    clock = {"read": 0.0}
+    start = time.perf_counter()
+    rows = write_batches(timed(batches, clock), schema, out_path, layout.row_group_size, layout.compression,
+                         use_dictionary=layout.dictionary, data_page_size=layout.page_size)
+    return rows, time.perf_counter() - start - clock["read"], clock["read"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scans over a sweep of Parquet layouts")
+    parser.add_argument("--file", action="append", required=True, metavar="WORKLOAD=PATH",
+                        help="dataset to rewrite, .parquet or CSV; repeat for more datasets")
+    parser.add_argument("--row-group-size", type=int, nargs="+", default=ROW_GROUP_SIZES, help="rows per row group")
+    parser.add_argument("--compression", nargs="+", default=COMPRESSIONS,
+                        help="codecs, e.g. snappy zstd lz4 gzip none")
+    parser.add_argument("--dictionary", nargs="+", choices=DICTIONARY, default=DICTIONARY,
+                        help="with and/or without dictionary encoding")
+    parser.add_argument("--page-size", type=int, nargs="+", default=PAGE_SIZES, help="data page size in bytes")
+    parser.add_argument("--projection", action="append", default=[], metavar="WORKLOAD=COL,COL",
+                        help="columns of the projected scans of a workload")
+    parser.add_argument("--filter", action="append", default=[], metavar="WORKLOAD=COL<OP>VALUE",
+                        help="predicate of the filtered scans of a workload, repeat to AND more")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="unrecorded scans per configuration")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(),
+                        help="decoding threads, 1 to scan single-threaded")
+    parser.add_argument("--csv-delimiter", default=",", help="field separator of CSV sources")
+    parser.add_argument("--out-dir", default="bench-out/layouts", help="where the rewritten files go")
+    parser.add_argument("--delete", action="store_true",
+                        help="delete every rewritten file after scanning it, for sweeps that do not fit on disk")
+    parser.add_argument("--out", default=None, help="JSON file for plots/layouts.py")
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+    # Scans of Parquet files never use zone maps.
+    args.zonemap = False
+
+    pa.set_cpu_count(args.threads)
+    pa.set_io_thread_count(args.threads)
+
+    files = []
+    for value in args.file:
+        workload, _, path = value.partition("=")
+        if not pathlib.Path(path).exists():
+            parser.error(f"{path} does not exist")
+        files.append((workload, pathlib.Path(path)))
+    projections = {w: v[-1].split(",") for w, v in parse_assignments(args.projection).items()}
+    filters = parse_assignments(args.filter)
+
+    out_dir = pathlib.Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = pathlib.Path(args.out or f"bench-out/layouts-{int(time.time())}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for workload, source in files:
+        for layout in layouts(args):
+            path = out_dir / f"{workload}-{layout.name}.parquet"
+            rows, seconds, read_seconds = write_layout(source, path, layout, args)
+            described = layout.describe(path, seconds, read_seconds)
+            print(f"{workload} {layout.name}: wrote {rows:,} rows in {seconds:.1f}s "
+                  f"(+{read_seconds:.1f}s reading the source), "
+                  f"{described['fileBytes'] / 1024 ** 2:.0f} MB")
+
+            run(plan([(workload, path)], projections, filters), args, out, results, {"layout": described})
+            if args.delete:
+                path.unlink()
+
+    write_results(out, results)
+    print(f"Wrote results to {out}")
@@ -0,0 +1,281 @@
+"""Scan Parquet and CSV files with Arrow, mirroring the Wayang workloads.
+
+A Python reference point for the Wayang Parquet source that needs no
+Wayang, Spark or Hadoop jars. Parquet files are read through pyarrow's
+dataset scanner, with column projection, row-group pruning on the footer
+statistics for --filter and multithreaded decoding. CSV files are the
+baseline and are read with the streaming CSV reader, which parses every
+row; filters are applied after parsing. With --zonemap, filtered CSV scans
+use the zone map of shared/zonemap.py instead (built first if missing,
+outside the timing): blocks the filter rules out are skipped and the rest
+is parsed in parallel byte ranges, so the comparison separates the cost of
+the format from the benefit of pruning.
+
+Every file is scanned without projection, with the --projection columns
+of its workload if given, and both again with the --filter predicates of
+its workload. The results are written in the JSON that plots/plotter.py
+reads, with the projected columns, the filter, the thread count and the
+row groups (or zone map blocks) read as extra keys:
+
+    [{"path": "file:///data/ssb-sf1.parquet", "workload": "ssb", "numRecords": 6001171,
+      "projected": false, "executionTimeMillis": 812.4, "iteration": 0, ...}, ...]
+
+Usage: python scripts/scan_bench.py --file ssb=lineorder_flat.parquet --file ssb=lineorder_flat.csv
+                                    [--projection ssb=lo_revenue,lo_discount] [--filter ssb=lo_discount>=5]
+                                    [--iterations 5] [--threads 8] [--out bench-out/scan.json]
+"""
+import argparse
+from dataclasses import dataclass
+import json
+import os
+import pathlib
+import sys
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "shared"))
+import adaptive
+import zonemap
+
+
+ITERATIONS = 5
+WARMUP = 1
+BATCH_SIZE = 1 << 17
+CSV_BLOCK_SIZE = 1 << 24
+
+OPERATORS = {
+    "=": lambda f, v: f == v,
+    "!=": lambda f, v: f != v,
+    "<": lambda f, v: f < v,
+    "<=": lambda f, v: f <= v,
+    ">": lambda f, v: f > v,
+    ">=": lambda f, v: f >= v,
+}
+
+
+@dataclass
+class Scan:
+    path: pathlib.Path
+    workload: str
+    columns: list[str] | None
+    filters: list[str]
+
+    @property
+    def format(self):
+        return "parquet" if self.path.suffix == ".parquet" else "csv"
+
+    def describe(self):
+        projection = ",".join(self.columns) if self.columns else "*"
+        where = f" WHERE {' AND '.join(self.filters)}" if self.filters else ""
+        return f"{self.workload}: SELECT {projection} FROM {self.path.name}{where}"
+
+
+def parse_assignments(values):
+    # ["ssb=lo_discount>=5", "ssb=lo_quantity<25"] -> {"ssb": ["lo_discount>=5", "lo_quantity<25"]}
+    assignments = {}
+    for value in values:
+        workload, _, rest = value.partition("=")
+        assignments.setdefault(workload, []).append(rest)
+    return assignments
+
+
+def make_filter(filters, schema: pa.Schema):
+    expression = None
+    for text in filters:
+        column, operator, value = zonemap.parse_predicate(text)
+        if column not in schema.names:
+            raise ValueError(f"Filter {text!r}: no column {column}")
+
+        # The literal is cast to the column type, so dates and strings work
+        # as well as numbers.
+        literal = pc.cast(pa.scalar(value), schema.field(column).type)
+        condition = OPERATORS[operator](ds.field(column), literal)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def csv_options(args, columns):
+    return dict(
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=args.threads > 1),
+        parse_options=pacsv.ParseOptions(delimiter=args.csv_delimiter),
+        convert_options=pacsv.ConvertOptions(include_columns=columns or []),
+    )
+
+
+def csv_schema(path, args):
+    with pacsv.open_csv(path, **csv_options(args, None)) as reader:
+        return reader.schema
+
+
+def row_groups(dataset, expression):
+    # Row groups left after pruning on the footer statistics.
+    count = 0
+    for fragment in dataset.get_fragments():
+        count += len(fragment.split_by_row_group(expression, schema=dataset.schema))
+    return count
+
+
+def scan_parquet(scan: Scan, args):
+    dataset = ds.dataset(scan.path, format="parquet")
+    expression = make_filter(scan.filters, dataset.schema) if scan.filters else None
+    scanner = dataset.scanner(columns=scan.columns, filter=expression, batch_size=BATCH_SIZE,
+                              use_threads=args.threads > 1)
+
+    rows = 0
+    for batch in scanner.to_batches():
+        rows += batch.num_rows
+    return rows
+
+
+def scan_csv(scan: Scan, args, schema: pa.Schema):
+    if args.zonemap and scan.filters:
+        predicates = [zonemap.parse_predicate(f) for f in scan.filters]
+        rows, _, _ = zonemap.scan(scan.path, predicates, scan.columns, args.threads)
+        return rows
+
+    # Filter columns have to be parsed too, but only the projection counts.
+    columns = scan.columns
+    if columns and scan.filters:
+        columns = list(dict.fromkeys(columns + [zonemap.parse_predicate(f)[0] for f in scan.filters]))
+    expression = make_filter(scan.filters, schema) if scan.filters else None
+
+    rows = 0
+    with pacsv.open_csv(scan.path, **csv_options(args, columns)) as reader:
+        for batch in reader:
+            if expression is not None:
+                batch = batch.filter(expression)
+            rows += batch.num_rows
+    return rows
+
+
+def load_zonemap(path, args):
+    try:
+        return zonemap.ZoneMap.load(path)
+    except (FileNotFoundError, ValueError):
+        start = time.perf_counter()
+        index = zonemap.build(path, delimiter=args.csv_delimiter)
+        index.save()
+        print(f"Built the zone map of {path.name} in {time.perf_counter() - start:.1f}s")
+        return index
+
+
+def measure(scan: Scan, args, schema):
+    start = time.perf_counter()
+    rows = scan_parquet(scan, args) if scan.format == "parquet" else scan_csv(scan, args, schema)
+    return time.perf_counter() - start, rows
+
+
+def plan(files, projections, filters):
+    scans = []
+    for workload, path in files:
+        variants = [None] + ([projections[workload]] if workload in projections else [])
+        for columns in variants:
+            scans.append(Scan(path, workload, columns, []))
+            if workload in filters:
+                scans.append(Scan(path, workload, columns, filters[workload]))
+    return scans
+
+
+def record(scan: Scan, args, rows, seconds, iteration, scanned_row_groups, extra=None):
+    return {
+        "path": scan.path.resolve().as_uri(),
+        "workload": scan.workload,
+        "numRecords": rows,
+        "projected": scan.columns is not None,
+        "executionTimeMillis": seconds * 1000,
+        "iteration": iteration,
+        "columns": scan.columns or [],
+        "filter": scan.filters,
+        "threads": args.threads,
+        "rowGroups": scanned_row_groups,
+        "zonemap": args.zonemap and scan.format == "csv" and bool(scan.filters),
+        **(extra or {}),
+    }
+
+
+def write_results(path, results):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, path)
+
+
+def run(scans, args, out, results=None, extra=None):
+    # Appends to results, so several runs can go to one file; extra keys
+    # are added to every record.
+    results = [] if results is None else results
+    for scan in scans:
+        if scan.format == "parquet":
+            dataset = ds.dataset(scan.path, format="parquet")
+            schema = dataset.schema
+            expression = make_filter(scan.filters, schema) if scan.filters else None
+            scanned_row_groups = row_groups(dataset, expression)
+        elif args.zonemap and scan.filters:
+            schema = csv_schema(scan.path, args)
+            index = load_zonemap(scan.path, args)
+            scanned_row_groups = len(index.prune([zonemap.parse_predicate(f) for f in scan.filters]))
+        else:
+            schema = csv_schema(scan.path, args)
+            scanned_row_groups = None
+
+        if args.adaptive:
+            outcome = adaptive.measure_adaptively(lambda: measure(scan, args, schema), adaptive.policy_from_args(args))
+            samples = list(zip(outcome.samples, outcome.data))
+            note = f" after {len(outcome.warmup)} warm-up runs ({outcome.stop_reason})"
+        else:
+            for _ in range(args.warmup):
+                measure(scan, args, schema)
+            samples = [measure(scan, args, schema) for _ in range(args.iterations)]
+            note = ""
+
+        for iteration, (seconds, rows) in enumerate(samples):
+            results.append(record(scan, args, rows, seconds, iteration, scanned_row_groups, extra))
+        write_results(out, results)
+
+        mean = sum(s for s, _ in samples) / len(samples)
+        row_group_note = f", {scanned_row_groups} row groups" if scanned_row_groups is not None else ""
+        print(f"{scan.describe()}: {samples[0][1]:,} rows in {mean * 1000:.0f} ms "
+              f"(mean of {len(samples)}{note}{row_group_note})")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Parquet and CSV scans with Arrow")
+    parser.add_argument("--file", action="append", required=True, metavar="WORKLOAD=PATH",
+                        help="file to scan, .parquet or CSV; repeat for more files")
+    parser.add_argument("--projection", action="append", default=[], metavar="WORKLOAD=COL,COL",
+                        help="columns of the projected scans of a workload")
+    parser.add_argument("--filter", action="append", default=[], metavar="WORKLOAD=COL<OP>VALUE",
+                        help="predicate of the filtered scans of a workload, repeat to AND more")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="unrecorded scans per configuration")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(),
+                        help="decoding threads, 1 to scan single-threaded")
+    parser.add_argument("--csv-delimiter", default=",")
+    parser.add_argument("--zonemap", action="store_true",
+                        help="skip CSV blocks with a zone map in filtered scans, see shared/zonemap.py")
+    parser.add_argument("--out", default=None, help="JSON file for plots/plotter.py")
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    pa.set_cpu_count(args.threads)
+    pa.set_io_thread_count(args.threads)
+
+    files = []
+    for value in args.file:
+        workload, _, path = value.partition("=")
+        if not pathlib.Path(path).exists():
+            parser.error(f"{path} does not exist")
+        files.append((workload, pathlib.Path(path)))
+    projections = {w: v[-1].split(",") for w, v in parse_assignments(args.projection).items()}
+    filters = parse_assignments(args.filter)
+
+    out = pathlib.Path(args.out or f"bench-out/scan-{int(time.time())}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    run(plan(files, projections, filters), args, out)
+    print(f"Wrote results to {out}")
@@ -0,0 +1,165 @@
+"""Count words in a Parquet text column on all cores.
+
+A local reference for the Wayang word count in wayang-parquet-test and a
+quick way to size the vocabulary of the project-1 classifier. The row
+groups of the input files are split over worker processes; each worker
+reads only the text column of its row groups, tokenizes every value and
+counts locally. The per-worker counts are merged pairwise in the pool, a
+tree reduction of log2(workers) rounds instead of one process merging
+them all.
+
+The default tokenizer is tokenize() of project-1/naive_bayes_udtf.py;
+--tokenizer wayang splits on non-word characters and lowercases, as
+Main.java does.
+
+Usage: python scripts/word_count.py yelp_review_full/train-00000-of-00001.parquet [--column text]
+                                    [--jobs 8] [--top 20] [--tokenizer project|wayang] [--out counts.json]
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import json
+import os
+import pathlib
+import re
+import sys
+import time
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "project-1"))
+from naive_bayes_udtf import tokenize
+
+
+NON_WORD = re.compile(r"\W+")
+
+# Vocabulary sizes are reported for words seen at least this often.
+MIN_COUNTS = [1, 2, 5, 10, 100]
+
+
+def tokenize_wayang(text):
+    return [token.lower() for token in NON_WORD.split(text) if token]
+
+
+TOKENIZERS = {"project": tokenize, "wayang": tokenize_wayang}
+
+
+@dataclass
+class Partial:
+    counts: Counter = field(default_factory=Counter)
+    rows: int = 0
+    tokens: int = 0
+    text_bytes: int = 0
+    seconds: float = 0.0
+
+
+def count_row_groups(path, row_groups, column, tokenizer):
+    start = time.perf_counter()
+    split = TOKENIZERS[tokenizer]
+    partial = Partial()
+
+    f = pq.ParquetFile(path)
+    for i in row_groups:
+        values = f.read_row_group(i, columns=[column]).column(column)
+        partial.rows += len(values)
+        partial.text_bytes += pc.sum(pc.binary_length(values)).as_py() or 0
+        for text in values.to_pylist():
+            if text is None:
+                continue
+            tokens = split(text)
+            partial.tokens += len(tokens)
+            partial.counts.update(tokens)
+
+    partial.seconds = time.perf_counter() - start
+    return partial
+
+
+def merge(a: Partial, b: Partial):
+    # Merged into the bigger counter, which is cheaper to update.
+    if len(a.counts) < len(b.counts):
+        a, b = b, a
+    a.counts.update(b.counts)
+    a.rows += b.rows
+    a.tokens += b.tokens
+    a.text_bytes += b.text_bytes
+    a.seconds += b.seconds
+    return a
+
+
+def tree_reduce(pool, partials):
+    rounds = 0
+    while len(partials) > 1:
+        pairs = [pool.submit(merge, partials[i], partials[i + 1]) for i in range(0, len(partials) - 1, 2)]
+        rest = partials[-1:] if len(partials) % 2 else []
+        partials = [p.result() for p in pairs] + rest
+        rounds += 1
+    return partials[0], rounds
+
+
+def plan(paths, jobs):
+    # Row groups are dealt round robin, so workers get a similar share of
+    # every file.
+    tasks = {}
+    n = 0
+    for path in paths:
+        for i in range(pq.ParquetFile(path).metadata.num_row_groups):
+            tasks.setdefault((n % jobs, path), []).append(i)
+            n += 1
+    return [(path, row_groups) for (_, path), row_groups in tasks.items()], n
+
+
+def vocabulary_sizes(counts: Counter):
+    return {m: sum(1 for c in counts.values() if c >= m) for m in MIN_COUNTS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count words in Parquet text columns in parallel")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--column", default="text")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--top", type=int, default=20, help="most frequent words to print")
+    parser.add_argument("--tokenizer", choices=list(TOKENIZERS), default="project")
+    parser.add_argument("--out", default=None, help="write the counts and statistics as JSON")
+    args = parser.parse_args()
+
+    tasks, row_groups = plan(args.files, args.jobs)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(count_row_groups, path, groups, args.column, args.tokenizer) for path, groups in tasks]
+        partials = [f.result() for f in futures]
+        counted = time.perf_counter()
+        total, rounds = tree_reduce(pool, partials)
+    end = time.perf_counter()
+
+    elapsed = end - start
+    print(f"Counted {total.tokens:,} tokens in {total.rows:,} rows from {row_groups} row groups "
+          f"with {args.jobs} workers in {elapsed:.2f}s")
+    print(f"  count:  {counted - start:.2f}s ({total.seconds:.2f}s worker time)")
+    print(f"  reduce: {end - counted:.2f}s ({len(partials)} partial counts, {rounds} rounds)")
+    print(f"  {total.rows / elapsed:,.0f} rows/s, {total.tokens / elapsed:,.0f} tokens/s, "
+          f"{total.text_bytes / 1e6 / elapsed:.1f} MB/s of text")
+
+    sizes = vocabulary_sizes(total.counts)
+    print("\nVocabulary: " + ", ".join(f"{n:,} words seen >= {m}x" for m, n in sizes.items()))
+
+    top = total.counts.most_common(args.top)
+    print(f"\nTop {len(top)} words:")
+    for word, count in top:
+        print(f"  {count:>12,}  {word}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "files": args.files,
+                "column": args.column,
+                "tokenizer": args.tokenizer,
+                "jobs": args.jobs,
+                "rows": total.rows,
+                "tokens": total.tokens,
+                "text_bytes": total.text_bytes,
+                "elapsed": elapsed,
+                "vocabulary": sizes,
+                "top": top,
+            }, f, indent=2)
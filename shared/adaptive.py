@@ -0,0 +1,130 @@
+"""Adaptive repetition control for the benchmark runners.
+
+Instead of a fixed repetition count, a configuration is measured until its
+confidence interval is narrow enough. Leading runs are treated as warm-up
+until two consecutive runs agree, then samples are taken until the relative
+CI width (CI width / mean, with the Student-t CI of stats.t_ci) falls below
+the target, the sample limit is hit or the time budget runs out; a
+bootstrap CI is too narrow for the few samples the decision is made on.
+The reason for stopping is recorded with the samples.
+"""
+from dataclasses import dataclass, field
+import time
+
+from stats import CONFIDENCE, t_ci
+
+
+TARGET_CI = 0.05
+MIN_SAMPLES = 3
+MAX_SAMPLES = 30
+MAX_WARMUP = 5
+# A run counts as warmed up when it is at most this much faster than the
+# run before it.
+WARMUP_TOLERANCE = 0.1
+
+CONVERGED = "converged"
+MAX_SAMPLES_REACHED = "max_samples"
+BUDGET_EXHAUSTED = "budget"
+
+
+@dataclass
+class Policy:
+    target_ci: float = TARGET_CI
+    min_samples: int = MIN_SAMPLES
+    max_samples: int = MAX_SAMPLES
+    max_warmup: int = MAX_WARMUP
+    warmup_tolerance: float = WARMUP_TOLERANCE
+    # Seconds per configuration, warm-up included; None for no limit.
+    budget: float | None = None
+    confidence: float = CONFIDENCE
+
+
+@dataclass
+class Outcome:
+    samples: list[float] = field(default_factory=list)
+    data: list = field(default_factory=list)
+    warmup: list[float] = field(default_factory=list)
+    stop_reason: str = ""
+    relative_ci: float = float("inf")
+    elapsed: float = 0.0
+
+    def summary(self):
+        return {
+            "samples": len(self.samples),
+            "warmup": len(self.warmup),
+            "stop_reason": self.stop_reason,
+            "relative_ci": self.relative_ci,
+            "elapsed": self.elapsed,
+        }
+
+
+def relative_ci(samples, confidence=CONFIDENCE):
+    if len(samples) < 2:
+        return float("inf")
+    mean, low, high = t_ci(samples, confidence)
+    return (high - low) / mean if mean > 0 else float("inf")
+
+
+def measure_adaptively(measure, policy: Policy | None = None):
+    # measure() runs the configuration once and returns (seconds, data);
+    # data (e.g. a profile) is kept for the samples, not for warm-up runs.
+    policy = policy or Policy()
+    outcome = Outcome()
+    start = time.perf_counter()
+
+    def out_of_budget(expected):
+        # Stop early if the next run, expected to take as long as the last
+        # one, does not fit.
+        if policy.budget is None:
+            return False
+        return time.perf_counter() - start + expected > policy.budget
+
+    previous = measure()
+    while len(outcome.warmup) < policy.max_warmup:
+        if out_of_budget(previous[0]):
+            break
+        current = measure()
+        if current[0] >= previous[0] * (1 - policy.warmup_tolerance):
+            outcome.samples.append(previous[0])
+            outcome.data.append(previous[1])
+            previous = current
+            break
+        outcome.warmup.append(previous[0])
+        previous = current
+
+    outcome.samples.append(previous[0])
+    outcome.data.append(previous[1])
+
+    while True:
+        n = len(outcome.samples)
+        outcome.relative_ci = relative_ci(outcome.samples, policy.confidence)
+
+        if n >= policy.min_samples and outcome.relative_ci <= policy.target_ci:
+            outcome.stop_reason = CONVERGED
+            break
+        if n >= policy.max_samples:
+            outcome.stop_reason = MAX_SAMPLES_REACHED
+            break
+        if out_of_budget(outcome.samples[-1]):
+            outcome.stop_reason = BUDGET_EXHAUSTED
+            break
+
+        seconds, data = measure()
+        outcome.samples.append(seconds)
+        outcome.data.append(data)
+
+    outcome.elapsed = time.perf_counter() - start
+    return outcome
+
+
+def add_arguments(parser):
+    parser.add_argument("--adaptive", action="store_true",
+                        help="repeat each configuration until its confidence interval is narrow enough")
+    parser.add_argument("--target-ci", type=float, default=TARGET_CI,
+                        help="relative CI width to stop at (0.05 = +-2.5%% around the mean)")
+    parser.add_argument("--max-samples", type=int, default=MAX_SAMPLES)
+    parser.add_argument("--budget", type=float, default=None, help="seconds per configuration")
+
+
+def policy_from_args(args):
+    return Policy(target_ci=args.target_ci, max_samples=args.max_samples, budget=args.budget)
@@ -0,0 +1,219 @@
+"""Query backends for the benchmark runners.
+
+A backend runs the text of a query file against a scaling factor and a
+warehouse and returns how long the query took. SnowSQLBackend shells out to
+the SnowSQL client like the original bench scripts; DuckDBTPCHBackend runs
+the same files against a local TPC-H database, so sweeps can be developed
+offline. Warehouses map to a thread count there.
+"""
+from dataclasses import dataclass
+import os
+import pathlib
+import re
+import subprocess
+import threading
+import time
+
+
+RESULT_CACHE_OFF = "ALTER SESSION SET USE_CACHED_RESULT=FALSE"
+
+# Snowflake-only statements that the query files start with.
+SESSION_STATEMENT = re.compile(r"(alter\s+session|use)\s", re.IGNORECASE)
+
+# Threads per warehouse size, following the doubling of Snowflake's
+# per-size compute.
+WAREHOUSE_THREADS = {"XS": 1, "S": 2, "M": 4, "L": 8, "XL": 16}
+
+TPCH_SCHEMA = {
+    "region": "r_regionkey INTEGER, r_name VARCHAR, r_comment VARCHAR",
+    "nation": "n_nationkey INTEGER, n_name VARCHAR, n_regionkey INTEGER, n_comment VARCHAR",
+    "supplier": "s_suppkey INTEGER, s_name VARCHAR, s_address VARCHAR, s_nationkey INTEGER, "
+                "s_phone VARCHAR, s_acctbal DECIMAL(15,2), s_comment VARCHAR",
+    "customer": "c_custkey INTEGER, c_name VARCHAR, c_address VARCHAR, c_nationkey INTEGER, "
+                "c_phone VARCHAR, c_acctbal DECIMAL(15,2), c_mktsegment VARCHAR, c_comment VARCHAR",
+    "part": "p_partkey INTEGER, p_name VARCHAR, p_mfgr VARCHAR, p_brand VARCHAR, p_type VARCHAR, "
+            "p_size INTEGER, p_container VARCHAR, p_retailprice DECIMAL(15,2), p_comment VARCHAR",
+    "partsupp": "ps_partkey INTEGER, ps_suppkey INTEGER, ps_availqty INTEGER, "
+                "ps_supplycost DECIMAL(15,2), ps_comment VARCHAR",
+    "orders": "o_orderkey INTEGER, o_custkey INTEGER, o_orderstatus VARCHAR, o_totalprice DECIMAL(15,2), "
+              "o_orderdate DATE, o_orderpriority VARCHAR, o_clerk VARCHAR, o_shippriority INTEGER, "
+              "o_comment VARCHAR",
+    "lineitem": "l_orderkey INTEGER, l_partkey INTEGER, l_suppkey INTEGER, l_linenumber INTEGER, "
+                "l_quantity DECIMAL(15,2), l_extendedprice DECIMAL(15,2), l_discount DECIMAL(15,2), "
+                "l_tax DECIMAL(15,2), l_returnflag VARCHAR, l_linestatus VARCHAR, l_shipdate DATE, "
+                "l_commitdate DATE, l_receiptdate DATE, l_shipinstruct VARCHAR, l_shipmode VARCHAR, "
+                "l_comment VARCHAR",
+}
+
+
+@dataclass
+class QueryResult:
+    elapsed_time: float
+    wall_time: float
+    rows: int
+    output: str = ""
+
+
+class BackendError(Exception):
+    pass
+
+
+def split_statements(text: str):
+    text = re.sub(r"--[^\n]*", "", text)
+    return [st.strip() for st in text.split(";") if st.strip()]
+
+
+def scaling_factor_number(scaling_factor: str):
+    # "SF100" -> 100, "SF0.01" -> 0.01
+    value = float(scaling_factor.upper().removeprefix("SF"))
+    return int(value) if value.is_integer() else value
+
+
+class SnowSQLBackend:
+    name = "snowsql"
+    # Warehouses are separate compute, so runs on different ones can
+    # overlap without disturbing each other.
+    concurrent = True
+
+    def __init__(self, binary="snowsql", database="SNOWFLAKE_SAMPLE_DATA", connection=None, timeout=None):
+        self.binary = binary
+        self.database = database
+        self.connection = connection
+        self.timeout = timeout
+
+    def command(self, sql, scaling_factor, warehouse):
+        command = [self.binary, "-d", self.database, "-s", f"TPCH_{scaling_factor}", "-w", warehouse,
+                   "-q", sql, "-o", "output_format=csv", "-o", "timing=true", "-o", "exit_on_error=true"]
+        if self.connection:
+            command += ["-c", self.connection]
+        return command
+
+    def run(self, sql, scaling_factor, warehouse, disable_result_cache=True):
+        statements = split_statements(sql)
+        if disable_result_cache and not any(st.upper().startswith(RESULT_CACHE_OFF) for st in statements):
+            statements.insert(0, RESULT_CACHE_OFF)
+
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(self.command(";\n".join(statements) + ";", scaling_factor, warehouse),
+                                     capture_output=True, text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise BackendError(f"timed out after {self.timeout}s")
+        wall_time = time.perf_counter() - start
+
+        output = process.stdout + process.stderr
+        if process.returncode != 0:
+            raise BackendError(f"snowsql exited with {process.returncode}: {output.strip()[-500:]}")
+
+        # The last statement is the query; SnowSQL reports its server-side
+        # time like the bench-*.txt files the plotter reads.
+        produced = re.findall(r"(\d+) Row\(s\) produced\. Time Elapsed: ([\d.]+)s", output)
+        if not produced:
+            raise BackendError(f"no timing in snowsql output: {output.strip()[-500:]}")
+        rows, elapsed = produced[-1]
+
+        return QueryResult(elapsed_time=float(elapsed), wall_time=wall_time, rows=int(rows), output=output)
+
+    def close(self):
+        pass
+
+
+class DuckDBTPCHBackend:
+    name = "duckdb"
+    # One process shares its cores between all runs, so overlapping runs
+    # would measure each other.
+    concurrent = False
+
+    def __init__(self, data_dir="bench-out/duckdb", tbl_dir=None, threads=None):
+        import duckdb
+
+        self.duckdb = duckdb
+        self.data_dir = pathlib.Path(data_dir)
+        # May contain "{scaling_factor}" to pick a directory of dbgen output
+        # per scaling factor; without it, the tpch extension generates data.
+        self.tbl_dir = tbl_dir
+        self.threads = threads or {}
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def warehouse_threads(self, warehouse):
+        if warehouse in self.threads:
+            return self.threads[warehouse]
+        size = warehouse.rsplit("_", 1)[-1].upper()
+        if size not in WAREHOUSE_THREADS:
+            raise BackendError(f"no thread count for warehouse {warehouse}")
+        return WAREHOUSE_THREADS[size]
+
+    def load(self, con, scaling_factor):
+        sf = scaling_factor_number(scaling_factor)
+        if self.tbl_dir is None:
+            con.execute("INSTALL tpch")
+            con.execute("LOAD tpch")
+            con.execute(f"CALL dbgen(sf={sf})")
+            return
+
+        tbl_dir = pathlib.Path(str(self.tbl_dir).format(scaling_factor=sf))
+        for table, columns in TPCH_SCHEMA.items():
+            con.execute(f"CREATE TABLE {table} ({columns})")
+            con.execute(f"COPY {table} FROM '{tbl_dir / (table + '.tbl')}' (DELIMITER '|')")
+
+    def connect(self, scaling_factor):
+        with self.lock:
+            if scaling_factor in self.connections:
+                return self.connections[scaling_factor]
+
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            path = self.data_dir / f"tpch-{scaling_factor.lower()}.duckdb"
+            if not path.exists():
+                # Built under a temporary name so an interrupted load is not
+                # mistaken for a complete database on the next run.
+                partial = path.with_suffix(".partial")
+                if partial.exists():
+                    partial.unlink()
+                print(f"Loading TPC-H {scaling_factor} into {path}")
+                con = self.duckdb.connect(str(partial))
+                self.load(con, scaling_factor)
+                con.close()
+                os.replace(partial, path)
+
+            self.connections[scaling_factor] = self.duckdb.connect(str(path), read_only=True)
+            return self.connections[scaling_factor]
+
+    def run(self, sql, scaling_factor, warehouse, disable_result_cache=True):
+        # DuckDB has no result cache, so there is nothing to disable.
+        statements = [st for st in split_statements(sql) if not SESSION_STATEMENT.match(st)]
+        try:
+            # Loading the database, e.g. without the tpch extension, and the
+            # statements before the query fail like the query itself.
+            con = self.connect(scaling_factor)
+            con.execute(f"SET threads = {self.warehouse_threads(warehouse)}")
+            for st in statements[:-1]:
+                con.execute(st)
+        except self.duckdb.Error as e:
+            raise BackendError(str(e))
+
+        start = time.perf_counter()
+        try:
+            rows = con.execute(statements[-1]).fetchall()
+        except self.duckdb.Error as e:
+            raise BackendError(str(e))
+        elapsed = time.perf_counter() - start
+
+        return QueryResult(elapsed_time=elapsed, wall_time=elapsed, rows=len(rows))
+
+    def close(self):
+        for con in self.connections.values():
+            con.close()
+        self.connections = {}
+
+
+BACKENDS = {
+    SnowSQLBackend.name: SnowSQLBackend,
+    DuckDBTPCHBackend.name: DuckDBTPCHBackend,
+}
+
+
+def make_backend(name, options=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**(options or {}))
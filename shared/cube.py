@@ -0,0 +1,76 @@
+"""Configurations indexed by their dimensions.
+
+A Cube maps a tuple of dimension values (query, threads, scaling factor, ...)
+to a single Cell, so looking up or slicing the results costs the number of
+cells returned rather than a scan over every configuration. Repetition
+statistics are computed once for all cells when the cube is built.
+"""
+from dataclasses import dataclass
+from itertools import product
+from typing import Any
+
+from stats import Summary, summarize_configs
+
+
+@dataclass
+class Cell:
+    coords: dict[str, Any]
+    config: Any
+    stats: dict[str, Summary]
+
+    @property
+    def means(self):
+        return {metric: s.mean for metric, s in self.stats.items()}
+
+
+class Cube:
+    def __init__(self, configs, dims: dict, metrics=()):
+        self.dims = list(dims)
+        self.cells: dict[tuple, Cell] = {}
+
+        for c in configs:
+            coords = {d: extract(c) for d, extract in dims.items()}
+            key = tuple(coords.values())
+            if key in self.cells:
+                raise ValueError(f"Two configurations share the cell {coords}")
+            self.cells[key] = Cell(coords, c, {})
+
+        cells = list(self.cells.values())
+        for metric in metrics if cells else ():
+            for cell, summary in zip(cells, summarize_configs([cell.config for cell in cells], metric)):
+                cell.stats[metric] = summary
+
+        self._values = {d: sorted(set(key[i] for key in self.cells)) for i, d in enumerate(self.dims)}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def values(self, dim):
+        return self._values[dim]
+
+    def check_dims(self, coords):
+        # A misspelled dimension would otherwise be ignored and match every
+        # cell.
+        unknown = [d for d in coords if d not in self.dims]
+        if unknown:
+            raise ValueError(f"Unknown dimensions {', '.join(unknown)}, expected {', '.join(self.dims)}")
+
+    def get(self, **coords) -> Cell | None:
+        self.check_dims(coords)
+        return self.cells.get(tuple(coords[d] for d in self.dims))
+
+    def slice(self, **fixed) -> list[Cell]:
+        # Fixed dimensions take either a single value or a list of values
+        # (kept in the given order); free dimensions run over all their
+        # values in sorted order.
+        self.check_dims(fixed)
+        axes = []
+        for d in self.dims:
+            if d not in fixed:
+                axes.append(self._values[d])
+            elif isinstance(fixed[d], (list, tuple)):
+                axes.append(fixed[d])
+            else:
+                axes.append([fixed[d]])
+
+        return [self.cells[key] for key in product(*axes) if key in self.cells]
@@ -0,0 +1,57 @@
+"""Parallel parsing of raw benchmark files.
+
+Files are parsed in a process pool and returned in sorted path order.
+Files that fail to parse are collected with their error instead of aborting
+the whole load.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+
+@dataclass
+class IngestError:
+    path: str
+    error: str
+
+
+def parse_one(parse, path):
+    try:
+        result = parse(path)
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+    return path, result if isinstance(result, list) else [result], None
+
+
+def parse_files(paths, parse, workers=None):
+    paths = sorted(str(p) for p in paths)
+    task = partial(parse_one, parse)
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        return collect(map(task, paths))
+
+    with ProcessPoolExecutor(workers) as pool:
+        # pool.map yields in submission order, which keeps the result
+        # deterministic regardless of which worker finishes first.
+        chunksize = max(1, len(paths) // (4 * workers))
+        return collect(pool.map(task, paths, chunksize=chunksize))
+
+
+def collect(outcomes):
+    parsed = []
+    errors = []
+    for path, measurements, error in outcomes:
+        if error is None:
+            parsed.append((path, measurements))
+        else:
+            errors.append(IngestError(path, error))
+    return parsed, errors
+
+
+def report_errors(errors: list[IngestError]):
+    for e in errors:
+        print(f"Error processing {e.path}: {e.error}")
+    if errors:
+        print(f"Skipped {len(errors)} malformed files")
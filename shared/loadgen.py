@@ -0,0 +1,344 @@
+"""Concurrent multi-client load generator.
+
+Replays a weighted mix of the TPC-H (project-1/tpc-h-queries) and SSB
+(project-2/sql) query files from N concurrent clients and reports throughput,
+queueing delay and latency percentiles, overall and per time window.
+
+Closed loop: every client sends its next query as soon as the previous one
+returns (plus an optional think time), so the offered load adapts to the
+system. Open loop: queries arrive at a fixed rate (evenly spaced or Poisson)
+regardless of completions and wait in a queue for a free client, so
+overload shows up as growing queueing delay.
+
+Backends: "duckdb" runs against local database files built by
+project-2/scripts/run_ssb.py and project-1/scripts/bench_tpc_h.py, one cursor
+per client; "snowsql" runs the TPC-H files through SnowSQL.
+
+Usage: python shared/loadgen.py --clients 8 --duration 60 [--mode open --rate 20]
+                                [--mix tpch=1,ssb=1] [--out load.json]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+import json
+import pathlib
+import random
+import threading
+import time
+
+import numpy as np
+
+from backends import BackendError, SESSION_STATEMENT, SnowSQLBackend, split_statements
+
+
+REPO_DIR = pathlib.Path(__file__).resolve().parents[1]
+QUERY_DIRS = {
+    "tpch": REPO_DIR / "project-1" / "tpc-h-queries",
+    "ssb": REPO_DIR / "project-2" / "sql",
+}
+DEFAULT_DATABASES = {
+    "tpch": "bench-out/duckdb/tpch-sf1.duckdb",
+    "ssb": "bench-out/duckdb/ssb-sf1.duckdb",
+}
+
+PERCENTILES = [50, 90, 95, 99]
+WINDOW = 5.0
+
+
+@dataclass
+class Query:
+    workload: str
+    name: str
+    sql: str
+
+
+@dataclass
+class Request:
+    client: int
+    workload: str
+    query: str
+    arrival: float
+    start: float = 0.0
+    end: float = 0.0
+    error: str = ""
+
+    @property
+    def latency(self):
+        return self.end - self.start
+
+    @property
+    def queueing(self):
+        return self.start - self.arrival
+
+
+def read_queries(workloads, names=None):
+    queries = []
+    for workload in workloads:
+        for path in sorted(QUERY_DIRS[workload].glob("q*.sql")):
+            if names and path.stem not in names:
+                continue
+            queries.append(Query(workload, path.stem, path.read_text()))
+    return queries
+
+
+class DuckDBTarget:
+    # All workloads are attached to one in-process database; each client
+    # thread gets its own cursor, which DuckDB runs concurrently.
+    def __init__(self, databases, threads=None):
+        import duckdb
+
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f"SET threads = {threads}")
+        for workload, path in databases.items():
+            if not pathlib.Path(path).exists():
+                raise SystemExit(f"No {workload} database at {path}, build it with the project's runner "
+                                 f"or pass --database {workload}=<path>")
+            self.con.execute(f"ATTACH '{path}' AS {workload} (READ_ONLY)")
+        self.local = threading.local()
+        self.error = duckdb.Error
+
+    def run(self, query: Query):
+        cursors = getattr(self.local, "cursors", None)
+        if cursors is None:
+            cursors = self.local.cursors = {}
+        if query.workload not in cursors:
+            cursors[query.workload] = self.con.cursor()
+            cursors[query.workload].execute(f"USE {query.workload}")
+        cursor = cursors[query.workload]
+
+        statements = [st for st in split_statements(query.sql) if not SESSION_STATEMENT.match(st)]
+        try:
+            for st in statements:
+                cursor.execute(st).fetchall()
+        except self.error as e:
+            raise BackendError(str(e))
+
+    def close(self):
+        self.con.close()
+
+
+class SnowSQLTarget:
+    def __init__(self, scaling_factor, warehouse, **options):
+        self.backend = SnowSQLBackend(**options)
+        self.scaling_factor = scaling_factor
+        self.warehouse = warehouse
+
+    def run(self, query: Query):
+        if query.workload != "tpch":
+            raise BackendError(f"{query.workload} queries have no Snowflake dataset")
+        self.backend.run(query.sql, self.scaling_factor, self.warehouse)
+
+    def close(self):
+        pass
+
+
+class LoadGenerator:
+    def __init__(self, target, queries, weights, clients, duration, seed=0):
+        self.target = target
+        self.queries = queries
+        self.weights = [weights.get(q.workload, 1.0) for q in queries]
+        self.clients = clients
+        self.duration = duration
+        self.rng = random.Random(seed)
+        self.requests: list[Request] = []
+        self.pool = ThreadPoolExecutor(max_workers=clients)
+        self.t0 = 0.0
+
+    def now(self):
+        return time.perf_counter() - self.t0
+
+    def pick(self, rng):
+        return rng.choices(self.queries, weights=self.weights)[0]
+
+    async def execute(self, client, query: Query, arrival):
+        request = Request(client, query.workload, query.name, arrival, start=self.now())
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.pool, self.target.run, query)
+        except (BackendError, OSError) as e:
+            request.error = str(e)
+        request.end = self.now()
+        self.requests.append(request)
+
+    async def closed_client(self, client, think_time):
+        rng = random.Random(self.rng.random())
+        while self.now() < self.duration:
+            await self.execute(client, self.pick(rng), self.now())
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    async def closed_loop(self, think_time=0.0):
+        self.t0 = time.perf_counter()
+        await asyncio.gather(*(self.closed_client(i, think_time) for i in range(self.clients)))
+
+    async def open_worker(self, client, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            query, arrival = item
+            await self.execute(client, query, arrival)
+
+    async def open_loop(self, rate, arrivals="poisson"):
+        queue = asyncio.Queue()
+        self.t0 = time.perf_counter()
+        workers = [asyncio.create_task(self.open_worker(i, queue)) for i in range(self.clients)]
+
+        # Arrival times are fixed up front from the schedule, not from when
+        # the previous query was handed off, so a slow system cannot slow
+        # down the offered load.
+        next_arrival = 0.0
+        while next_arrival < self.duration:
+            delay = next_arrival - self.now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await queue.put((self.pick(self.rng), next_arrival))
+            next_arrival += self.rng.expovariate(rate) if arrivals == "poisson" else 1 / rate
+
+        # Queries that arrived in time are still answered; the drain shows up
+        # as queueing delay in the last windows.
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    def close(self):
+        self.pool.shutdown()
+        self.target.close()
+
+
+def percentiles(values):
+    if not len(values):
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def summarize_requests(requests: list[Request], elapsed, warmup=0.0):
+    measured = [r for r in requests if r.arrival >= warmup]
+    ok = [r for r in measured if not r.error]
+    span = max(elapsed - warmup, 1e-9)
+
+    summary = {
+        "requests": len(measured),
+        "errors": len(measured) - len(ok),
+        "throughput": len(ok) / span,
+        "latency": percentiles(np.array([r.latency for r in ok])),
+        "queueing": percentiles(np.array([r.queueing for r in ok])),
+        "response": percentiles(np.array([r.end - r.arrival for r in ok])),
+        "queries": {},
+    }
+    for key in sorted(set((r.workload, r.query) for r in ok)):
+        latencies = np.array([r.latency for r in ok if (r.workload, r.query) == key])
+        summary["queries"][f"{key[0]}/{key[1]}"] = {"count": len(latencies), **percentiles(latencies)}
+    return summary
+
+
+def windows(requests: list[Request], elapsed, window=WINDOW):
+    # Requests are assigned to the window in which they finished; queue
+    # depth is the number of arrived but unstarted requests at its end.
+    ends = np.array([r.end for r in requests])
+    latencies = np.array([r.latency for r in requests])
+    queueing = np.array([r.queueing for r in requests])
+    arrivals = np.array([r.arrival for r in requests])
+    starts = np.array([r.start for r in requests])
+    failed = np.array([bool(r.error) for r in requests])
+
+    rows = []
+    for lo in np.arange(0, elapsed, window):
+        hi = lo + window
+        mask = (ends >= lo) & (ends < hi) & ~failed
+        rows.append({
+            "start": float(lo),
+            "throughput": int(mask.sum()) / window,
+            "latency": percentiles(latencies[mask]),
+            "queueing_mean": float(queueing[mask].mean()) if mask.any() else None,
+            "queue_depth": int(((arrivals < hi) & (starts >= hi)).sum()),
+        })
+    return rows
+
+
+def fmt(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def print_report(summary, rows):
+    print(f"{'Window':>8} {'QPS':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Queue ms':>9} {'Depth':>6}")
+    for row in rows:
+        print(f"{row['start']:>7g}s {row['throughput']:>7.2f} {fmt(row['latency']['p50']):>8} "
+              f"{fmt(row['latency']['p95']):>8} {fmt(row['latency']['p99']):>8} "
+              f"{fmt(row['queueing_mean']):>9} {row['queue_depth']:>6}")
+
+    print()
+    print(f"{summary['requests']} requests, {summary['errors']} errors, {summary['throughput']:.2f} queries/s")
+    for metric in ["latency", "queueing", "response"]:
+        print(f"  {metric:<9} " + "  ".join(f"{p} {fmt(v)} ms" for p, v in summary[metric].items()))
+
+    print()
+    print(f"{'Query':<12} {'Count':>6} " + " ".join(f"{'p' + str(p) + ' ms':>9}" for p in PERCENTILES))
+    for name, q in summary["queries"].items():
+        print(f"{name:<12} {q['count']:>6} " + " ".join(f"{fmt(q[f'p{p}']):>9}" for p in PERCENTILES))
+
+
+def parse_pairs(value):
+    # "tpch=1,ssb=2" -> {"tpch": "1", "ssb": "2"}
+    return dict(pair.split("=", 1) for pair in value.split(",") if pair)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay TPC-H and SSB queries from concurrent clients")
+    parser.add_argument("--backend", choices=["duckdb", "snowsql"], default="duckdb")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load")
+    parser.add_argument("--rate", type=float, default=10, help="open loop: arrivals per second")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--think-time", type=float, default=0.0, help="closed loop: mean seconds between queries")
+    parser.add_argument("--mix", default="tpch=1,ssb=1", help="relative weight of each workload's queries")
+    parser.add_argument("--queries", nargs="+", default=None, help="only these query files, e.g. q1 q5 q1.1")
+    parser.add_argument("--warmup", type=float, default=0.0, help="seconds excluded from the summary")
+    parser.add_argument("--window", type=float, default=WINDOW, help="seconds per reported time window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", action="append", default=[], metavar="WORKLOAD=PATH",
+                        help="duckdb: database file of a workload")
+    parser.add_argument("--threads", type=int, default=None, help="duckdb: threads shared by all clients")
+    parser.add_argument("--scaling-factor", default="SF1", help="snowsql: TPC-H schema")
+    parser.add_argument("--warehouse", default="CHEETAH_WH_XS", help="snowsql: warehouse")
+    parser.add_argument("--snowsql", default="snowsql", help="snowsql: client binary")
+    parser.add_argument("--out", default=None, help="write requests, windows and summary as JSON")
+    args = parser.parse_args()
+
+    weights = {k: float(v) for k, v in parse_pairs(args.mix).items()}
+    if args.backend == "snowsql":
+        weights = {"tpch": weights.get("tpch", 1.0)}
+    queries = read_queries([w for w, weight in weights.items() if weight > 0], args.queries)
+    if not queries:
+        print("No queries to replay")
+        exit(1)
+
+    if args.backend == "duckdb":
+        databases = {w: p for w, p in DEFAULT_DATABASES.items() if w in weights}
+        for value in args.database:
+            databases.update(parse_pairs(value))
+        target = DuckDBTarget(databases, args.threads)
+    else:
+        target = SnowSQLTarget(args.scaling_factor, args.warehouse, binary=args.snowsql)
+
+    generator = LoadGenerator(target, queries, weights, args.clients, args.duration, args.seed)
+    try:
+        if args.mode == "closed":
+            asyncio.run(generator.closed_loop(args.think_time))
+        else:
+            asyncio.run(generator.open_loop(args.rate, args.arrivals))
+        elapsed = generator.now()
+    finally:
+        generator.close()
+
+    summary = summarize_requests(generator.requests, elapsed, args.warmup)
+    rows = windows(generator.requests, elapsed, args.window)
+    print_report(summary, rows)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": vars(args), "summary": summary, "windows": rows,
+                       "requests": [asdict(r) for r in generator.requests]}, f, indent=2)
+        print(f"\nWrote {args.out}")
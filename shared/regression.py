@@ -0,0 +1,156 @@
+"""Statistical comparison of a baseline and a candidate benchmark run.
+
+Configurations are matched by key and their repetitions compared with a
+two-sided Mann-Whitney U test (exact for small samples without ties, normal
+approximation otherwise). Cliff's delta and the relative change of the
+medians are reported as effect sizes.
+"""
+import argparse
+from dataclasses import dataclass
+from functools import lru_cache
+import math
+import statistics
+
+
+ALPHA = 0.05
+THRESHOLD = 0.05
+EXACT_LIMIT = 30
+
+
+@lru_cache(maxsize=None)
+def u_counts(n, m):
+    # Number of orderings of n + m distinct values for each value of U.
+    if n == 0 or m == 0:
+        return (1,)
+    a = u_counts(n - 1, m)
+    b = u_counts(n, m - 1)
+    counts = [0] * (n * m + 1)
+    for u, c in enumerate(a):
+        counts[u + m] += c
+    for u, c in enumerate(b):
+        counts[u] += c
+    return tuple(counts)
+
+
+def ranks(values):
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    result = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            result[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return result
+
+
+def mann_whitney(a, b):
+    n, m = len(a), len(b)
+    r = ranks(list(a) + list(b))
+    u = sum(r[:n]) - n * (n + 1) / 2
+
+    ties = len(set(a) | set(b)) < n + m
+    if not ties and n <= EXACT_LIMIT and m <= EXACT_LIMIT:
+        counts = u_counts(n, m)
+        total = sum(counts)
+        lower = sum(counts[:int(u) + 1]) / total
+        upper = sum(counts[int(u):]) / total
+        return u, min(1.0, 2 * min(lower, upper))
+
+    tie_groups = {}
+    for v in r:
+        tie_groups[v] = tie_groups.get(v, 0) + 1
+    tie_term = sum(t ** 3 - t for t in tie_groups.values()) / ((n + m) * (n + m - 1))
+    sigma = math.sqrt(n * m / 12 * ((n + m + 1) - tie_term))
+    if sigma == 0:
+        return u, 1.0
+
+    z = (abs(u - n * m / 2) - 0.5) / sigma
+    return u, min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def cliffs_delta(a, b):
+    # Positive when the candidate (b) tends to be larger, i.e. slower.
+    greater = sum(1 for x in a for y in b if y > x)
+    less = sum(1 for x in a for y in b if y < x)
+    return (greater - less) / (len(a) * len(b))
+
+
+@dataclass
+class Comparison:
+    key: str
+    baseline_median: float
+    candidate_median: float
+    change: float
+    p_value: float
+    delta: float
+    verdict: str
+
+
+def compare(baseline: dict[str, list[float]], candidate: dict[str, list[float]], alpha=ALPHA, threshold=THRESHOLD):
+    comparisons = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        a, b = baseline[key], candidate[key]
+        before, after = statistics.median(a), statistics.median(b)
+        change = (after - before) / before if before else float("inf")
+        _, p = mann_whitney(a, b)
+
+        verdict = "unchanged"
+        if p < alpha and abs(change) >= threshold:
+            verdict = "slower" if change > 0 else "faster"
+
+        comparisons.append(Comparison(key, before, after, change, p, cliffs_delta(a, b), verdict))
+
+    return comparisons
+
+
+def print_report(comparisons: list[Comparison], baseline_keys, candidate_keys):
+    header = f"{'Configuration':<32} {'Baseline':>10} {'Candidate':>10} {'Change':>8} {'p':>7} {'Delta':>6}"
+
+    for verdict, title in [("slower", "Significant slowdowns"), ("faster", "Significant speedups")]:
+        rows = [c for c in comparisons if c.verdict == verdict]
+        rows.sort(key=lambda c: abs(c.change), reverse=True)
+
+        print(f"{title} ({len(rows)})")
+        if rows:
+            print(header)
+        for c in rows:
+            print(f"{c.key:<32} {c.baseline_median:>10.4f} {c.candidate_median:>10.4f} "
+                  f"{c.change * 100:>+7.1f}% {c.p_value:>7.4f} {c.delta:>+6.2f}")
+        print()
+
+    unchanged = sum(1 for c in comparisons if c.verdict == "unchanged")
+    print(f"{unchanged} configurations without a significant change")
+
+    only_baseline = baseline_keys - candidate_keys
+    only_candidate = candidate_keys - baseline_keys
+    if only_baseline:
+        print("Missing from the candidate: " + ", ".join(sorted(only_baseline)))
+    if only_candidate:
+        print("New in the candidate: " + ", ".join(sorted(only_candidate)))
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--alpha", type=float, default=ALPHA,
+                        help="significance level of the Mann-Whitney test")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="minimum relative change of the median to report (0.05 = 5%%)")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="exit non-zero if a significant slowdown exceeds this relative change "
+                             "(defaults to --threshold)")
+
+
+def run(args, baseline: dict[str, list[float]], candidate: dict[str, list[float]]):
+    comparisons = compare(baseline, candidate, args.alpha, args.threshold)
+    print_report(comparisons, set(baseline), set(candidate))
+
+    fail_above = args.threshold if args.fail_above is None else args.fail_above
+    regressions = [c for c in comparisons if c.verdict == "slower" and c.change >= fail_above]
+    if regressions:
+        print(f"\n{len(regressions)} regressions above {fail_above * 100:.0f}%")
+        return 1
+    return 0
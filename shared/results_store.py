@@ -0,0 +1,174 @@
+"""SQLite-backed cache of parsed benchmark measurements.
+
+Each raw benchmark file is parsed once into a typed table (one column per
+dataclass field) keyed by the file's path, size and mtime. Later loads only
+re-parse files that are new or changed and read the rest from the store;
+rows of files that were deleted are dropped. Tables are named after the
+module and the dataclass, so plotters can share a store.
+"""
+import dataclasses
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import typing
+
+from ingest import parse_files
+
+
+SQL_TYPES = {str: "TEXT", int: "INTEGER", float: "REAL", bool: "INTEGER"}
+
+
+def column_types(cls):
+    hints = typing.get_type_hints(cls)
+    return {f.name: SQL_TYPES.get(hints[f.name], "JSON") for f in dataclasses.fields(cls)}
+
+
+def kind_of(cls):
+    # Qualified by module, so dataclasses of the same name in different
+    # plotters sharing a store keep their own tables. Scripts run directly
+    # are all __main__ and are told apart by their file name.
+    module = cls.__module__
+    if module == "__main__":
+        module = pathlib.Path(getattr(sys.modules[module], "__file__", module)).stem
+    return f"{module}.{cls.__qualname__}"
+
+
+def schema_signature(cls):
+    return json.dumps(column_types(cls), sort_keys=True)
+
+
+def encode(value, sql_type):
+    if sql_type == "JSON":
+        return json.dumps(value)
+    return value
+
+
+def decode(value, sql_type, hint):
+    if sql_type == "JSON":
+        return json.loads(value)
+    if hint is bool:
+        return bool(value)
+    return value
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                kind TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, version TEXT,
+                PRIMARY KEY (kind, path)
+            )""")
+        self.db.execute("CREATE TABLE IF NOT EXISTS schemas (kind TEXT PRIMARY KEY, signature TEXT)")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_table(self, cls):
+        kind = kind_of(cls)
+        signature = schema_signature(cls)
+
+        row = self.db.execute("SELECT signature FROM schemas WHERE kind = ?", (kind,)).fetchone()
+        if row is not None and row[0] == signature:
+            return
+
+        # The dataclass changed shape since the store was written, so
+        # everything cached for it has to be parsed again.
+        self.db.execute(f'DROP TABLE IF EXISTS "{kind}"')
+        self.db.execute("DELETE FROM files WHERE kind = ?", (kind,))
+
+        columns = ", ".join(f'"{name}" {typ}' for name, typ in column_types(cls).items())
+        self.db.execute(f'CREATE TABLE "{kind}" (_path TEXT, _seq INTEGER, {columns})')
+        self.db.execute(f'CREATE INDEX "{kind}_path" ON "{kind}" (_path, _seq)')
+        self.db.execute("INSERT OR REPLACE INTO schemas VALUES (?, ?)", (kind, signature))
+        self.db.commit()
+
+    def is_fresh(self, cls, path, version=""):
+        st = os.stat(path)
+        row = self.db.execute(
+            "SELECT size, mtime_ns, version FROM files WHERE kind = ? AND path = ?",
+            (kind_of(cls), str(path))).fetchone()
+        return row == (st.st_size, st.st_mtime_ns, version)
+
+    def put(self, cls, path, measurements, version=""):
+        kind = kind_of(cls)
+        types = column_types(cls)
+        st = os.stat(path)
+
+        placeholders = ", ".join("?" for _ in range(len(types) + 2))
+        rows = [
+            (str(path), seq, *(encode(getattr(m, name), typ) for name, typ in types.items()))
+            for seq, m in enumerate(measurements)
+        ]
+
+        with self.db:
+            self.db.execute(f'DELETE FROM "{kind}" WHERE _path = ?', (str(path),))
+            self.db.executemany(f'INSERT INTO "{kind}" VALUES ({placeholders})', rows)
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                            (kind, str(path), st.st_size, st.st_mtime_ns, version))
+
+    def get(self, cls, path):
+        types = column_types(cls)
+        hints = typing.get_type_hints(cls)
+        columns = ", ".join(f'"{name}"' for name in types)
+
+        rows = self.db.execute(
+            f'SELECT {columns} FROM "{kind_of(cls)}" WHERE _path = ? ORDER BY _seq', (str(path),))
+        return [
+            cls(**{name: decode(v, typ, hints[name]) for (name, typ), v in zip(types.items(), row)})
+            for row in rows
+        ]
+
+    def prune(self, cls):
+        # Drops the rows of files that no longer exist.
+        kind = kind_of(cls)
+        paths = [row[0] for row in self.db.execute("SELECT path FROM files WHERE kind = ?", (kind,))]
+        missing = [(p,) for p in paths if not os.path.exists(p)]
+        if not missing:
+            return
+        with self.db:
+            self.db.executemany(f'DELETE FROM "{kind}" WHERE _path = ?', missing)
+            self.db.executemany("DELETE FROM files WHERE kind = ? AND path = ?", [(kind, p) for (p,) in missing])
+
+    def load(self, paths, cls, parse, version="", workers=None):
+        self._ensure_table(cls)
+        self.prune(cls)
+
+        paths = sorted(pathlib.Path(p).resolve() for p in paths)
+        stale = [p for p in paths if not self.is_fresh(cls, p, version)]
+
+        parsed, errors = parse_files(stale, parse, workers)
+        for path, measurements in parsed:
+            self.put(cls, path, measurements, version)
+
+        if stale:
+            print(f"Parsed {len(parsed)} new or changed files, {len(paths) - len(stale)} cached")
+
+        failed = set(pathlib.Path(e.path) for e in errors)
+        measurements = []
+        for path in paths:
+            if path not in failed:
+                measurements.extend(self.get(cls, path))
+        return measurements, errors
+
+
+def file_version(*paths):
+    # Used for parsers whose output depends on files other than the one
+    # being parsed, so their cached rows are invalidated when those change.
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+    return ";".join(parts)
@@ -0,0 +1,257 @@
+"""Sample the resource usage of a process tree from /proc.
+
+A background thread reads /proc/<pid> of a process and its descendants at
+a fixed interval and appends one row per sample to a CSV time series:
+
+    time, cpu_seconds, rss_bytes, read_bytes, write_bytes, voluntary_switches, involuntary_switches, threads
+
+time is the Unix time, so the series lines up with the timestamps of a
+benchmark log. The counters are cumulative (CPU time includes reaped
+children), RSS and threads are the current values over the tree; CPU
+utilization is the slope of cpu_seconds. Runners can call sample() around
+a query to put samples exactly on its boundaries, and the CPU-seconds of
+the query are then the difference of cpu_seconds at its start and end.
+
+By convention the series of a run is written next to its results, as
+<results file>.resources.csv. Linux only.
+
+Usage: python shared/sampler.py [--interval 0.1] --out run.resources.csv -- <command> [args...]
+       python shared/sampler.py --pid 1234 --out run.resources.csv
+"""
+import argparse
+import csv
+from dataclasses import astuple, dataclass, fields
+import os
+import pathlib
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+
+INTERVAL = 0.1
+SUFFIX = ".resources.csv"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class Sample:
+    time: float
+    cpu_seconds: float = 0.0
+    rss_bytes: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+    threads: int = 0
+
+
+def resources_path(path):
+    return pathlib.Path(str(path) + SUFFIX)
+
+
+def descendants(pid):
+    # Needs CONFIG_PROC_CHILDREN, which common distribution kernels have;
+    # without it only the process itself is sampled.
+    found = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{parent}/task")
+        except OSError:
+            continue
+        for tid in tasks:
+            try:
+                with open(f"/proc/{parent}/task/{tid}/children") as f:
+                    children = [int(child) for child in f.read().split()]
+            except OSError:
+                continue
+            found += children
+            pending += children
+    return found
+
+
+def read_status(path):
+    status = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()
+    return status
+
+
+def read_process(pid, sample: Sample):
+    # Adds the counters of one process to the sample and returns whether it
+    # still exists. Processes can exit between listing and reading, which
+    # only leaves them out.
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, the fields after it don't.
+            stat = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return False
+
+    utime, stime, cutime, cstime = (int(v) for v in stat[11:15])
+    sample.cpu_seconds += (utime + stime + cutime + cstime) / CLOCK_TICKS
+    sample.threads += int(stat[17])
+    sample.rss_bytes += int(stat[21]) * PAGE_SIZE
+
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            io = dict(line.split(": ") for line in f.read().splitlines())
+        sample.read_bytes += int(io["read_bytes"])
+        sample.write_bytes += int(io["write_bytes"])
+    except (OSError, KeyError):
+        # Needs the same user or CAP_SYS_PTRACE.
+        pass
+
+    # /proc/<pid>/status counts the switches of the main thread only.
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return True
+    for tid in tasks:
+        try:
+            status = read_status(f"/proc/{pid}/task/{tid}/status")
+        except OSError:
+            continue
+        sample.voluntary_switches += int(status.get("voluntary_ctxt_switches", [0])[0])
+        sample.involuntary_switches += int(status.get("nonvoluntary_ctxt_switches", [0])[0])
+    return True
+
+
+def read_tree(pid, children=True):
+    # None once the process is gone, as its counters would drop to zero.
+    sample = Sample(time.time())
+    if not read_process(pid, sample):
+        return None
+    for process in descendants(pid) if children else []:
+        read_process(process, sample)
+    return sample
+
+
+class Sampler:
+    """Appends samples of a process tree to a CSV file until stopped.
+
+    Use as a context manager around the work to sample; sample() takes an
+    extra sample at once and returns it.
+    """
+
+    def __init__(self, pid, path, interval=INTERVAL, children=True):
+        self.pid = pid
+        self.path = pathlib.Path(path)
+        self.interval = interval
+        self.children = children
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.file = None
+        self.writer = None
+        self.samples = 0
+
+    def start(self):
+        # Appends to an existing series, like the benchmark logs are
+        # appended to.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self.file = open(self.path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if new:
+            self.writer.writerow([f.name for f in fields(Sample)])
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        self.file.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def sample(self):
+        sample = read_tree(self.pid, self.children)
+        if sample is None:
+            return None
+        with self.lock:
+            self.writer.writerow(astuple(sample))
+            self.file.flush()
+            self.samples += 1
+        return sample
+
+    def _run(self):
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            self.sample()
+            self.stopped.wait(max(self.interval - (time.perf_counter() - start), 0))
+
+
+def read_series(path):
+    # {column: numpy array}, ordered by time.
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    rows.sort(key=lambda r: float(r["time"]))
+    return {f.name: np.array([float(r[f.name]) for r in rows]) for f in fields(Sample)}
+
+
+def cpu_seconds(series, start, end):
+    # CPU time used between two Unix times, interpolated between samples.
+    cpu = np.interp([start, end], series["time"], series["cpu_seconds"])
+    return float(cpu[1] - cpu[0])
+
+
+def utilization(series):
+    # (midpoints, CPU cores busy) between consecutive samples. The counters
+    # restart between the processes of an appended series, which counts as
+    # idle.
+    dt = np.diff(series["time"])
+    busy = np.divide(np.diff(series["cpu_seconds"]), dt, out=np.zeros_like(dt), where=dt > 0)
+    busy = np.maximum(busy, 0)
+    return series["time"][:-1] + dt / 2, busy
+
+
+def describe(series):
+    elapsed = series["time"][-1] - series["time"][0]
+    cpu = series["cpu_seconds"][-1] - series["cpu_seconds"][0]
+    return (f"{elapsed:.1f}s, {cpu:.1f} CPU-seconds ({cpu / elapsed if elapsed else 0:.2f} cores busy), "
+            f"peak RSS {series['rss_bytes'].max() / 1024 ** 2:.0f} MB, "
+            f"read {(series['read_bytes'][-1] - series['read_bytes'][0]) / 1024 ** 2:.0f} MB, "
+            f"wrote {(series['write_bytes'][-1] - series['write_bytes'][0]) / 1024 ** 2:.0f} MB, "
+            f"{series['voluntary_switches'][-1] - series['voluntary_switches'][0]:,.0f} voluntary and "
+            f"{series['involuntary_switches'][-1] - series['involuntary_switches'][0]:,.0f} involuntary "
+            f"context switches")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sample the resource usage of a process tree")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between samples")
+    parser.add_argument("--out", required=True, help="CSV file to write the samples to")
+    parser.add_argument("--pid", type=int, default=None, help="sample a running process until it exits")
+    parser.add_argument("--no-children", action="store_true", help="leave out the descendants of the process")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="command to run and sample, after --")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if (args.pid is None) == (not command):
+        parser.error("give either --pid or a command to run")
+
+    if command:
+        process = subprocess.Popen(command)
+        with Sampler(process.pid, args.out, args.interval, not args.no_children):
+            returncode = process.wait()
+    else:
+        with Sampler(args.pid, args.out, args.interval, not args.no_children):
+            while os.path.exists(f"/proc/{args.pid}"):
+                time.sleep(args.interval)
+        returncode = 0
+
+    print(f"Sampled {describe(read_series(args.out))}, wrote {args.out}")
+    exit(returncode)
@@ -0,0 +1,64 @@
+"""Plain-text summaries of the benchmark results.
+
+The plotters print these instead of rendering figures when run with
+--summary, so the statistics of a run show up without importing
+matplotlib. Every configuration becomes one row with its repetition count,
+mean and confidence interval, median, spread and tail latency of a metric,
+as an aligned text table or a Markdown table.
+"""
+from stats import summarize_configs
+
+
+STYLES = ["text", "markdown"]
+
+
+def add_argument(parser):
+    parser.add_argument("--summary", nargs="?", const="text", default=None, choices=STYLES,
+                        help="print per-configuration statistics instead of plotting (default style: text)")
+
+
+def markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "|".join("---" for _ in header) + "|"]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def text_table(header, rows):
+    # First column left-aligned, the numbers right-aligned.
+    widths = [max(len(r[i]) for r in [header] + rows) for i in range(len(header))]
+
+    def line(row):
+        cells = [row[0].ljust(widths[0])] + [cell.rjust(w) for cell, w in zip(row[1:], widths[1:])]
+        return "  ".join(cells).rstrip()
+
+    return "\n".join([line(header), "  ".join("-" * w for w in widths)] + [line(r) for r in rows])
+
+
+def format_table(header, rows, style="text"):
+    return markdown_table(header, rows) if style == "markdown" else text_table(header, rows)
+
+
+def summary_table(configs, metric, unit="s", scale=1.0, extra=None):
+    # extra: {column: function(configuration) -> str} for columns beyond
+    # the statistics of the metric, e.g. accuracy or rows.
+    extra = extra or {}
+    header = ["Configuration", "n", f"Mean ({unit})", "95% CI", "+-%", "Median", "Std", "Min", "Max", "P95"]
+    header += list(extra)
+
+    rows = []
+    for c, s in zip(configs, summarize_configs(configs, metric)):
+        relative = s.ci_width / 2 / s.mean * 100 if s.mean else float("nan")
+        rows.append([
+            str(c.key), str(s.n), f"{s.mean * scale:.3f}", f"{s.ci_low * scale:.3f} - {s.ci_high * scale:.3f}",
+            f"{relative:.1f}", f"{s.median * scale:.3f}", f"{s.std * scale:.3f}", f"{s.min * scale:.3f}",
+            f"{s.max * scale:.3f}", f"{s.p95 * scale:.3f}",
+        ] + [fn(c) for fn in extra.values()])
+    return header, rows
+
+
+def print_summary(configs, metric, unit="s", scale=1.0, extra=None, style="text"):
+    if not configs:
+        print("No configurations to summarize")
+        return
+    header, rows = summary_table(configs, metric, unit, scale, extra)
+    print(format_table(header, rows, style))
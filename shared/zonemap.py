@@ -0,0 +1,347 @@
+"""Zone maps for CSV and .tbl files.
+
+Parquet carries min/max statistics per row group; text files have to be
+parsed in full for every filter. A zone map is a sidecar index built in
+one pass over a text file: the file is cut into blocks of a fixed number
+of rows, and for each block the byte range, the row count and per column
+min, max and null count are stored next to the file as
+<file>.zonemap.json.
+
+With the index, a range predicate skips every block whose min/max cannot
+match, and the remaining blocks are byte ranges that can be parsed in
+parallel without scanning for line starts. Rows must not contain quoted
+line breaks, which holds for dbgen output and the CSV exports of the flat
+SSB table.
+
+Usage: python shared/zonemap.py build lineorder_flat.csv [--block-rows 65536]
+       python shared/zonemap.py build lineorder.tbl --delimiter '|' --names lo_orderkey,lo_linenumber,...
+       python shared/zonemap.py scan lineorder_flat.csv --filter "lo_discount>=5" [--columns lo_revenue]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dataclasses import asdict, dataclass, field
+import io
+import json
+import os
+import pathlib
+import re
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+
+BLOCK_ROWS = 65536
+SUFFIX = ".zonemap.json"
+# Name of the empty column after the trailing separator of .tbl rows.
+TRAILING = "_end"
+
+PREDICATE = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|==|=|<|>)\s*(.+?)\s*$")
+
+
+@dataclass
+class Block:
+    offset: int
+    length: int
+    rows: int
+    min: dict = field(default_factory=dict)
+    max: dict = field(default_factory=dict)
+    nulls: dict = field(default_factory=dict)
+
+
+@dataclass
+class ZoneMap:
+    path: str
+    size: int
+    mtime: float
+    delimiter: str
+    header: bool
+    # Every column of a row, including TRAILING if rows end with a separator.
+    names: list[str]
+    types: dict[str, str]
+    block_rows: int
+    blocks: list[Block] = field(default_factory=list)
+
+    @property
+    def columns(self):
+        return [n for n in self.names if n != TRAILING]
+
+    @staticmethod
+    def sidecar(path):
+        return pathlib.Path(str(path) + SUFFIX)
+
+    @staticmethod
+    def load(path):
+        with open(ZoneMap.sidecar(path)) as f:
+            content = json.load(f)
+        content["blocks"] = [Block(**b) for b in content["blocks"]]
+        zonemap = ZoneMap(**content)
+
+        stat = os.stat(path)
+        if stat.st_size != zonemap.size or stat.st_mtime != zonemap.mtime:
+            raise ValueError(f"{ZoneMap.sidecar(path)} is out of date, rebuild it")
+        return zonemap
+
+    def save(self):
+        tmp = self.sidecar(self.path).with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp, self.sidecar(self.path))
+
+    def arrow_types(self):
+        return {name: pa.type_for_alias(t) for name, t in self.types.items()}
+
+    def prune(self, predicates):
+        # Blocks that may contain rows matching all predicates.
+        kept = []
+        for block in self.blocks:
+            if all(may_match(block, column, op, coerce(value, self.types[column]))
+                   for column, op, value in predicates):
+                kept.append(block)
+        return kept
+
+    def read(self, blocks, columns=None, threads=1):
+        # Parses the blocks in byte ranges of adjacent blocks, threads at a
+        # time, and yields a table per range in file order.
+        ranges = byte_ranges(blocks, threads)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            yield from pool.map(lambda r: self.parse_range(*r, columns), ranges)
+
+    def parse_range(self, offset, length, columns=None):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return parse(data, self.names, self.delimiter, self.arrow_types(), columns or self.columns)
+
+
+def parse_predicate(text):
+    # "lo_discount>=5" -> ("lo_discount", ">=", "5")
+    match = PREDICATE.match(text)
+    if match is None:
+        raise ValueError(f"Cannot parse predicate {text!r}, expected e.g. lo_discount>=5")
+    column, op, value = match.groups()
+    return column, "=" if op == "==" else op, value.strip("'\"")
+
+
+def coerce(value, type_name):
+    # Statistics are stored as JSON numbers or strings; dates and
+    # timestamps as ISO strings, which compare in order.
+    arrow_type = pa.type_for_alias(type_name)
+    if pa.types.is_integer(arrow_type):
+        return int(value)
+    if pa.types.is_floating(arrow_type):
+        return float(value)
+    return str(value)
+
+
+def may_match(block: Block, column, op, value):
+    low, high = block.min.get(column), block.max.get(column)
+    if low is None:
+        # Only nulls, which no comparison matches.
+        return False
+    if op == "=":
+        return low <= value <= high
+    if op == "!=":
+        return not (low == high == value)
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    if op == ">=":
+        return high >= value
+    raise ValueError(f"Unknown operator {op}")
+
+
+def byte_ranges(blocks, parts=1):
+    # Adjacent blocks are coalesced into one range; long runs are cut at
+    # block boundaries so there are about `parts` ranges to parse at once.
+    total = sum(b.length for b in blocks)
+    target = max(total // max(parts, 1), 1)
+
+    ranges = []
+    for block in blocks:
+        if ranges:
+            offset, length = ranges[-1]
+            if offset + length == block.offset and length < target:
+                ranges[-1] = (offset, length + block.length)
+                continue
+        ranges.append((block.offset, block.length))
+    return ranges
+
+
+def parse(data, names, delimiter, types=None, columns=None):
+    return pacsv.read_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(column_names=names, use_threads=False),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter),
+        convert_options=pacsv.ConvertOptions(column_types=types or {}, include_columns=columns or []),
+    )
+
+
+def statistic(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def summarize_block(table: pa.Table, offset, length):
+    block = Block(offset, length, table.num_rows)
+    for name in table.column_names:
+        column = table.column(name)
+        block.nulls[name] = column.null_count
+        if pa.types.is_boolean(column.type):
+            column = column.cast(pa.int8())
+        stats = pc.min_max(column)
+        block.min[name] = statistic(stats["min"].as_py())
+        block.max[name] = statistic(stats["max"].as_py())
+    return block
+
+
+def build(path, block_rows=BLOCK_ROWS, delimiter=",", header=True, names=None):
+    path = pathlib.Path(path)
+    stat = os.stat(path)
+
+    with open(path, "rb") as f:
+        offset = 0
+        if header:
+            line = f.readline()
+            offset = len(line)
+            names = names or next(csv.reader(io.StringIO(line.decode()), delimiter=delimiter))
+
+        zonemap = None
+        lines = []
+        start = offset
+
+        def flush():
+            nonlocal zonemap, start
+            data = b"".join(lines)
+            if zonemap is None:
+                zonemap = first_block(path, stat, data, names, delimiter, header, block_rows)
+            table = parse_block(zonemap, data)
+            zonemap.blocks.append(summarize_block(table, start, len(data)))
+            start += len(data)
+            lines.clear()
+
+        for line in f:
+            lines.append(line)
+            if len(lines) == block_rows:
+                flush()
+        if lines:
+            flush()
+
+    if zonemap is None:
+        raise ValueError(f"{path} has no rows")
+    return zonemap
+
+
+def widen(old: pa.DataType, new: pa.DataType):
+    # The narrowest type both types convert to.
+    if old == new or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    if pa.types.is_integer(old) and pa.types.is_integer(new):
+        return pa.int64()
+    if (pa.types.is_integer(old) or pa.types.is_floating(old)) and \
+            (pa.types.is_integer(new) or pa.types.is_floating(new)):
+        return pa.float64()
+    return pa.string()
+
+
+def parse_block(zonemap: ZoneMap, data):
+    # Parses a block in the types of the zone map. A block that does not fit
+    # them, e.g. 1.5 in a column of integers so far, widens the types, and
+    # the blocks before it are summarized again so every block is compared
+    # in the same types.
+    try:
+        return parse(data, zonemap.names, zonemap.delimiter, zonemap.arrow_types(), zonemap.columns)
+    except pa.ArrowInvalid:
+        inferred = parse(data, zonemap.names, zonemap.delimiter, columns=zonemap.columns).schema
+    types = zonemap.arrow_types()
+    zonemap.types = {name: str(widen(types[name], inferred.field(name).type)) for name in zonemap.columns}
+    zonemap.blocks = [summarize_block(zonemap.parse_range(b.offset, b.length), b.offset, b.length)
+                      for b in zonemap.blocks]
+    return parse(data, zonemap.names, zonemap.delimiter, zonemap.arrow_types(), zonemap.columns)
+
+
+def first_block(path, stat, data, names, delimiter, header, block_rows):
+    # Column types are inferred from the first block; parse_block widens
+    # them if a later block does not fit. A column that is empty in the
+    # first block has no type yet and is read as strings.
+    first_line = data.split(b"\n", 1)[0].rstrip(b"\r\n").decode()
+    width = len(next(csv.reader([first_line], delimiter=delimiter)))
+    names = list(names or [f"f{i}" for i in range(width)])
+    if len(names) == width - 1 and first_line.endswith(delimiter):
+        names.append(TRAILING)
+    if len(names) != width:
+        raise ValueError(f"{path} has {width} columns per row, got {len(names)} names")
+
+    columns = [n for n in names if n != TRAILING]
+    table = parse(data, names, delimiter, columns=columns)
+    types = {name: "string" if pa.types.is_null(table.schema.field(name).type) else str(table.schema.field(name).type)
+             for name in columns}
+    return ZoneMap(str(path), stat.st_size, stat.st_mtime, delimiter, header, names, types, block_rows)
+
+
+def scan(path, predicates, columns=None, threads=1):
+    # Rows of the file that match all predicates, reading only the blocks
+    # the zone map cannot rule out.
+    zonemap = ZoneMap.load(path)
+    kept = zonemap.prune(predicates)
+
+    needed = None
+    if columns:
+        needed = list(dict.fromkeys(columns + [column for column, _, _ in predicates]))
+
+    expression = None
+    types = zonemap.arrow_types()
+    for column, op, value in predicates:
+        literal = pa.scalar(coerce(value, zonemap.types[column])).cast(types[column])
+        condition = {"=": pc.equal, "!=": pc.not_equal, "<": pc.less, "<=": pc.less_equal,
+                     ">": pc.greater, ">=": pc.greater_equal}[op](pc.field(column), literal)
+        expression = condition if expression is None else expression & condition
+
+    rows = 0
+    for table in zonemap.read(kept, needed, threads):
+        if expression is not None:
+            table = table.filter(expression)
+        rows += table.num_rows
+    return rows, len(kept), len(zonemap.blocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and use zone maps of CSV and .tbl files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="index a file")
+    build_parser.add_argument("file")
+    build_parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    build_parser.add_argument("--delimiter", default=",")
+    build_parser.add_argument("--no-header", action="store_true", help="the file has no header line, e.g. .tbl")
+    build_parser.add_argument("--names", default=None, help="comma separated column names for files without header")
+
+    scan_parser = commands.add_parser("scan", help="count the rows matching predicates")
+    scan_parser.add_argument("file")
+    scan_parser.add_argument("--filter", action="append", default=[], help="e.g. lo_discount>=5, repeat to AND")
+    scan_parser.add_argument("--columns", default=None, help="comma separated columns to parse")
+    scan_parser.add_argument("--threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        names = args.names.split(",") if args.names else None
+        zonemap = build(args.file, args.block_rows, args.delimiter, not args.no_header, names)
+        zonemap.save()
+        print(f"Indexed {sum(b.rows for b in zonemap.blocks):,} rows in {len(zonemap.blocks)} blocks "
+              f"in {time.perf_counter() - start:.1f}s, wrote {ZoneMap.sidecar(args.file)}")
+    else:
+        predicates = [parse_predicate(f) for f in args.filter]
+        columns = args.columns.split(",") if args.columns else None
+        rows, kept, blocks = scan(args.file, predicates, columns, args.threads)
+        print(f"{rows:,} matching rows, read {kept} of {blocks} blocks in {time.perf_counter() - start:.2f}s")